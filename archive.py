@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Direct-to-archive output for large batches
+Tabs are appended to rolling uncompressed tar files (tabs-00001.tar, ...) that are
+rotated by size, instead of one small file each in output/. Every archive has a
+sidecar index (tabs-00001.tar.index.jsonl) mapping its entries to tab URLs. An entry
+is only indexed after it is fully on disk, so after a crash the last archive is cut
+back to its last indexed entry and appending simply continues.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+import tarfile
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from storage import FILE_MODE, STORED, LINKED, UNCHANGED, REVALIDATED, candidate_names
+from urlinput import tab_key
+
+
+ARCHIVE_PREFIX = 'tabs-'
+ARCHIVE_SUFFIX = '.tar'
+INDEX_SUFFIX = '.index.jsonl'
+DEFAULT_ARCHIVE_MAX_MB = 1024
+# Downloads bigger than this are spooled to a temporary file until they are archived
+SPOOL_MAX_BYTES = 1024 * 1024
+# Optional index entry fields from storage.response_validators()
+VALIDATOR_KEYS = ('etag', 'last_modified')
+
+
+class EntryBuffer:
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Collects one download; same interface as AtomicFileWriter
+        Small tabs stay in memory, anything past SPOOL_MAX_BYTES goes to a temporary file in `directory`.
+        Nothing reaches the archive until ArchiveStore.commit(), so concurrent downloads
+        never interleave and a failed one leaves no partial entry.
+        """
+        self._buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, dir=directory)
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.path: Optional[str] = None
+
+    def write(self, chunk: bytes) -> None:
+        self._buffer.write(chunk)
+        self._hash.update(chunk)
+        self.size += len(chunk)
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def fileobj(self):
+        """The collected data, rewound for reading"""
+        self._buffer.seek(0)
+        return self._buffer
+
+    def discard(self) -> None:
+        self._buffer.close()
+
+    def __enter__(self) -> 'EntryBuffer':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.discard()
+
+
+def _read_index(path: str) -> list:
+    """Entries of a sidecar index; a line torn by a crash is cut off so appending can go on"""
+    entries = []
+    valid = 0
+    with open(path, 'r+b') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+            if not line.endswith(b'\n'):
+                entries.pop()
+                break
+            valid += len(line)
+        f.truncate(valid)
+    return entries
+
+
+class ArchiveStore:
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_ARCHIVE_MAX_MB * 1024 * 1024):
+        """
+        Drop-in replacement for storage.OutputStore that writes into rolling tar archives
+        directory: where the archives and their sidecar indexes live
+        max_bytes: start a new archive once the current one would grow past this
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.counts = {STORED: 0, LINKED: 0, UNCHANGED: 0, REVALIDATED: 0, 'renamed': 0, 'archives': 0}
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        # tab key (urlinput.tab_key) -> the tab's latest index entry, content hash -> an entry holding it,
+        # and every name in use
+        self._by_key: Dict[str, dict] = {}
+        self._by_sha256: Dict[str, dict] = {}
+        self._names = set()
+        self._number = 0
+        self._tar: Optional[tarfile.TarFile] = None
+        self._file = None
+        self._index = None
+        self._load()
+
+    def _archive_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{ARCHIVE_PREFIX}{number:05d}{ARCHIVE_SUFFIX}")
+
+    def _load(self) -> None:
+        """Read every sidecar index and find where the last archive really ends"""
+        pattern = os.path.join(self.directory, f"{ARCHIVE_PREFIX}*{ARCHIVE_SUFFIX}{INDEX_SUFFIX}")
+        last_end = 0
+        for index_path in sorted(glob.glob(pattern)):
+            number = int(re.search(r'(\d+)' + re.escape(ARCHIVE_SUFFIX + INDEX_SUFFIX) + '$', index_path).group(1))
+            archive = os.path.basename(self._archive_path(number))
+            ends = [0]
+            for entry in _read_index(index_path):
+                self._remember(entry)
+                if entry['archive'] == archive:
+                    ends.append(entry['end'])
+            if number >= self._number:
+                self._number, last_end = number, max(ends)
+        self._resume_at = last_end
+
+    def _remember(self, entry: dict) -> None:
+        self._by_key[tab_key(entry['url'])] = entry
+        self._by_sha256.setdefault(entry['sha256'], entry)
+        self._names.add(entry['name'])
+
+    def _open_archive(self) -> None:
+        """Append to the last archive if it has room, otherwise start the next one"""
+        resume_at, self._resume_at = self._resume_at, 0
+        if self._number == 0 or resume_at >= self.max_bytes:
+            self._number += 1
+            resume_at = 0
+        path = self._archive_path(self._number)
+        self._file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        # Drops the end-of-archive blocks of a finished archive, or whatever a crash left behind
+        self._file.truncate(resume_at)
+        self._file.seek(resume_at)
+        self._tar = tarfile.open(fileobj=self._file, mode='w', format=tarfile.PAX_FORMAT)
+        self._index = open(path + INDEX_SUFFIX, 'a', encoding='utf-8')
+        self.counts['archives'] += 1
+
+    def _close_archive(self) -> None:
+        if self._tar is None:
+            return
+        self._tar.close()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._index.close()
+        self._tar = self._file = self._index = None
+
+    def open_writer(self) -> EntryBuffer:
+        return EntryBuffer(self.directory)
+
+    def lookup(self, url: str) -> Optional[str]:
+        """'<archive>:<entry name>' holding the tab saved for `url` (or another URL of the same tab), if any"""
+        with self._lock:
+            entry = self._entry_for(url)
+        return self._entry_path(entry) if entry else None
+
+    def has(self, url: str) -> bool:
+        return self.lookup(url) is not None
+
+    def _entry_for(self, url: str) -> Optional[dict]:
+        """Index entry of `url`, or of another URL of the same tab (caller holds the lock)"""
+        return self._by_key.get(tab_key(url))
+
+    def _entry_path(self, entry: dict) -> str:
+        return f"{os.path.join(self.directory, entry['archive'])}:{entry['name']}"
+
+    def validators(self, url: str) -> Optional[dict]:
+        """Like OutputStore.validators(); indexed entries are always complete"""
+        with self._lock:
+            entry = self._entry_for(url)
+        if entry is None:
+            return None
+        return {'path': self._entry_path(entry), 'sha256': entry['sha256'], 'size': entry['size'],
+                'etag': entry.get('etag'), 'last_modified': entry.get('last_modified')}
+
+    def revalidated(self, tab_url: str, validators: Optional[dict] = None) -> str:
+        """Count a tab the server confirmed unchanged; new validators are indexed again"""
+        with self._lock:
+            entry = self._with_validators(self._entry_for(tab_url), validators, keep_old=True)
+            self.counts[REVALIDATED] += 1
+            self.bytes_saved += entry['size']
+        return self._entry_path(entry)
+
+    def _with_validators(self, entry: dict, validators: Optional[dict], keep_old: bool = False) -> dict:
+        """`entry` carrying `validators`; an index line is appended if that changes it (caller holds the lock)"""
+        if validators is None:
+            return entry
+        updated = {key: value for key, value in entry.items() if key not in VALIDATOR_KEYS or keep_old}
+        updated.update((key, value) for key, value in validators.items() if value)
+        if updated != entry:
+            self._append_index(updated)
+            self._remember(updated)
+        return updated
+
+    def commit(self, writer: EntryBuffer, filename: str, tab_url: str,
+               validators: Optional[dict] = None) -> Tuple[str, str]:
+        """
+        Append a finished download to the current archive; returns (path, how) like OutputStore.commit()
+        Content already archived for another tab is only indexed again (LINKED), not stored twice.
+        An updated tab is appended under its old name, so extracting the archives in order keeps the newest.
+        validators: response_validators() of the download, kept in the tab's index entry
+        """
+        sha256 = writer.sha256
+        with self._lock:
+            previous = self._entry_for(tab_url)
+            if previous is not None and previous['sha256'] == sha256:
+                how, entry = UNCHANGED, self._with_validators(previous, validators)
+            elif previous is None and sha256 in self._by_sha256:
+                how = LINKED
+                entry = {key: value for key, value in self._by_sha256[sha256].items() if key not in VALIDATOR_KEYS}
+                entry.update(url=tab_url, **{key: value for key, value in (validators or {}).items() if value})
+                self._append_index(entry)
+            else:
+                if previous is not None:
+                    name = previous['name']
+                else:
+                    names = candidate_names(filename, tab_url, sha256)
+                    name = next(n for n in names if n not in self._names)
+                    if name != os.path.basename(filename):
+                        self.counts['renamed'] += 1
+                how, entry = STORED, self._append_entry(name, writer, tab_url, validators)
+            self._remember(entry)
+            self.counts[how] += 1
+            if how != STORED:
+                self.bytes_saved += writer.size
+        writer.discard()
+        writer.path = self._entry_path(entry)
+        return writer.path, how
+
+    def _append_entry(self, name: str, writer: EntryBuffer, tab_url: str, validators: Optional[dict] = None) -> dict:
+        info = tarfile.TarInfo(name)
+        info.size = writer.size
+        info.mtime = int(time.time())
+        info.mode = FILE_MODE
+        if self._tar is None:
+            self._open_archive()
+        # A non-empty archive is rotated if this entry would take its finished size past max_bytes
+        if self._tar.offset and self._finished_size(self._tar.offset + self._entry_size(info)) > self.max_bytes:
+            self._close_archive()
+            self._number += 1
+            self._open_archive()
+        offset = self._tar.offset
+        self._tar.addfile(info, writer.fileobj())
+        # The data must be on disk before the index points at it
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        entry = {'url': tab_url, 'archive': os.path.basename(self._archive_path(self._number)), 'name': name,
+                 'sha256': writer.sha256, 'size': writer.size, 'offset': offset, 'end': self._tar.offset}
+        entry.update((key, value) for key, value in (validators or {}).items() if value)
+        self._append_index(entry)
+        return entry
+
+    def _entry_size(self, info: tarfile.TarInfo) -> int:
+        """Bytes `info` takes in the archive: its header blocks (PAX ones included) and its padded data"""
+        header = len(info.tobuf(self._tar.format, self._tar.encoding, self._tar.errors))
+        blocks = -(-info.size // tarfile.BLOCKSIZE)
+        return header + blocks * tarfile.BLOCKSIZE
+
+    @staticmethod
+    def _finished_size(offset: int) -> int:
+        """File size once closed at `offset`: the end-of-archive blocks, padded to a whole record"""
+        end = offset + 2 * tarfile.BLOCKSIZE
+        return -(-end // tarfile.RECORDSIZE) * tarfile.RECORDSIZE
+
+    def _append_index(self, entry: dict) -> None:
+        if self._index is None:
+            self._open_archive()
+        self._index.write(json.dumps(entry) + '\n')
+        self._index.flush()
+
+    def print_stats(self) -> None:
+        print(f"🗜️  Archive output ({self.directory}): {self.counts[STORED]} archived, "
+              f"{self.counts[LINKED]} deduplicated, {self.counts[UNCHANGED]} unchanged, "
+              f"{self.counts[REVALIDATED]} not modified on the server "
+              f"({self.bytes_saved / 1e6:.1f} MB not rewritten), {self.counts['renamed']} renamed, "
+              f"{self.counts['archives']} archive(s) written to")
+
+    def close(self) -> None:
+        """Finish the current archive (end-of-archive blocks), so it is a complete tar file"""
+        with self._lock:
+            self._close_archive()
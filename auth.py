@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Session-wide authentication state for Ultimate Guitar downloads
+The first tab page tells us whether the cookies are logged in; the answer is cached
+for the whole session. Once any response comes back anonymous the session is marked
+expired and every worker stops (or pauses until the cookies file is refreshed), so
+expired cookies cost one wasted request instead of one per remaining tab.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+
+UNKNOWN = 'unknown'
+AUTHENTICATED = 'authenticated'
+EXPIRED = 'expired'
+
+ON_EXPIRED_ABORT = 'abort'
+ON_EXPIRED_PAUSE = 'pause'
+ON_EXPIRED_CHOICES = (ON_EXPIRED_ABORT, ON_EXPIRED_PAUSE)
+
+# How often waiting workers look at the probe result / the cookies file
+PROBE_POLL_INTERVAL = 0.05
+PAUSE_POLL_INTERVAL = 2.0
+
+
+class AuthExpiredError(Exception):
+    """The session is (no longer) logged in; retrying with the same cookies cannot help"""
+    transient = False
+
+
+def _mtime(path: Optional[str]) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime if path else None
+    except OSError:
+        return None
+
+
+class AuthState:
+    def __init__(self, on_expired: str = ON_EXPIRED_ABORT, cookies_file: Optional[str] = None,
+                 reload_cookies: Optional[Callable[[], None]] = None):
+        """
+        Shared, thread-safe auth status for one download session
+        on_expired: 'abort' stops the queue, 'pause' holds it until cookies_file changes
+        cookies_file: cookies JSON watched while paused (pausing needs one, otherwise we abort)
+        reload_cookies: called once the cookies file changed, before downloads resume
+        """
+        if on_expired not in ON_EXPIRED_CHOICES:
+            raise ValueError(f"on_expired must be one of {ON_EXPIRED_CHOICES}")
+        self.pause = on_expired == ON_EXPIRED_PAUSE and cookies_file is not None
+        self.cookies_file = cookies_file
+        self.reload_cookies = reload_cookies
+        self.status = UNKNOWN
+        self.username = None
+        self.user_id = None
+        self.anonymous_responses = 0
+        self._probing = False
+        self._expired_mtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def expired(self) -> bool:
+        return self.status == EXPIRED
+
+    def observe_user(self, user_info: dict, source: str) -> None:
+        """
+        Feed the `store.user` block of a page; raises AuthExpiredError if it is anonymous
+        source: what the block came from, for the status message
+        """
+        user_id = user_info.get('id', 0)
+        if user_id:
+            self._authenticated(user_id, user_info.get('username', 'unknown'))
+        else:
+            self._anonymous(f"{source} came back anonymous (user_id: 0)")
+
+    def observe_unified_id(self, unified_id: Optional[str], source: str) -> None:
+        """Same as observe_user for the x-ug-unified-id response header (missing headers are ignored)"""
+        if unified_id is None:
+            return
+        if unified_id != '0':
+            self._authenticated(unified_id, self.username or 'unknown')
+        else:
+            self._anonymous(f"{source} came back anonymous (x-ug-unified-id=0)")
+
+    def _authenticated(self, user_id, username: str) -> None:
+        with self._lock:
+            if self.status != UNKNOWN:
+                return
+            self.status = AUTHENTICATED
+            self.user_id = user_id
+            self.username = username
+        print(f"✅ Authenticated as '{username}' (user_id: {user_id}), auth is not re-checked per tab")
+
+    def _anonymous(self, reason: str) -> None:
+        with self._lock:
+            self.anonymous_responses += 1
+            first = self.status != EXPIRED
+            if first:
+                self.status = EXPIRED
+                self._expired_mtime = _mtime(self.cookies_file)
+        if first:
+            if self.user_id is not None:
+                print(f"\n🔒 SESSION EXPIRED: {reason}")
+            else:
+                print(f"\n🔒 NOT AUTHENTICATED: {reason}")
+            if self.pause:
+                print(f"⏸️  Pausing all downloads until {self.cookies_file} is updated with fresh cookies...")
+            else:
+                print("⏹️  Stopping the queue, the remaining tabs are left for a later --resume")
+            print("💡 Export fresh cookies from your browser (see --help-cookies)")
+        raise AuthExpiredError(reason)
+
+    def _try_resume(self) -> bool:
+        """While paused: resume if the cookies file changed since we expired"""
+        with self._lock:
+            if self.status != EXPIRED:
+                return True
+            if _mtime(self.cookies_file) == self._expired_mtime:
+                return False
+            if self.reload_cookies is not None:
+                self.reload_cookies()
+            self.status = UNKNOWN
+        print(f"▶️  {self.cookies_file} changed, resuming downloads")
+        return True
+
+    def _enter(self) -> Optional[bool]:
+        """
+        One step of wait(): True if the caller must probe auth, False if it may go ahead,
+        None if it has to keep waiting
+        """
+        if self.status == EXPIRED:
+            if not self.pause:
+                raise AuthExpiredError("session is not authenticated")
+            if not self._try_resume():
+                return None
+        with self._lock:
+            if self.status != UNKNOWN:
+                return False
+            if self._probing:
+                return None
+            self._probing = True
+            return True
+
+    def wait(self) -> bool:
+        """
+        Block until a request may be sent; raises AuthExpiredError once the session expired (abort mode)
+        Until auth is known only one caller is let through; it gets True and must call release() when done.
+        """
+        while True:
+            probing = self._enter()
+            if probing is not None:
+                return probing
+            time.sleep(PAUSE_POLL_INTERVAL if self.status == EXPIRED else PROBE_POLL_INTERVAL)
+
+    async def wait_async(self) -> bool:
+        while True:
+            probing = self._enter()
+            if probing is not None:
+                return probing
+            await asyncio.sleep(PAUSE_POLL_INTERVAL if self.status == EXPIRED else PROBE_POLL_INTERVAL)
+
+    def release(self) -> None:
+        """End of the probing request; if it could not tell, the next caller probes"""
+        with self._lock:
+            self._probing = False
+
+    def print_status(self) -> None:
+        if self.status == AUTHENTICATED:
+            print(f"🔐 Auth: logged in as '{self.username}'")
+        elif self.status == EXPIRED:
+            print(f"🔐 Auth: session expired ({self.anonymous_responses} anonymous responses)")
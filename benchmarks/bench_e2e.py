@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark: scrape and download against a local mock Ultimate Guitar
+Starts benchmarks/mock_ug_server.py in a separate process (so it does not count
+towards our memory), scrapes its artists with UGArtistScraper, downloads every
+tab with UGDownloader and reports throughput, latency percentiles and peak RSS.
+No network access and no real account are needed, so runs are reproducible.
+
+Usage: python benchmarks/bench_e2e.py [--artists 4] [--latency-ms 30] [--throttle-rate 0.02] [--refresh] [--json out.json]
+"""
+
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from main import UGDownloader, download_batch, DEFAULT_CONCURRENCY  # noqa: E402
+from scraper import UGArtistScraper, DEFAULT_ARTIST_WORKERS  # noqa: E402
+from ratelimit import RateController  # noqa: E402
+from retry import RetryPolicy, DEFAULT_RETRIES  # noqa: E402
+from metrics import percentile, print_summary  # noqa: E402
+from selection import BestVersions, SELECT_POLICIES, DEFAULT_SELECT_POLICY  # noqa: E402
+from events import add_event_arguments, bus_from_args  # noqa: E402
+from extract import DEFAULT_DRAIN_LIMIT  # noqa: E402
+from mock_ug_server import MockUGServer, add_config_arguments, config_from_args  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# High enough that the mock server, not our pacing, is what gets measured
+BENCH_RATE = 1000.0
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _serve(config, conn) -> None:
+    server = MockUGServer(config)
+    conn.send(server.start())
+    conn.recv()
+    conn.send(server.counts)
+    server.shutdown()
+
+
+@contextlib.contextmanager
+def mock_server(config):
+    """Run a MockUGServer in a child process; yields (base_url, counts) where counts is filled on exit"""
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(config, child), daemon=True)
+    process.start()
+    counts = {}
+    try:
+        yield parent.recv(), counts
+    finally:
+        parent.send('stop')
+        counts.update(parent.recv())
+        process.join(5)
+
+
+def run(args, base_url: str, workdir: str) -> dict:
+    rate_controller = RateController(args.rate_limit, max(args.rate_limit, BENCH_RATE))
+    retry_policy = RetryPolicy(args.retries, base_delay=args.retry_base_delay)
+    downloader = UGDownloader(output_dir=os.path.join(workdir, 'output'), base_url=base_url,
+                              max_connections=max(2 * args.concurrency, args.workers * args.page_concurrency),
+                              rate_controller=rate_controller, retry_policy=retry_policy,
+                              events=bus_from_args(args), drain_limit=args.drain_kb * 1024)
+    best_versions = BestVersions(args.best, args.best_by) if args.best else None
+    scraper = UGArtistScraper(session=downloader.session, retry_policy=retry_policy, best_versions=best_versions,
+                              drain_limit=downloader.drain_limit)
+    artist_urls = [f'{base_url}/artist/bench_{i}' for i in range(1, args.artists + 1)]
+
+    # Time each tab end to end (page, token, file) for latency percentiles
+    latencies = []
+    download_tab_async = downloader.download_tab_async
+
+    async def timed_download(tab_url: str) -> bool:
+        started = time.perf_counter()
+        try:
+            return await download_tab_async(tab_url)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    downloader.download_tab_async = timed_download
+
+    output = sys.stdout if args.verbose else open(os.devnull, 'w')
+    with contextlib.redirect_stdout(output):
+        started = time.perf_counter()
+        tab_urls, _ = scraper.scrape_artists(artist_urls, os.path.join(workdir, 'urls.txt'), args.workers,
+                                             args.page_concurrency)
+        scrape_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        success_count, failed_urls = download_batch(downloader, sorted(tab_urls), args.concurrency)
+        download_seconds = time.perf_counter() - started
+    downloader.close()
+    refresh = refresh_pass(args, base_url, workdir, sorted(tab_urls), output) if args.refresh else None
+
+    latencies.sort()
+    snapshot = downloader.metrics_snapshot()
+    return {
+        'scrape': {
+            'artists': len(artist_urls),
+            'pages': snapshot['counters'].get('listing_pages', 0),
+            'tabs_found': len(tab_urls),
+            'seconds': scrape_seconds,
+            'pages_per_second': snapshot['counters'].get('listing_pages', 0) / scrape_seconds if scrape_seconds else 0.0,
+        },
+        'download': {
+            'tabs': len(tab_urls),
+            'downloaded': success_count,
+            'failed': len(failed_urls),
+            'seconds': download_seconds,
+            'tabs_per_second': success_count / download_seconds if download_seconds else 0.0,
+            'latency_seconds': {f'p{q * 100:g}': percentile(latencies, q) for q in (0.5, 0.95, 0.99)},
+        },
+        'refresh': refresh,
+        'metrics': snapshot,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def refresh_pass(args, base_url: str, workdir: str, tab_urls: list, output) -> dict:
+    """Download the same tabs again into the same output in refresh mode (conditional requests)"""
+    downloader = UGDownloader(output_dir=os.path.join(workdir, 'output'), base_url=base_url,
+                              max_connections=2 * args.concurrency,
+                              rate_controller=RateController(args.rate_limit, max(args.rate_limit, BENCH_RATE)),
+                              retry_policy=RetryPolicy(args.retries, base_delay=args.retry_base_delay),
+                              events=bus_from_args(args), refresh=True, drain_limit=args.drain_kb * 1024)
+    with contextlib.redirect_stdout(output):
+        started = time.perf_counter()
+        success_count, failed_urls = download_batch(downloader, tab_urls, args.concurrency)
+        seconds = time.perf_counter() - started
+    downloader.close()
+    counters = downloader.metrics_snapshot()['counters']
+    return {
+        'tabs': len(tab_urls),
+        'refreshed': success_count,
+        'failed': len(failed_urls),
+        'not_modified': counters.get('files_revalidated', 0),
+        'seconds': seconds,
+        'bytes_received': counters.get('bytes_received', 0),
+        'bytes_written': counters.get('bytes_written', 0),
+    }
+
+
+def report(results: dict) -> None:
+    scrape, download = results['scrape'], results['download']
+    print(f"[SCRAPE]   {scrape['artists']} artists, {scrape['pages']} pages, {scrape['tabs_found']} tabs "
+          f"in {scrape['seconds']:.2f}s ({scrape['pages_per_second']:.1f} pages/s)")
+    latency = download['latency_seconds']
+    print(f"[DOWNLOAD] {download['downloaded']}/{download['tabs']} tabs in {download['seconds']:.2f}s "
+          f"({download['tabs_per_second']:.1f} tabs/s), per-tab latency p50/p95/p99 "
+          f"{latency['p50'] * 1000:.0f}/{latency['p95'] * 1000:.0f}/{latency['p99'] * 1000:.0f} ms")
+    print_summary(results['metrics'])
+    counters = results['metrics']['counters']
+    received, skipped = counters.get('bytes_received', 0), counters.get('bytes_skipped', 0)
+    if received + skipped:
+        print(f"[EARLY EXIT] {skipped / 1e6:.1f} MB of response bodies not read, "
+              f"{100 * skipped / (received + skipped):.0f}% of {(received + skipped) / 1e6:.1f} MB of bodies")
+    refresh = results.get('refresh')
+    if refresh:
+        print(f"[REFRESH]  {refresh['refreshed']}/{refresh['tabs']} tabs in {refresh['seconds']:.2f}s, "
+              f"{refresh['not_modified']} not modified, {refresh['bytes_received'] / 1e6:.1f} MB received, "
+              f"{refresh['bytes_written'] / 1e6:.1f} MB written")
+    if results['peak_rss_mb'] is not None:
+        print(f"[MEMORY]   peak RSS {results['peak_rss_mb']:.1f} MB")
+    if results.get('server'):
+        print(f"[SERVER]   {results['server']}")
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark scraping and downloading against a local mock Ultimate Guitar')
+    parser.add_argument('--artists', type=int, default=4, help='Artists to scrape (default: 4)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_ARTIST_WORKERS,
+                        help=f'Artists scraped at once (default: {DEFAULT_ARTIST_WORKERS})')
+    parser.add_argument('--page-concurrency', type=int, default=2,
+                        help='Listing pages fetched at once per artist (default: 2)')
+    parser.add_argument('--concurrency', '-j', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Tabs downloaded at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--rate-limit', type=float, default=BENCH_RATE,
+                        help=f'Starting requests/second per host (default: {BENCH_RATE:g}, i.e. effectively unpaced)')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help=f'Retries for injected 429/503s (default: {DEFAULT_RETRIES})')
+    parser.add_argument('--retry-base-delay', type=float, default=0.1,
+                        help='Backoff base delay in seconds (default: 0.1)')
+    parser.add_argument('--drain-kb', type=int, default=DEFAULT_DRAIN_LIMIT // 1024,
+                        help=f'KiB of a page read past its blob to keep the connection (default: {DEFAULT_DRAIN_LIMIT // 1024})')
+    parser.add_argument('--best', type=int, default=0,
+                        help='Download only the best N versions of each song (default: 0, all)')
+    parser.add_argument('--best-by', choices=SELECT_POLICIES, default=DEFAULT_SELECT_POLICY,
+                        help=f'Ranking for --best (default: {DEFAULT_SELECT_POLICY})')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Then download every tab again in refresh mode and report what was transferred')
+    parser.add_argument('--base-url',
+                        help='Benchmark an already running mock server instead of starting one')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    parser.add_argument('--verbose', action='store_true', help="Show the tools' own output")
+    add_event_arguments(parser)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    config = config_from_args(args)
+    print(f"[BENCH] {args.artists} artists x {config.tabs_per_artist} tabs, pages {config.page_kb} KiB, "
+          f"files {config.file_kb} KiB, latency {config.latency_ms:g} ms, "
+          f"429 rate {config.throttle_rate:g}, 503 rate {config.error_rate:g}")
+
+    with tempfile.TemporaryDirectory(prefix='ug-bench-') as workdir:
+        if args.base_url:
+            results = run(args, args.base_url.rstrip('/'), workdir)
+        else:
+            with mock_server(config) as (base_url, server_counts):
+                results = run(args, base_url, workdir)
+            results['server'] = server_counts
+    results['config'] = vars(args)
+
+    report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"[BENCH] Results saved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
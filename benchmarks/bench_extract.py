@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: streaming data-content extraction vs whole-document regex
+Builds synthetic pages and compares time and peak memory of both paths, then
+times decoding the blob (stdlib html.unescape + json.loads vs the fast path)
+
+Usage: python benchmarks/bench_extract.py [--page-kb 800] [--position start|middle|end]
+"""
+
+import html
+import json
+import re
+import os
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from extract import (extract_data_content, search_data_content, unescape_attribute, loads,  # noqa: E402
+                     JSON_BACKEND, PAGE_CHUNK_SIZE)
+
+
+def build_page(page_kb: int, position: str, tabs: int = 50) -> bytes:
+    """Synthetic artist page with the data-content blob at the given position"""
+    store = {
+        "store": {
+            "user": {"id": 12345, "username": "bench"},
+            "page": {"data": {
+                "other_tabs": [{"id": i, "song_name": f"Song {i}", "artist_name": "Bench \"Band\"",
+                                "type_name": "Guitar Pro", "version": i % 3,
+                                "tab_url": f"https://tabs.ultimate-guitar.com/tab/bench/song-{i}-guitar-pro-{i}"}
+                               for i in range(tabs)],
+                "pagination": {"current": 1, "pages": [{"page": p} for p in range(1, 11)]},
+            }},
+        }
+    }
+    blob = f'<div class="js-store" data-content="{html.escape(json.dumps(store), quote=True)}"></div>'
+    filler_size = max(0, page_kb * 1024 - len(blob))
+    filler = ('<div class="x">' + 'lorem ipsum ' * 8 + '</div>\n') * (filler_size // 113 + 1)
+    filler = filler[:filler_size]
+    split = {'start': 0, 'middle': len(filler) // 2, 'end': len(filler)}[position]
+    return ('<html><body>' + filler[:split] + blob + filler[split:] + '</body></html>').encode('utf-8')
+
+
+def chunked(body: bytes, size: int = PAGE_CHUNK_SIZE):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+def regex_path(body: bytes):
+    # What the code did before: decode the full body to str, then regex it
+    return search_data_content(body.decode('utf-8'))
+
+
+def streaming_path(body: bytes):
+    return extract_data_content(chunked(body), drain_limit=0)
+
+
+def streaming_bytes_read(body: bytes) -> int:
+    """How much of the body the streaming path reads before it stops"""
+    read = 0
+
+    def counted():
+        nonlocal read
+        for chunk in chunked(body):
+            read += len(chunk)
+            yield chunk
+
+    extract_data_content(counted(), drain_limit=0)
+    return read
+
+
+def stdlib_decode(raw_blob: str):
+    return json.loads(html.unescape(raw_blob))
+
+
+def fast_decode(raw_blob: str):
+    return loads(unescape_attribute(raw_blob))
+
+
+def measure(func, body: bytes, repeat: int):
+    func(body)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(body)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    func(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark data-content extraction strategies')
+    parser.add_argument('--page-kb', type=int, default=800, help='Synthetic page size in KiB (default: 800)')
+    parser.add_argument('--position', choices=['start', 'middle', 'end'], default=None,
+                        help='Where the blob sits in the page (default: all three)')
+    parser.add_argument('--repeat', type=int, default=50, help='Iterations per measurement (default: 50)')
+    args = parser.parse_args()
+
+    positions = [args.position] if args.position else ['start', 'middle', 'end']
+    print(f"[BENCH] page size {args.page_kb} KiB, {args.repeat} iterations, chunk {PAGE_CHUNK_SIZE // 1024} KiB")
+    print(f"{'position':<8} {'path':<10} {'time/page':>12} {'peak mem':>12}")
+    for position in positions:
+        body = build_page(args.page_kb, position)
+        results = []
+        for name, func in (('regex', regex_path), ('streaming', streaming_path)):
+            result, elapsed, peak = measure(func, body, args.repeat)
+            results.append(result)
+            print(f"{position:<8} {name:<10} {elapsed * 1000:>9.3f} ms {peak / 1024:>9.1f} KiB")
+        assert results[0] == results[1], "extractors disagree"
+        read = streaming_bytes_read(body)
+        print(f"{position:<8} early exit: read {read / 1024:.0f} of {len(body) / 1024:.0f} KiB "
+              f"({100 * (1 - read / len(body)):.0f}% of the page not read)")
+
+    # Decoding the blob once it is found
+    raw_blob = re.search(r'data-content="({.+?})"', build_page(args.page_kb, 'middle').decode('utf-8')).group(1)
+    print(f"\n{'decode':<19} {'time/page':>12} {'peak mem':>12}")
+    results = []
+    for name, func in (('stdlib', stdlib_decode), (f'fast ({JSON_BACKEND})', fast_decode)):
+        result, elapsed, peak = measure(func, raw_blob, args.repeat)
+        results.append(result)
+        print(f"{name:<19} {elapsed * 1000:>9.3f} ms {peak / 1024:>9.1f} KiB")
+    assert results[0] == results[1], "decoders disagree"
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Ultimate Guitar used by the offline benchmarks
+Serves synthetic artist listings, tab pages and downloads shaped like the real
+site (data-content blob with store.user, tab_view.binary_id, other_tabs and
+pagination), with optional latency, 429 throttling and 5xx errors.
+
+Usage: python benchmarks/mock_ug_server.py [--port 8765] [--latency-ms 50] [--throttle-rate 0.05]
+Then point the tools at it, e.g. python scraper.py http://127.0.0.1:8765/artist/bench_1
+"""
+
+import html
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+
+DEFAULT_TABS_PER_ARTIST = 120
+DEFAULT_TABS_PER_PAGE = 50
+DEFAULT_PAGE_KB = 300
+DEFAULT_FILE_KB = 40
+DEFAULT_RETRY_AFTER = 1
+
+
+class MockConfig:
+    def __init__(self, tabs_per_artist: int = DEFAULT_TABS_PER_ARTIST, tabs_per_page: int = DEFAULT_TABS_PER_PAGE,
+                 page_kb: int = DEFAULT_PAGE_KB, file_kb: int = DEFAULT_FILE_KB, latency_ms: float = 0.0,
+                 throttle_rate: float = 0.0, retry_after: int = DEFAULT_RETRY_AFTER, error_rate: float = 0.0,
+                 anonymous: bool = False, seed: int = 0, versions_per_song: int = 1, validators: bool = True):
+        """
+        Shape of the synthetic site and the faults injected into it
+        tabs_per_artist, tabs_per_page: size of every artist's Guitar Pro listing
+        page_kb, file_kb: size of tab/artist pages and of downloaded files
+        latency_ms: mean delay before each response (uniformly jittered by +-50%)
+        throttle_rate, retry_after: share of requests answered 429 with this Retry-After
+        error_rate: share of requests answered 503
+        anonymous: serve pages as to a logged-out user (store.user.id = 0)
+        seed: makes injected faults reproducible
+        versions_per_song: list each song this many times, as versions 1..N with different ratings
+        validators: send ETag/Last-Modified with downloads and answer matching conditional requests with 304
+        """
+        self.tabs_per_artist = tabs_per_artist
+        self.tabs_per_page = tabs_per_page
+        self.page_kb = page_kb
+        self.file_kb = file_kb
+        self.latency_ms = latency_ms
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.anonymous = anonymous
+        self.seed = seed
+        self.versions_per_song = max(1, versions_per_song)
+        self.validators = validators
+
+
+def _page(store: dict, page_kb: int) -> bytes:
+    """HTML page of about page_kb KiB with the store in a data-content attribute in the middle"""
+    blob = f'<div class="js-store" data-content="{html.escape(json.dumps({"store": store}), quote=True)}"></div>'
+    filler_size = max(0, page_kb * 1024 - len(blob))
+    filler = (('<div class="x">' + 'lorem ipsum ' * 8 + '</div>\n') * (filler_size // 113 + 1))[:filler_size]
+    half = len(filler) // 2
+    return ('<html><body>' + filler[:half] + blob + filler[half:] + '</body></html>').encode('utf-8')
+
+
+def _artist_tab_id(artist_slug: str, index: int) -> int:
+    # Stable and distinct per artist, like real tab IDs
+    return (zlib.crc32(artist_slug.encode()) % 100000) * 10000 + index
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without TCP_NODELAY delayed ACKs add ~40 ms
+    disable_nagle_algorithm = True
+    server: 'MockUGServer'
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes = b'', content_type: str = 'text/html; charset=utf-8',
+              headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        server, config = self.server, self.server.config
+
+        if config.latency_ms:
+            time.sleep(config.latency_ms / 1000 * server.random(0.5, 1.5))
+        if server.random() < config.throttle_rate:
+            server.count('throttled')
+            return self._send(429, headers={'Retry-After': str(config.retry_after)})
+        if server.random() < config.error_rate:
+            server.count('errors')
+            return self._send(503, b'injected error')
+
+        user = {'id': 0, 'username': 'anonymous'} if config.anonymous else {'id': 4242, 'username': 'bench'}
+        base = f'http://{self.headers.get("Host")}'
+        if url.path.startswith('/artist/'):
+            server.count('listing_pages')
+            return self._send(200, self._artist_page(url.path.split('/')[2], query, user, base))
+        if url.path == '/tab/download':
+            binary_id = query.get('id', ['unknown'])[0]
+            body = (binary_id.encode() * (config.file_kb * 1024 // max(1, len(binary_id)) + 1))[:config.file_kb * 1024]
+            headers = {'Content-Disposition': f'attachment; filename="{binary_id}.gp5"'}
+            if config.validators:
+                headers['ETag'] = f'"{zlib.crc32(body):08x}"'
+                headers['Last-Modified'] = 'Mon, 01 Jan 2024 00:00:00 GMT'
+                if self.headers.get('If-None-Match') == headers['ETag']:
+                    server.count('not_modified')
+                    return self._send(304, headers={'ETag': headers['ETag']})
+            server.count('downloads')
+            return self._send(200, body, 'application/octet-stream', headers)
+        if url.path.startswith('/tab/'):
+            server.count('tab_pages')
+            # /tab/<artist>/<song>-guitar-pro-<id> or just /tab/<id>
+            tab_id = re.search(r'(\d+)$', url.path.rstrip('/'))
+            tab_id = tab_id.group(1) if tab_id else url.path.rsplit('-', 1)[-1]
+            store = {'user': user, 'page': {'data': {'tab_view': {'binary_id': f'BENCH{tab_id}'}}}}
+            return self._send(200, _page(store, config.page_kb))
+        if url.path == '/':
+            return self._send(200, b'<html></html>', headers={'x-ug-unified-id': str(user['id'])})
+        self._send(404, b'not found')
+
+    def _artist_page(self, artist_slug: str, query: dict, user: dict, base: str) -> bytes:
+        config = self.server.config
+        pages = max(1, math.ceil(config.tabs_per_artist / config.tabs_per_page))
+        page_num = min(max(1, int(query.get('page', ['1'])[0])), pages)
+        first = (page_num - 1) * config.tabs_per_page
+        tabs = []
+        for index in range(first, min(first + config.tabs_per_page, config.tabs_per_artist)):
+            tab_id = _artist_tab_id(artist_slug, index)
+            song, version = divmod(index, config.versions_per_song)
+            tabs.append({
+                'id': tab_id,
+                'song_name': f'Song {song}',
+                'artist_name': artist_slug,
+                'type_name': 'Guitar Pro',
+                'version': version + 1,
+                'date': str(1600000000 + index),
+                'rating': round(3 + (tab_id % 200) / 100, 2),
+                'votes': tab_id % 97,
+                'tab_url': f'{base}/tab/{artist_slug}/song-{index}-guitar-pro-{tab_id}',
+            })
+        store = {'user': user, 'page': {'data': {
+            'artist': {'name': artist_slug},
+            'other_tabs': tabs,
+            'pagination': {'current': page_num, 'pages': [{'page': p} for p in range(1, pages + 1)]},
+        }}}
+        return _page(store, config.page_kb)
+
+
+class MockUGServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = '127.0.0.1', port: int = 0):
+        """HTTP/1.1 keep-alive server; port 0 picks a free port (see base_url)"""
+        super().__init__((host, port), _Handler)
+        self.config = config or MockConfig()
+        self.counts = {}
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def random(self, low: float = 0.0, high: float = 1.0) -> float:
+        with self._lock:
+            return self._random.uniform(low, high)
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def start(self) -> str:
+        """Serve from a daemon thread; returns the base URL"""
+        threading.Thread(target=self.serve_forever, name='mock-ug-server', daemon=True).start()
+        return self.base_url
+
+
+def add_config_arguments(parser: ArgumentParser) -> None:
+    """CLI options for a MockConfig, shared with the benchmark harness"""
+    parser.add_argument('--tabs-per-artist', type=int, default=DEFAULT_TABS_PER_ARTIST,
+                        help=f'Guitar Pro tabs listed per artist (default: {DEFAULT_TABS_PER_ARTIST})')
+    parser.add_argument('--tabs-per-page', type=int, default=DEFAULT_TABS_PER_PAGE,
+                        help=f'Tabs per listing page (default: {DEFAULT_TABS_PER_PAGE})')
+    parser.add_argument('--page-kb', type=int, default=DEFAULT_PAGE_KB,
+                        help=f'Size of artist and tab pages in KiB (default: {DEFAULT_PAGE_KB})')
+    parser.add_argument('--file-kb', type=int, default=DEFAULT_FILE_KB,
+                        help=f'Size of downloaded tab files in KiB (default: {DEFAULT_FILE_KB})')
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='Mean injected delay per response in ms (default: 0)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help='Share of requests answered with 429 (default: 0)')
+    parser.add_argument('--retry-after', type=int, default=DEFAULT_RETRY_AFTER,
+                        help=f'Retry-After seconds sent with 429s (default: {DEFAULT_RETRY_AFTER})')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Share of requests answered with 503 (default: 0)')
+    parser.add_argument('--anonymous', action='store_true',
+                        help='Serve pages as to a logged-out user')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for injected faults (default: 0)')
+    parser.add_argument('--versions-per-song', type=int, default=1,
+                        help='Versions listed per song, for --best selection (default: 1)')
+    parser.add_argument('--no-validators', dest='validators', action='store_false',
+                        help='Send downloads without ETag/Last-Modified and ignore conditional requests')
+
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(args.tabs_per_artist, args.tabs_per_page, args.page_kb, args.file_kb, args.latency_ms,
+                      args.throttle_rate, args.retry_after, args.error_rate, args.anonymous, args.seed,
+                      args.versions_per_song, args.validators)
+
+
+def main():
+    parser = ArgumentParser(description='Serve a synthetic Ultimate Guitar for offline benchmarks')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockUGServer(config_from_args(args), port=args.port)
+    print(f"[MOCK] Serving a synthetic Ultimate Guitar on {server.base_url}")
+    print(f"[MOCK] Try: python scraper.py {server.base_url}/artist/bench_1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n[MOCK] Stopped, requests served: {server.counts}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Persistent HTTP response cache for Ultimate Guitar pages
+SQLite-backed, with per-URL-class TTLs, ETag/Last-Modified revalidation
+and size-bounded LRU eviction. Plugged in as an httpx transport. Pages are
+streamed through to the caller and only their data-content blob is kept, so
+reading a page can still stop early and the cache holds a few KiB per page.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from extract import DataContentExtractor
+
+
+CACHE_FILENAME = 'http_cache.sqlite'
+DEFAULT_CACHE_MAX_MB = 512
+
+# URL classes that can be cached (see classify_url)
+CACHE_CLASSES = ('artist', 'tab')
+
+# Seconds an entry is served without contacting the server, per URL class.
+# Classes without a TTL are never cached: tab pages carry the download token and the
+# user's auth state, so they are only cached on request (--cache-ttl tab=SECONDS).
+DEFAULT_TTLS = {
+    'artist': 3600,
+}
+
+# Headers that describe the wire encoding; cached bodies are stored decoded
+_DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+
+def classify_url(url: str) -> Optional[str]:
+    """URL class used to pick a TTL: 'artist', 'tab' or None for uncacheable URLs"""
+    path = urlparse(url).path
+    if path.startswith('/artist/'):
+        return 'artist'
+    if path.startswith('/tab/') and not path.startswith('/tab/download'):
+        return 'tab'
+    return None
+
+
+def blob_page(blob: bytes) -> bytes:
+    """Smallest page with the same data-content blob, which is what gets cached"""
+    return b'<div class="js-store" data-content="' + blob + b'"></div>'
+
+
+def _decoded_headers(headers: httpx.Headers) -> list:
+    """Headers of the response as passed on decoded; Content-Length stays valid only for unencoded bodies"""
+    encoded = headers.get('content-encoding', 'identity').lower() != 'identity'
+    return [(k, v) for k, v in headers.multi_items()
+            if k.lower() not in _DROPPED_HEADERS or (k.lower() == 'content-length' and not encoded)]
+
+
+def parse_ttls(specs) -> Dict[str, int]:
+    """Parse CLI overrides like ['artist=600', 'tab=0'] on top of DEFAULT_TTLS"""
+    ttls = dict(DEFAULT_TTLS)
+    for spec in specs or []:
+        url_class, _, seconds = spec.partition('=')
+        if url_class not in CACHE_CLASSES or not seconds.isdigit():
+            raise ValueError(f"Invalid cache TTL '{spec}' (expected one of {list(CACHE_CLASSES)}=SECONDS)")
+        ttls[url_class] = int(seconds)
+    return ttls
+
+
+class HTTPCache:
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_CACHE_MAX_MB * 1024 * 1024,
+                 ttls: Optional[Dict[str, int]] = None):
+        """
+        Initialize the on-disk cache
+        cache_dir: directory holding the SQLite database
+        max_bytes: total body size kept before least-recently-used entries are evicted
+        ttls: seconds per URL class (see DEFAULT_TTLS); 0 means always revalidate
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, CACHE_FILENAME)
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY,
+            status INTEGER NOT NULL,
+            headers TEXT NOT NULL,
+            body BLOB NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            stored_at REAL NOT NULL,
+            last_access REAL NOT NULL,
+            size INTEGER NOT NULL
+        )''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)')
+        self._db.commit()
+        # Running total of the stored bodies, so stores need no full-table scan
+        self._total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        # last_access times of hits since the last write, flushed with the next store (url -> time)
+        self._accessed: Dict[str, float] = {}
+
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def ttl_for(self, url: str) -> Optional[int]:
+        """TTL for a URL, or None if the URL is not cacheable"""
+        url_class = classify_url(url)
+        if url_class is None:
+            return None
+        return self.ttls.get(url_class)
+
+    def lookup(self, url: str) -> Optional[dict]:
+        """Cached entry for `url` with a `fresh` flag, or None"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT status, headers, body, etag, last_modified, stored_at FROM responses WHERE url = ?',
+                (url,)).fetchone()
+            if row is None:
+                return None
+            self._accessed[url] = time.time()
+        status, headers, body, etag, last_modified, stored_at = row
+        ttl = self.ttl_for(url) or 0
+        return {
+            'status': status,
+            'headers': json.loads(headers),
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fresh': time.time() - stored_at < ttl,
+        }
+
+    def store(self, url: str, status: int, headers: httpx.Headers, body: bytes) -> None:
+        kept = [(k, v) for k, v in headers.multi_items() if k.lower() not in _DROPPED_HEADERS]
+        now = time.time()
+        with self._lock:
+            old = self._db.execute('SELECT size FROM responses WHERE url = ?', (url,)).fetchone()
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, status, json.dumps(kept), body, headers.get('etag'), headers.get('last-modified'),
+                 now, now, len(body)))
+            self._total += len(body) - (old[0] if old else 0)
+            self._accessed.pop(url, None)
+            if self._total > self.max_bytes:
+                self._evict()
+            self._flush_accesses()
+            self._db.commit()
+
+    def refresh(self, url: str, headers: httpx.Headers) -> None:
+        """Mark an entry fresh again after a 304, picking up any new validators"""
+        with self._lock:
+            self._db.execute(
+                'UPDATE responses SET stored_at = ?, etag = COALESCE(?, etag), '
+                'last_modified = COALESCE(?, last_modified) WHERE url = ?',
+                (time.time(), headers.get('etag'), headers.get('last-modified'), url))
+            self._db.commit()
+
+    def _flush_accesses(self) -> None:
+        """Write the pending last_access times (caller holds the lock and commits)"""
+        if self._accessed:
+            self._db.executemany('UPDATE responses SET last_access = ? WHERE url = ?',
+                                 [(accessed, url) for url, accessed in self._accessed.items()])
+            self._accessed.clear()
+
+    def _evict(self) -> None:
+        # Eviction order must see the hits since the last write
+        self._flush_accesses()
+        for url, size in self._db.execute('SELECT url, size FROM responses ORDER BY last_access').fetchall():
+            self._db.execute('DELETE FROM responses WHERE url = ?', (url,))
+            self._total -= size
+            if self._total <= self.max_bytes:
+                break
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.revalidated + self.misses
+        return {
+            'hits': self.hits,
+            'revalidated': self.revalidated,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.revalidated) / lookups if lookups else 0.0,
+        }
+
+    def print_stats(self) -> None:
+        stats = self.stats()
+        print(f"🗄️  Cache: {stats['hits']} hits, {stats['revalidated']} revalidated, "
+              f"{stats['misses']} misses (hit rate {stats['hit_rate']:.0%})")
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_accesses()
+            self._db.commit()
+            self._db.close()
+
+    # --- transport plumbing shared by the sync and async wrappers ---
+
+    def is_cacheable(self, request: httpx.Request) -> bool:
+        return request.method == 'GET' and self.ttl_for(str(request.url)) is not None
+
+    def _prepare(self, request: httpx.Request):
+        """Returns (cached entry or None, serve_from_cache) and adds validators to the request"""
+        if not self.is_cacheable(request):
+            return None, False
+        entry = self.lookup(str(request.url))
+        if entry is None:
+            return None, False
+        if entry['fresh']:
+            self._count('hits')
+            return entry, True
+        if entry['etag']:
+            request.headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            request.headers['If-Modified-Since'] = entry['last_modified']
+        return entry, False
+
+    @staticmethod
+    def _cached_response(entry: dict, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(entry['status'], headers=entry['headers'], content=entry['body'],
+                              request=request, extensions={'from_cache': True})
+
+
+class _BlobTee:
+    def __init__(self, cache: HTTPCache, url: str, headers: httpx.Headers):
+        """Scans decoded page chunks on their way to the caller and caches the blob once it is complete"""
+        self.cache = cache
+        self.url = url
+        self.headers = headers
+        self.extractor = DataContentExtractor()
+
+    def feed(self, chunk: bytes) -> bool:
+        """True once, for the chunk that completes the blob; store() then caches it"""
+        return not self.extractor.done and self.extractor.feed(chunk)
+
+    def store(self) -> None:
+        self.cache.store(self.url, 200, self.headers, blob_page(self.extractor.blob))
+
+
+class _TeeStream(httpx.SyncByteStream):
+    def __init__(self, response: httpx.Response, tee: _BlobTee):
+        self._response = response
+        self._tee = tee
+
+    def __iter__(self):
+        for chunk in self._response.iter_bytes():
+            if self._tee.feed(chunk):
+                self._tee.store()
+            yield chunk
+
+    def close(self) -> None:
+        self._response.close()
+
+
+class _AsyncTeeStream(httpx.AsyncByteStream):
+    def __init__(self, response: httpx.Response, tee: _BlobTee):
+        self._response = response
+        self._tee = tee
+
+    async def __aiter__(self):
+        async for chunk in self._response.aiter_bytes():
+            if self._tee.feed(chunk):
+                await asyncio.to_thread(self._tee.store)
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._response.aclose()
+
+
+def _tee_response(cache: HTTPCache, request: httpx.Request, response: httpx.Response, stream_type) -> httpx.Response:
+    """`response`, decoded and still streaming, with its blob going to the cache on the way"""
+    decoder = httpx.Response(response.status_code, headers=response.headers, stream=response.stream,
+                             request=request, extensions=response.extensions)
+    tee = _BlobTee(cache, str(request.url), response.headers)
+    return httpx.Response(response.status_code, headers=_decoded_headers(response.headers),
+                          stream=stream_type(decoder, tee), request=request, extensions=response.extensions)
+
+
+class CachingTransport(httpx.BaseTransport):
+    def __init__(self, transport: httpx.BaseTransport, cache: HTTPCache):
+        """Wraps another transport and serves cacheable GETs from `cache`"""
+        self.transport = transport
+        self.cache = cache
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        entry, serve = self.cache._prepare(request)
+        if serve:
+            return self.cache._cached_response(entry, request)
+
+        response = self.transport.handle_request(request)
+        url = str(request.url)
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            self.cache._count('revalidated')
+            self.cache.refresh(url, response.headers)
+            return self.cache._cached_response(entry, request)
+        if not self.cache.is_cacheable(request):
+            return response
+        self.cache._count('misses')
+        if response.status_code == 200:
+            return _tee_response(self.cache, request, response, _TeeStream)
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncCachingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport, cache: HTTPCache):
+        """Async counterpart of CachingTransport; SQLite reads and writes run in a worker thread"""
+        self.transport = transport
+        self.cache = cache
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        entry, serve = None, False
+        if self.cache.is_cacheable(request):
+            entry, serve = await asyncio.to_thread(self.cache._prepare, request)
+        if serve:
+            return self.cache._cached_response(entry, request)
+
+        response = await self.transport.handle_async_request(request)
+        url = str(request.url)
+        if response.status_code == 304 and entry is not None:
+            await response.aclose()
+            self.cache._count('revalidated')
+            await asyncio.to_thread(self.cache.refresh, url, response.headers)
+            return self.cache._cached_response(entry, request)
+        if not self.cache.is_cacheable(request):
+            return response
+        self.cache._count('misses')
+        if response.status_code == 200:
+            return _tee_response(self.cache, request, response, _AsyncTeeStream)
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
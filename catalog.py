@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Local catalog of tab metadata from scraped artist listings
+Every listing entry the scraper sees (song, artist, type, version, rating, IDs) is
+kept in SQLite, so "what do we have for artist X" is a local query instead of a
+fresh multi-page scrape, and a query result can be fed straight to the downloader.
+
+Usage: python catalog.py [--artist NAME] [--song NAME] [--type "Guitar Pro"] [--version N] [--urls | --json]
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from argparse import ArgumentParser
+from typing import Iterable, List, Optional
+
+
+DEFAULT_CATALOG_FILE = 'catalog.sqlite'
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+# Listing fields with their own column; the whole entry is kept as JSON too
+COLUMNS = ('tab_id', 'song_id', 'artist_id', 'artist_name', 'song_name', 'type_name',
+           'version', 'rating', 'votes', 'date')
+_ENTRY_KEYS = {'tab_id': 'id'}
+
+
+def is_catalog(path: str) -> bool:
+    """Whether `path` is an SQLite file (i.e. a catalog rather than a URL list)"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+    except OSError:
+        return False
+
+
+class TabCatalog:
+    def __init__(self, path: str = DEFAULT_CATALOG_FILE):
+        """
+        Open (or create) a catalog database
+        path: SQLite file shared by every scrape
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS tabs (
+            tab_url TEXT PRIMARY KEY,
+            artist_url TEXT NOT NULL,
+            tab_id INTEGER,
+            song_id INTEGER,
+            artist_id INTEGER,
+            artist_name TEXT,
+            song_name TEXT,
+            type_name TEXT,
+            version INTEGER,
+            rating REAL,
+            votes INTEGER,
+            date TEXT,
+            data TEXT NOT NULL,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL
+        )''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS tabs_artist ON tabs(artist_name COLLATE NOCASE, song_name)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS tabs_artist_url ON tabs(artist_url)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS tabs_type ON tabs(type_name COLLATE NOCASE)')
+        self._db.commit()
+
+    def record(self, artist_url: str, tabs: Iterable[dict]) -> int:
+        """Upsert listing entries (any type) seen on one of the artist's pages; returns how many"""
+        now = time.time()
+        rows = [(tab['tab_url'], artist_url) + tuple(tab.get(_ENTRY_KEYS.get(column, column)) for column in COLUMNS)
+                + (json.dumps(tab), now, now)
+                for tab in tabs if tab.get('tab_url')]
+        placeholders = ', '.join('?' * (len(COLUMNS) + 5))
+        updates = ', '.join(f'{column} = excluded.{column}' for column in ('artist_url',) + COLUMNS + ('data', 'last_seen'))
+        with self._lock:
+            self._db.executemany(f'INSERT INTO tabs (tab_url, artist_url, {", ".join(COLUMNS)}, data, first_seen, '
+                                 f'last_seen) VALUES ({placeholders}) ON CONFLICT(tab_url) DO UPDATE SET {updates}',
+                                 rows)
+            self._db.commit()
+        return len(rows)
+
+    def query(self, artist: Optional[str] = None, song: Optional[str] = None, type_name: Optional[str] = None,
+              version: Optional[int] = None, limit: Optional[int] = None) -> List[dict]:
+        """
+        Catalog entries matching every given filter, by artist, song and version
+        artist, song: case-insensitive substrings of the names (artist also matches the artist URL)
+        type_name: exact type, case-insensitive (e.g. 'Guitar Pro'); version: exact version number
+        """
+        where, params = [], []
+        if artist:
+            where.append("(artist_name LIKE ? OR artist_url LIKE ?)")
+            params += [f'%{artist}%'] * 2
+        if song:
+            where.append("song_name LIKE ?")
+            params.append(f'%{song}%')
+        if type_name:
+            where.append("type_name = ? COLLATE NOCASE")
+            params.append(type_name)
+        if version is not None:
+            where.append("version = ?")
+            params.append(version)
+        sql = 'SELECT * FROM tabs'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY artist_name COLLATE NOCASE, song_name COLLATE NOCASE, version'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def urls(self, **filters) -> List[str]:
+        """Tab URLs of query(**filters), e.g. as a download batch"""
+        return [row['tab_url'] for row in self.query(**filters)]
+
+    def counts(self) -> dict:
+        with self._lock:
+            tabs, artists = self._db.execute('SELECT COUNT(*), COUNT(DISTINCT artist_url) FROM tabs').fetchone()
+        return {'tabs': tabs, 'artists': artists}
+
+    def print_summary(self) -> None:
+        counts = self.counts()
+        print(f"🗂️  Catalog ({self.path}): {counts['tabs']} tabs from {counts['artists']} artists")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def add_query_arguments(parser: ArgumentParser) -> None:
+    """Catalog filters, shared with main.py (which downloads the matching tabs)"""
+    parser.add_argument('--artist', help='Catalog query: artist name or URL contains this (case-insensitive)')
+    parser.add_argument('--song', help='Catalog query: song name contains this (case-insensitive)')
+    parser.add_argument('--type', dest='type_name', help='Catalog query: tab type, e.g. "Guitar Pro"')
+    parser.add_argument('--version', type=int, help='Catalog query: version number')
+
+
+def query_from_args(args) -> dict:
+    return {'artist': args.artist, 'song': args.song, 'type_name': args.type_name, 'version': args.version}
+
+
+def main():
+    parser = ArgumentParser(description='Query the local catalog of scraped tab metadata')
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG_FILE,
+                        help=f'Catalog database (default: {DEFAULT_CATALOG_FILE})')
+    add_query_arguments(parser)
+    parser.add_argument('--limit', type=int, help='Show at most this many tabs')
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--urls', action='store_true', help='Print only tab URLs (e.g. > batch.txt for main.py)')
+    output.add_argument('--json', action='store_true', help='Print matching entries as JSON lines')
+    args = parser.parse_args()
+
+    catalog = TabCatalog(args.catalog)
+    started = time.perf_counter()
+    rows = catalog.query(limit=args.limit, **query_from_args(args))
+    elapsed = time.perf_counter() - started
+    for row in rows:
+        if args.urls:
+            print(row['tab_url'])
+        elif args.json:
+            print(json.dumps({key: value for key, value in row.items() if key != 'data'}))
+        else:
+            version = f" (v{row['version']})" if row['version'] else ""
+            rating = f"  ★ {row['rating']:.2f} ({row['votes'] or 0} votes)" if row['rating'] is not None else ""
+            print(f"{row['artist_name']} - {row['song_name']}{version}  [{row['type_name']}]{rating}  {row['tab_url']}")
+    if not (args.urls or args.json):
+        print(f"\n[CATALOG] {len(rows)} tabs in {elapsed * 1000:.1f} ms")
+        catalog.print_summary()
+    catalog.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Shared on-disk cookie jar
+The cookies file is loaded once into every session and kept in sync with it: cookies
+the server refreshes with Set-Cookie are written back, and updates written by other
+workers or processes are picked up, so long batches stay logged in without manual
+re-exports. Reads and writes take a lock file next to the cookies file, and writes
+replace the file atomically. JSON (name -> value, or a browser extension's list of
+cookie objects) and Netscape cookies.txt files are read and written in their own format.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+
+FORMAT_JSON = 'json'
+FORMAT_JSON_LIST = 'json-list'
+FORMAT_NETSCAPE = 'netscape'
+
+LOCK_SUFFIX = '.lock'
+NETSCAPE_HEADER = '# Netscape HTTP Cookie File\n'
+HTTPONLY_PREFIX = '#HttpOnly_'
+# Seconds between checks of the cookies file for updates from other processes
+REFRESH_INTERVAL = 1.0
+
+
+class CookieFileError(ValueError):
+    """The cookies file could not be parsed"""
+
+
+def _record(value: str, domain: str = '', path: str = '/', secure: bool = False,
+            expires: Optional[int] = None, http_only: bool = False) -> dict:
+    return {'value': value, 'domain': domain, 'path': path or '/', 'secure': secure,
+            'expires': expires, 'http_only': http_only}
+
+
+def _parse_netscape(text: str) -> Dict[str, dict]:
+    records = {}
+    for line in text.splitlines():
+        http_only = line.startswith(HTTPONLY_PREFIX)
+        if http_only:
+            line = line[len(HTTPONLY_PREFIX):]
+        if not line.strip() or line.startswith('#'):
+            continue
+        fields = line.split('\t')
+        if len(fields) != 7:
+            raise CookieFileError(f"expected 7 tab-separated fields, got: {line[:80]!r}")
+        domain, _subdomains, path, secure, expires, name, value = fields
+        records[name] = _record(value, domain, path, secure.upper() == 'TRUE',
+                                int(expires) if expires.isdigit() and int(expires) else None, http_only)
+    return records
+
+
+def _parse_json_list(items: list) -> Dict[str, dict]:
+    records = {}
+    for item in items:
+        if not isinstance(item, dict) or 'name' not in item:
+            raise CookieFileError("a JSON cookie list must hold objects with 'name' and 'value'")
+        expires = item.get('expirationDate', item.get('expires'))
+        records[item['name']] = _record(str(item.get('value', '')), item.get('domain', ''), item.get('path', '/'),
+                                        bool(item.get('secure')),
+                                        int(expires) if isinstance(expires, (int, float)) else None,
+                                        bool(item.get('httpOnly')))
+    return records
+
+
+def parse_cookies(text: str) -> Tuple[str, Dict[str, dict]]:
+    """(format, name -> cookie record) of a cookies file's contents"""
+    stripped = text.strip()
+    if not stripped:
+        return FORMAT_JSON, {}
+    if stripped[0] in '{[':
+        try:
+            data = json.loads(stripped)
+        except json.JSONDecodeError as e:
+            raise CookieFileError(f"invalid JSON: {e}") from e
+        if isinstance(data, list):
+            return FORMAT_JSON_LIST, _parse_json_list(data)
+        return FORMAT_JSON, {name: _record(str(value)) for name, value in data.items()}
+    return FORMAT_NETSCAPE, _parse_netscape(text)
+
+
+def format_cookies(records: Dict[str, dict], file_format: str) -> str:
+    if file_format == FORMAT_NETSCAPE:
+        lines = [NETSCAPE_HEADER]
+        for name, record in records.items():
+            domain = record['domain'] or '.ultimate-guitar.com'
+            lines.append('\t'.join([
+                (HTTPONLY_PREFIX if record['http_only'] else '') + domain,
+                'TRUE' if domain.startswith('.') else 'FALSE',
+                record['path'],
+                'TRUE' if record['secure'] else 'FALSE',
+                str(record['expires'] or 0),
+                name,
+                record['value'],
+            ]) + '\n')
+        return ''.join(lines)
+    if file_format == FORMAT_JSON_LIST:
+        items = []
+        for name, record in records.items():
+            item = {'name': name, 'value': record['value'], 'domain': record['domain'], 'path': record['path'],
+                    'secure': record['secure'], 'httpOnly': record['http_only']}
+            if record['expires']:
+                item['expirationDate'] = record['expires']
+            items.append(item)
+        return json.dumps(items, indent=2) + '\n'
+    return json.dumps({name: record['value'] for name, record in records.items()}, indent=2) + '\n'
+
+
+def _file_version(path: str) -> Optional[tuple]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    # os.replace() gives every write a new inode, so same-second writes are told apart too
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class SharedCookieJar:
+    def __init__(self, path: str):
+        """
+        Cookies file shared by every session of this process and by other processes
+        path: JSON or Netscape cookies.txt file; it is created on the first Set-Cookie if missing
+        """
+        self.path = path
+        self.lock_path = path + LOCK_SUFFIX
+        self.format = FORMAT_JSON
+        self.records: Dict[str, dict] = {}
+        self.writes = 0
+        self.reloads = 0
+        self._version = None
+        self._checked = 0.0
+        self._stores: List[httpx.Cookies] = []
+        self._lock = threading.RLock()
+        self.reload()
+        self.reloads = 0
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Lock against other processes (the threading lock covers this process)"""
+        try:
+            lock_file = open(self.lock_path, 'a') if fcntl is not None else None
+        except OSError:
+            # e.g. a read-only directory: nobody can write the cookies file there anyway
+            lock_file = None
+        if lock_file is None:
+            yield
+            return
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self) -> Tuple[str, Dict[str, dict]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return parse_cookies(f.read())
+        except FileNotFoundError:
+            return self.format, {}
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def values(self) -> Dict[str, str]:
+        """name -> value of every cookie"""
+        with self._lock:
+            return {name: record['value'] for name, record in self.records.items()}
+
+    def reload(self) -> bool:
+        """Re-read the file into every attached session; returns whether anything changed"""
+        with self._lock:
+            if self.exists():
+                with self._file_lock(exclusive=False):
+                    file_format, records = self._read()
+                    self._version = _file_version(self.path)
+            else:
+                file_format, records = self.format, {}
+            self._checked = time.monotonic()
+            changed = records != self.records
+            self.format, self.records = file_format, records
+            if changed:
+                self.reloads += 1
+                for store in self._stores:
+                    self._apply(store)
+            return changed
+
+    def attach(self, cookies: httpx.Cookies) -> None:
+        """Seed a client's cookies from the jar and keep them in sync from now on"""
+        with self._lock:
+            self._stores.append(cookies)
+            self._apply(cookies)
+
+    def detach(self, cookies: httpx.Cookies) -> None:
+        with self._lock:
+            if cookies in self._stores:
+                self._stores.remove(cookies)
+
+    def _apply(self, cookies: httpx.Cookies) -> None:
+        """Make `cookies` hold exactly one entry per jar cookie, with the jar's value"""
+        by_name = {}
+        for cookie in list(cookies.jar):
+            by_name.setdefault(cookie.name, []).append(cookie)
+        for name, record in self.records.items():
+            entries = by_name.get(name, [])
+            if len(entries) == 1 and entries[0].value == record['value']:
+                continue
+            for cookie in entries:
+                cookies.jar.clear(cookie.domain, cookie.path, cookie.name)
+            cookies.set(name, record['value'], domain=record['domain'], path=record['path'])
+
+    def after_response(self, cookies: httpx.Cookies, response: httpx.Response) -> None:
+        """
+        Called by a session after each response, with the client's cookies
+        Set-Cookie changes are written back to the file; otherwise the file is checked
+        (at most every REFRESH_INTERVAL seconds) for updates from other processes.
+        """
+        set_names = {header.split('=', 1)[0].strip()
+                     for r in (*response.history, response) for header in r.headers.get_list('set-cookie')}
+        if set_names:
+            self.absorb(cookies, set_names)
+        elif time.monotonic() - self._checked >= REFRESH_INTERVAL:
+            with self._lock:
+                self._checked = time.monotonic()
+                if _file_version(self.path) != self._version:
+                    self.reload()
+
+    def absorb(self, cookies: httpx.Cookies, set_names: Iterable[str] = ()) -> None:
+        """
+        Persist cookies the server set or deleted in `cookies` and share them with the other sessions
+        set_names: cookies named in Set-Cookie headers; one left with only its domain-less entry
+            (as loaded from a plain JSON file) was deleted by the server, which cannot match that entry
+        """
+        with self._lock:
+            current, scoped = {}, set()
+            for cookie in list(cookies.jar):
+                if cookie.domain:
+                    scoped.add(cookie.name)
+                record = self.records.get(cookie.name)
+                # Of several entries with one name, the one the server just changed wins
+                if cookie.name not in current or (record is not None and cookie.value != record['value']):
+                    current[cookie.name] = cookie
+            for name in set_names:
+                cookie = current.get(name)
+                if cookie is not None and name not in scoped:
+                    cookies.jar.clear(cookie.domain, cookie.path, cookie.name)
+                    del current[name]
+            changed = {}
+            for name, cookie in current.items():
+                record = self.records.get(name)
+                if record is None or record['value'] != cookie.value:
+                    changed[name] = _record(cookie.value or '', cookie.domain, cookie.path, bool(cookie.secure),
+                                            cookie.expires, cookie.has_nonstandard_attr('HttpOnly'))
+            deleted = [name for name in self.records if name not in current]
+            if changed or deleted:
+                self._write(changed, deleted)
+            else:
+                # e.g. the server re-set a cookie to its value: drop the duplicate entry
+                self._apply(cookies)
+
+    def _write(self, changed: Dict[str, dict], deleted: List[str]) -> None:
+        """Merge our changes into the file as it is now on disk (other processes may have written it)"""
+        with self._file_lock(exclusive=True):
+            file_format, records = self._read()
+            records.update(changed)
+            for name in deleted:
+                records.pop(name, None)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.part')
+            try:
+                # mkstemp's 0600 mode is kept: cookies are credentials
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(format_cookies(records, file_format))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            self._version = _file_version(self.path)
+        self.writes += 1
+        self.format, self.records = file_format, records
+        for store in self._stores:
+            self._apply(store)
+
+    def import_file(self, source: str) -> int:
+        """Merge every cookie of another cookies file (e.g. an exported cookies.txt); returns how many"""
+        with open(source, 'r', encoding='utf-8') as f:
+            _, records = parse_cookies(f.read())
+        with self._lock:
+            self._write(records, [])
+        return len(records)
+
+    def print_stats(self) -> None:
+        print(f"🍪 Cookies ({self.path}): {len(self.records)} cookies, {self.writes} server updates saved, "
+              f"{self.reloads} reloads of changes made elsewhere")
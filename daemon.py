@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Long-running download daemon with a local job API
+Keeps one warm UGDownloader/UGArtistScraper (connection pool, auth state, cookies,
+caches) and accepts download and scrape jobs over local HTTP or a Unix socket, so a
+small job costs its fetches instead of interpreter start-up, a cookie load and fresh
+TLS connections. Jobs are queued, identical jobs and URLs already queued are
+deduplicated, and every job's progress can be polled (or long-polled).
+
+Usage: python daemon.py --cookies cookies.json [--port 8731 | --socket /tmp/ugd.sock]
+  curl -s localhost:8731/jobs -d '{"type": "download", "urls": ["https://tabs.ultimate-guitar.com/tab/..."]}'
+  curl -s 'localhost:8731/jobs/1?wait=60'
+"""
+
+import asyncio
+import json
+import os
+import socketserver
+import threading
+import time
+import traceback
+from argparse import ArgumentParser
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse, urlsplit
+
+from main import (UGDownloader, add_client_arguments, downloader_options, best_versions_from_args, scraper_for,
+                  DEFAULT_CONCURRENCY)
+from scraper import UGArtistScraper
+from journal import JobJournal
+from auth import ON_EXPIRED_PAUSE
+from events import TabFailed
+from urlinput import canonical_tab, canonical_url, UG_DOMAIN
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8731
+DEFAULT_JOURNAL = 'daemon.journal.sqlite'
+# Finished jobs remembered for status queries
+MAX_FINISHED_JOBS = 1000
+# Longest ?wait= a status request may block for
+MAX_WAIT = 300.0
+
+JOB_TYPES = ('download', 'scrape')
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+
+# Per-URL states within a job
+URL_QUEUED = 'queued'
+URL_RUNNING = 'running'
+URL_DOWNLOADED = 'downloaded'
+URL_FAILED = 'failed'
+URL_SKIPPED = 'skipped'
+
+
+class JobError(ValueError):
+    """A submitted job is malformed (answered with 400)"""
+
+
+class Job:
+    def __init__(self, job_id: int, kind: str, key: tuple, urls: List[str], artist_url: Optional[str],
+                 download: bool, force: bool, refresh: bool):
+        self.id = job_id
+        self.kind = kind
+        self.key = key
+        self.artist_url = artist_url
+        self.download = download
+        self.force = force
+        self.refresh = refresh
+        self.status = QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.error: Optional[str] = None
+        self.urls: Dict[str, str] = OrderedDict((url, URL_QUEUED) for url in urls)
+        self.reasons: Dict[str, str] = {}
+        self.scraping = kind == 'scrape'
+        self.pending = 0
+        self.done_event = threading.Event()
+
+    def to_dict(self, details: bool = False) -> dict:
+        counts = {}
+        for state in self.urls.values():
+            counts[state] = counts.get(state, 0) + 1
+        record = {
+            'id': self.id,
+            'type': self.kind,
+            'status': self.status,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'seconds': (self.finished or time.time()) - self.started if self.started else None,
+            'counts': counts,
+        }
+        if self.artist_url:
+            record['artist_url'] = self.artist_url
+        if self.error:
+            record['error'] = self.error
+        if details:
+            record['urls'] = [{'url': url, 'state': state, **({'reason': self.reasons[url]} if url in self.reasons else {})}
+                              for url, state in self.urls.items()]
+        return record
+
+
+class _FailureSink:
+    """Keeps the reason of each failed tab until the worker that ran it picks it up"""
+
+    def __init__(self):
+        self.reasons: Dict[str, str] = {}
+
+    def handle(self, event) -> None:
+        if isinstance(event, TabFailed):
+            self.reasons[event.url] = event.reason
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class JobManager:
+    def __init__(self, downloader: UGDownloader, scraper: UGArtistScraper, concurrency: int = DEFAULT_CONCURRENCY):
+        """
+        Runs jobs on one warm downloader, on an event loop in a background thread
+        concurrency: tabs downloaded at once across all jobs
+        """
+        self.downloader = downloader
+        self.scraper = scraper
+        self.concurrency = max(1, concurrency)
+        self.started = time.time()
+        self.jobs: Dict[int, Job] = OrderedDict()
+        self._next_id = 1
+        self._active_keys: Dict[tuple, Job] = {}
+        # URL -> jobs waiting for it; a URL requested by several jobs is downloaded once
+        self._inflight: Dict[str, List[Job]] = {}
+        self._failures = _FailureSink()
+        downloader.events.subscribe(self._failures)
+        self._lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._thread = threading.Thread(target=self.loop.run_forever, name='ugd-jobs', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start_workers(), self.loop).result()
+
+    async def _start_workers(self) -> None:
+        self._queue = asyncio.Queue()
+        self._workers = [self.loop.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    def stop(self) -> None:
+        """Cancel the workers and close the downloader's sessions on their loop, then stop it"""
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(5)
+
+    async def _shutdown(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        await self.downloader.aclose()
+
+    def submit(self, payload: dict) -> Tuple[Job, bool]:
+        """
+        Queue a job from its JSON payload; returns (job, deduplicated)
+        An identical job that is still queued or running is returned instead of a new one.
+        """
+        kind = payload.get('type', 'download')
+        if kind not in JOB_TYPES:
+            raise JobError(f"type must be one of {JOB_TYPES}")
+        force = bool(payload.get('force', False))
+        download = bool(payload.get('download', True))
+        # Conditional requests for tabs already saved; the daemon's --refresh unless the job says otherwise
+        refresh = bool(payload.get('refresh', self.downloader.refresh))
+        artist_url = None
+        if kind == 'download':
+            urls = payload.get('urls') or ([payload['url']] if payload.get('url') else [])
+            # A bare string would otherwise be read one character at a time
+            if not isinstance(urls, list):
+                raise JobError("a download job needs 'urls': a list of tab URLs or IDs")
+            tabs = [canonical_tab(str(url)) if isinstance(url, (str, int)) else None for url in urls]
+            if not tabs or None in tabs:
+                raise JobError("a download job needs 'urls': a list of tab URLs or IDs")
+            # Variants of one tab (www./tabs., query strings, bare IDs) are one download
+            unique = {}
+            for key, url in tabs:
+                unique.setdefault(key, url)
+            urls = list(unique.values())
+            key = (kind, force, refresh, tuple(sorted(unique)))
+        else:
+            artist_url = canonical_url(payload['artist_url']) if isinstance(payload.get('artist_url'), str) else None
+            if artist_url is None:
+                raise JobError("a scrape job needs 'artist_url'")
+            urls = []
+            # Like tab URLs, www./tabs. variants of an artist page are one scrape
+            parts = urlsplit(artist_url)
+            site = UG_DOMAIN if parts.hostname.endswith('.' + UG_DOMAIN) else parts.netloc
+            key = (kind, force, refresh, download, site + parts.path)
+
+        with self._lock:
+            existing = self._active_keys.get(key)
+            if existing is not None:
+                return existing, True
+            job = Job(self._next_id, kind, key, urls, artist_url, download, force, refresh)
+            self._next_id += 1
+            self.jobs[job.id] = job
+            self._active_keys[key] = job
+            self._forget_old_jobs()
+        self.loop.call_soon_threadsafe(self._schedule, job)
+        return job, False
+
+    def _forget_old_jobs(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.status == DONE]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def job(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _schedule(self, job: Job) -> None:
+        """On the loop: queue a job's URLs, or start scraping its artist"""
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            if job.kind == 'scrape':
+                self.loop.run_in_executor(None, self._scrape, job)
+            for url in list(job.urls):
+                self._enqueue(job, url)
+        except Exception as e:
+            self._job_error([job], f"could not start: {e}")
+            job.scraping = False
+        self._maybe_finish(job)
+
+    def _job_error(self, jobs: List[Job], error: str) -> None:
+        """Log an unexpected error with its traceback and record it on the jobs it hit"""
+        print(f"⚠️  Job {', '.join(str(job.id) for job in jobs)}: {error}")
+        traceback.print_exc()
+        with self._lock:
+            for job in jobs:
+                job.error = job.error or error
+
+    def _scrape(self, job: Job) -> None:
+        """In an executor thread: the scraper is blocking and uses the downloader's sync session"""
+        try:
+            for url in self.scraper.iter_artist_tabs(job.artist_url):
+                self.loop.call_soon_threadsafe(self._add_found, job, url)
+        except Exception as e:
+            job.error = f"scrape failed: {e}"
+        finally:
+            self.loop.call_soon_threadsafe(self._scrape_done, job)
+
+    def _add_found(self, job: Job, url: str) -> None:
+        with self._lock:
+            job.urls.setdefault(url, URL_QUEUED if job.download else URL_SKIPPED)
+        if job.download:
+            self._enqueue(job, url)
+
+    def _scrape_done(self, job: Job) -> None:
+        job.scraping = False
+        self._maybe_finish(job)
+
+    def _enqueue(self, job: Job, url: str) -> None:
+        job.pending += 1
+        waiting = self._inflight.get(url)
+        if waiting is not None:
+            waiting.append(job)
+            return
+        self._inflight[url] = [job]
+        self._queue.put_nowait(url)
+
+    def _set_state(self, jobs: List[Job], url: str, state: str, reason: Optional[str] = None) -> None:
+        with self._lock:
+            for job in jobs:
+                job.urls[url] = state
+                if reason:
+                    job.reasons[url] = reason
+
+    async def _worker(self) -> None:
+        while True:
+            url = await self._queue.get()
+            jobs = self._inflight[url]
+            try:
+                state, reason = await self._run_url(url, jobs)
+            except Exception as e:
+                # The worker keeps going and the jobs still finish, so ?wait= never hangs
+                state, reason = URL_FAILED, f"internal error: {e}"
+                self._job_error(list(jobs), f"{url}: {e!r}")
+            # Jobs that asked for the URL while it was running get the same result
+            jobs = self._inflight.pop(url)
+            self._set_state(jobs, url, state, reason)
+            for job in jobs:
+                job.pending -= 1
+                self._maybe_finish(job)
+
+    async def _run_url(self, url: str, jobs: List[Job]) -> Tuple[str, Optional[str]]:
+        """(state, reason) of one URL for the jobs waiting on it"""
+        self._set_state(jobs, url, URL_RUNNING)
+        if not any(job.force or job.refresh for job in jobs) and await asyncio.to_thread(self.downloader.store.has, url):
+            return URL_SKIPPED, "already downloaded"
+        if await self.downloader.download_tab_async(url, refresh=any(job.refresh for job in jobs)):
+            return URL_DOWNLOADED, None
+        reason = self._failures.reasons.pop(url, None)
+        if reason is None and self.downloader.auth.expired:
+            reason = "session is not authenticated"
+        return URL_FAILED, reason
+
+    def _maybe_finish(self, job: Job) -> None:
+        if job.pending or job.scraping or job.status == DONE:
+            return
+        with self._lock:
+            job.status = DONE
+            job.finished = time.time()
+            self._active_keys.pop(job.key, None)
+        job.done_event.set()
+        counts = job.to_dict()['counts']
+        print(f"📦 Job {job.id} ({job.kind}) done in {job.finished - job.started:.2f}s: "
+              + ", ".join(f"{count} {state}" for state, count in counts.items()))
+
+    def status(self) -> dict:
+        with self._lock:
+            jobs = {}
+            for job in self.jobs.values():
+                jobs[job.status] = jobs.get(job.status, 0) + 1
+        snapshot = self.downloader.metrics_snapshot()
+        return {
+            'uptime_seconds': time.time() - self.started,
+            'jobs': jobs,
+            'queued_urls': self._queue.qsize() if self._queue is not None else 0,
+            'in_flight_urls': len(self._inflight),
+            'auth': self.downloader.auth.status,
+            'counters': snapshot['counters'],
+            'rates': snapshot['rates'],
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'DaemonHTTPServer'
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, payload) -> None:
+        body = (json.dumps(payload) + '\n').encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        manager = self.server.manager
+        parts = url.path.strip('/').split('/')
+        if url.path in ('/', '/status'):
+            return self._send_json(200, manager.status())
+        if parts == ['jobs']:
+            with manager._lock:
+                jobs = [job.to_dict() for job in manager.jobs.values()]
+            return self._send_json(200, {'jobs': jobs})
+        if len(parts) == 2 and parts[0] == 'jobs' and parts[1].isdigit():
+            job = manager.job(int(parts[1]))
+            if job is None:
+                return self._send_json(404, {'error': 'no such job'})
+            # Long poll: hold the answer until the job is done or `wait` seconds passed
+            wait = parse_qs(url.query).get('wait', ['0'])[0]
+            try:
+                job.done_event.wait(min(MAX_WAIT, max(0.0, float(wait))))
+            except ValueError:
+                return self._send_json(400, {'error': 'wait must be a number of seconds'})
+            # Snapshot under the lock, send without it: a slow client must not stall the workers
+            with manager._lock:
+                record = job.to_dict(details=True)
+            return self._send_json(200, record)
+        self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self) -> None:
+        if urlparse(self.path).path != '/jobs':
+            return self._send_json(404, {'error': 'not found'})
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(payload, dict):
+                raise JobError("the body must be a JSON object")
+            job, deduplicated = self.server.manager.submit(payload)
+        except (JobError, ValueError) as e:
+            return self._send_json(400, {'error': str(e)})
+        with self.server.manager._lock:
+            record = job.to_dict()
+        self._send_json(200 if deduplicated else 202, {**record, 'deduplicated': deduplicated})
+
+
+class DaemonHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, manager: JobManager, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        super().__init__((host, port), _Handler)
+        self.manager = manager
+
+    @property
+    def address(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+class DaemonUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Same API on a Unix socket (only local users with access to the socket file can submit jobs)"""
+    daemon_threads = True
+
+    def __init__(self, manager: JobManager, path: str):
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, _Handler)
+        self.manager = manager
+
+    @property
+    def address(self) -> str:
+        return f'unix:{self.server_address}'
+
+
+def main():
+    parser = ArgumentParser(description='Serve a local job API on one warm Ultimate Guitar downloader')
+    # The downloader and scraper take the same options as main.py; tabs only wait for fresh cookies by default
+    add_client_arguments(parser, on_auth_expired=ON_EXPIRED_PAUSE)
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Interface to listen on (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--socket', help='Listen on this Unix socket instead of TCP')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Re-check tabs already in output/ with conditional requests (ETag/Last-Modified) instead '
+                             'of skipping them; a job can override this with "refresh": true or false')
+    parser.add_argument('--journal', default=DEFAULT_JOURNAL,
+                        help=f'Job journal recording every tab (default: {DEFAULT_JOURNAL})')
+    args = parser.parse_args()
+
+    try:
+        options = downloader_options(args)
+    except ValueError as e:
+        parser.error(str(e))
+    downloader = UGDownloader(args.cookies, journal=JobJournal(args.journal), refresh=args.refresh, **options)
+    scraper = scraper_for(downloader, args, best_versions_from_args(args))
+    manager = JobManager(downloader, scraper, args.concurrency)
+    manager.start()
+    server = DaemonUnixServer(manager, args.socket) if args.socket else DaemonHTTPServer(manager, args.host, args.port)
+
+    print(f"🛰️  UG daemon listening on {server.address} ({args.concurrency} tabs at a time)")
+    print("💡 Submit jobs with POST /jobs, poll GET /jobs/<id>?wait=60, GET /status for counters")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️  Shutting down")
+    finally:
+        server.server_close()
+        manager.stop()
+        downloader.print_stats()
+        scraper.catalog.print_summary()
+        if scraper.best_versions is not None:
+            scraper.best_versions.print_stats()
+        scraper.catalog.close()
+        downloader.journal.close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == '__main__':
+    main()
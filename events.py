@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Typed download events and the sinks that render them
+UGDownloader emits an event per step of every tab (started, page requested, token
+found, downloaded, failed) instead of printing. Sinks turn them into the classic
+verbose log, a compact live progress line or JSON lines for machines; with no sink
+attached emit() returns before even building the event, so quiet runs pay nothing.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from argparse import ArgumentParser
+from typing import Iterable, Optional, TextIO
+
+
+LOG_STYLES = ('verbose', 'progress', 'quiet')
+DEFAULT_LOG_STYLE = 'verbose'
+
+# Seconds between progress line refreshes on a terminal / in a piped log
+PROGRESS_INTERVAL_TTY = 0.2
+PROGRESS_INTERVAL_PIPE = 10.0
+
+
+class Event:
+    """Something that happened to one tab; `fields` are reported by to_dict()"""
+    name = 'event'
+    fields = ()
+    __slots__ = ('url', 'time')
+
+    def __init__(self, url: str):
+        self.url = url
+        self.time = time.time()
+
+    def to_dict(self) -> dict:
+        record = {'event': self.name, 'time': round(self.time, 6), 'url': self.url}
+        record.update((field, getattr(self, field)) for field in self.fields)
+        return record
+
+
+class TabStarted(Event):
+    name = 'tab_started'
+    fields = ('index', 'total')
+    __slots__ = fields
+
+    def __init__(self, url: str, index: Optional[int] = None, total: Optional[int] = None):
+        super().__init__(url)
+        self.index = index
+        self.total = total
+
+
+class PageRequested(Event):
+    """The tab page is being fetched (once per attempt)"""
+    name = 'page_requested'
+    __slots__ = ()
+
+
+class TokenFound(Event):
+    name = 'token_found'
+    fields = ('download_url',)
+    __slots__ = fields
+
+    def __init__(self, url: str, download_url: str):
+        super().__init__(url)
+        self.download_url = download_url
+
+
+class TabDownloaded(Event):
+    name = 'tab_downloaded'
+    fields = ('path', 'size', 'sha256', 'how')
+    __slots__ = fields
+
+    def __init__(self, url: str, path: str, size: int, sha256: str, how: str):
+        super().__init__(url)
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.how = how
+
+
+class TabFailed(Event):
+    """The tab failed for good (after retries)"""
+    name = 'tab_failed'
+    fields = ('reason',)
+    __slots__ = fields
+
+    def __init__(self, url: str, reason: str):
+        super().__init__(url)
+        self.reason = reason
+
+
+class TabNotice(Event):
+    """Diagnostic detail about a tab, e.g. why an attempt failed; only emitted off the happy path"""
+    name = 'tab_notice'
+    fields = ('message',)
+    __slots__ = fields
+
+    def __init__(self, url: str, message: str):
+        super().__init__(url)
+        self.message = message
+
+
+class EventBus:
+    def __init__(self, sinks: Iterable = ()):
+        """Fans events out to sinks (objects with handle(event), flush() and close())"""
+        self.sinks = list(sinks)
+
+    def subscribe(self, sink) -> None:
+        self.sinks.append(sink)
+
+    @property
+    def active(self) -> bool:
+        return bool(self.sinks)
+
+    def emit(self, event_type: type, url: str, *args) -> None:
+        """Build and deliver an event_type(url, *args), or nothing at all when no sink listens"""
+        if not self.sinks:
+            return
+        event = event_type(url, *args)
+        for sink in self.sinks:
+            sink.handle(event)
+
+    def flush(self) -> None:
+        """End of a batch: finish progress lines, flush files"""
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
+
+
+class VerboseSink:
+    """The classic per-tab log"""
+
+    def handle(self, event: Event) -> None:
+        if isinstance(event, TabStarted):
+            print(f"\n[{event.index or '?'}/{event.total or '?'}] Processing: {event.url}")
+        elif isinstance(event, PageRequested):
+            print(f"Getting tab data from: {event.url}")
+        elif isinstance(event, TokenFound):
+            print(f"✅ Found download token, downloading from: {event.download_url}")
+        elif isinstance(event, TabDownloaded):
+            note = {'linked': ", hard-linked to an identical file",
+                    'unchanged': ", identical file already saved",
+                    'revalidated': ", not modified on the server, nothing transferred"}.get(event.how, "")
+            print(f"Successfully downloaded: {os.path.basename(event.path)} "
+                  f"({event.size} bytes, sha256 {event.sha256[:12]}{note})")
+        elif isinstance(event, TabFailed):
+            print(f"❌ Failed: {event.url} ({event.reason})")
+        elif isinstance(event, TabNotice):
+            print(event.message)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class ProgressSink:
+    def __init__(self, stream: TextIO = sys.stdout):
+        """
+        One compact, periodically refreshed status line instead of a log
+        On a terminal the line is redrawn in place; in a pipe a line is written every few seconds.
+        """
+        self.stream = stream
+        self.tty = stream.isatty()
+        self.interval = PROGRESS_INTERVAL_TTY if self.tty else PROGRESS_INTERVAL_PIPE
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.total = None
+        self.started = 0
+        self.downloaded = 0
+        self.failed = 0
+        self.bytes = 0
+        self._began = None
+        self._last_draw = 0.0
+        self._line_open = False
+
+    def handle(self, event: Event) -> None:
+        with self._lock:
+            if isinstance(event, TabStarted):
+                self.started += 1
+                self.total = event.total or self.total
+                if self._began is None:
+                    self._began = time.monotonic()
+            elif isinstance(event, TabDownloaded):
+                self.downloaded += 1
+                if event.how != 'revalidated':
+                    self.bytes += event.size
+            elif isinstance(event, TabFailed):
+                self.failed += 1
+            else:
+                return
+            now = time.monotonic()
+            if now - self._last_draw >= self.interval:
+                self._last_draw = now
+                self._draw(now)
+
+    def _draw(self, now: float) -> None:
+        elapsed = now - self._began if self._began is not None else 0.0
+        done = self.downloaded + self.failed
+        rate = done / elapsed if elapsed else 0.0
+        line = (f"⏬ {done}/{self.total or '?'} tabs ({self.downloaded} ok, {self.failed} failed), "
+                f"{self.bytes / 1e6:.1f} MB, {rate:.1f} tabs/s, {self.started - done} in flight")
+        if self.tty:
+            self.stream.write(f"\r{line}\033[K")
+            self._line_open = True
+        else:
+            self.stream.write(line + '\n')
+        self.stream.flush()
+
+    def flush(self) -> None:
+        """Final state of the batch on its own line; the counters start over for the next one"""
+        with self._lock:
+            if self._began is not None:
+                self._draw(time.monotonic())
+                if self._line_open:
+                    self.stream.write('\n')
+                    self.stream.flush()
+            self._reset()
+
+    def close(self) -> None:
+        self.flush()
+
+
+class JsonLinesSink:
+    def __init__(self, path: str):
+        """One JSON object per event, appended to `path` ('-' for stdout)"""
+        self.path = path
+        self._file = sys.stdout if path == '-' else open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def handle(self, event: Event) -> None:
+        line = json.dumps(event.to_dict()) + '\n'
+        with self._lock:
+            self._file.write(line)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not sys.stdout and not self._file.closed:
+                self._file.close()
+
+
+def add_event_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument('--log', choices=LOG_STYLES, default=DEFAULT_LOG_STYLE,
+                        help='Per-tab output: verbose log, one live progress line, or quiet (summary only) '
+                             f'(default: {DEFAULT_LOG_STYLE})')
+    parser.add_argument('--events-out',
+                        help="Append every tab event as a JSON line to this file ('-' for stdout)")
+
+
+def bus_from_args(args) -> EventBus:
+    sinks = []
+    if args.log == 'verbose':
+        sinks.append(VerboseSink())
+    elif args.log == 'progress':
+        sinks.append(ProgressSink())
+    if args.events_out:
+        sinks.append(JsonLinesSink(args.events_out))
+    return EventBus(sinks)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Extraction of the data-content JSON blob embedded in Ultimate Guitar pages
+Scans the response incrementally and stops as soon as the blob is complete,
+then unescapes and decodes it (with orjson when installed). The rest of the page
+is only read when Content-Length shows a small remainder; otherwise the connection
+is given up instead.
+"""
+
+import html
+import json
+import re
+from typing import AsyncIterable, Callable, Iterable, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+DATA_CONTENT_MARKER = b'data-content="'
+DATA_CONTENT_PATTERN = re.compile(r'data-content="({.+?})"')
+
+PAGE_CHUNK_SIZE = 16 * 1024
+# After the blob is found, the rest of an HTTP/1.1 body is read (so the connection can go
+# back to the pool) only if no more than this is left; a bigger rest costs more than a new connection.
+# Tab and artist pages carry a few hundred KiB of markup after the blob, so a smaller limit gives up
+# the connection on nearly every page (--drain-kb)
+DEFAULT_DRAIN_LIMIT = 256 * 1024
+
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+# What attribute escaping (html.escape / PHP htmlspecialchars) produces; '&amp;' is handled last
+_ATTRIBUTE_ENTITIES = (('&quot;', '"'), ('&#039;', "'"), ('&#39;', "'"), ('&#x27;', "'"), ('&lt;', '<'), ('&gt;', '>'))
+
+
+def unescape_attribute(value: str) -> str:
+    """
+    html.unescape for an escaped attribute value, several times faster on JSON blobs
+    (html.unescape calls back into Python for every '&quot;'). Values with any other
+    entity are passed to html.unescape, so the result is always the same.
+    """
+    result = value
+    for entity, char in _ATTRIBUTE_ENTITIES:
+        result = result.replace(entity, char)
+    if result.count('&') != result.count('&amp;'):
+        return html.unescape(value)
+    return result.replace('&amp;', '&')
+
+
+def loads(text: str):
+    """
+    json.loads through orjson when it is installed
+    Both raise json.JSONDecodeError (orjson's error subclasses it) for malformed input.
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+class DataContentExtractor:
+    def __init__(self):
+        """
+        Incremental scanner for the data-content="{...}" attribute
+        Feed raw body chunks with feed(); it returns True once the blob is complete.
+        Only the blob itself is buffered, never the rest of the page.
+        """
+        self._buffer = bytearray()
+        self._in_blob = False
+        self._search_from = 0
+        self.blob: Optional[bytes] = None
+        self.bytes_scanned = 0
+
+    @property
+    def done(self) -> bool:
+        return self.blob is not None
+
+    def feed(self, chunk: bytes) -> bool:
+        if self.blob is not None:
+            return True
+        self.bytes_scanned += len(chunk)
+        self._buffer += chunk
+
+        while True:
+            if not self._in_blob:
+                start = self._buffer.find(DATA_CONTENT_MARKER)
+                if start < 0:
+                    # Keep just enough to match a marker split across chunks
+                    del self._buffer[:max(0, len(self._buffer) - len(DATA_CONTENT_MARKER) + 1)]
+                    return False
+                del self._buffer[:start + len(DATA_CONTENT_MARKER)]
+                self._in_blob = True
+                self._search_from = 0
+
+            # Inside an attribute value quotes are escaped, so the next '"' closes it
+            end = self._buffer.find(b'"', self._search_from)
+            if end < 0:
+                self._search_from = len(self._buffer)
+                return False
+
+            candidate = bytes(self._buffer[:end])
+            del self._buffer[:end + 1]
+            self._in_blob = False
+            if candidate.startswith(b'{') and candidate.endswith(b'}'):
+                self.blob = candidate
+                self._buffer = bytearray()
+                return True
+            # Some other data-content attribute, keep looking
+
+    def text(self, encoding: str = 'utf-8') -> Optional[str]:
+        """The unescaped JSON string, or None if the blob was not found"""
+        if self.blob is None:
+            return None
+        return unescape_attribute(self.blob.decode(encoding, errors='replace'))
+
+
+def drain_limit_for(response, drain_limit: int = DEFAULT_DRAIN_LIMIT) -> int:
+    """Drain limit for an httpx response: abandoning an HTTP/2 stream is cheap, an HTTP/1.1 body is not"""
+    return 0 if response.http_version == 'HTTP/2' else drain_limit
+
+
+def unread_bytes(response) -> Optional[int]:
+    """Bytes of an httpx response body not received yet, per its Content-Length (None if unknown)"""
+    length = response.headers.get('content-length', '')
+    if not length.isdigit():
+        return None
+    return max(0, int(length) - response.num_bytes_downloaded)
+
+
+def _should_drain(drain_limit: int, unread: Optional[Callable[[], Optional[int]]]) -> bool:
+    if not drain_limit:
+        return False
+    if unread is None:
+        return True
+    remaining = unread()
+    # Without a Content-Length the rest could be any size
+    return remaining is not None and remaining <= drain_limit
+
+
+def _drain(chunks, limit: int) -> None:
+    drained = 0
+    for chunk in chunks:
+        drained += len(chunk)
+        if drained > limit:
+            return
+
+
+def extract_data_content(chunks: Iterable[bytes], encoding: str = 'utf-8',
+                         drain_limit: int = DEFAULT_DRAIN_LIMIT,
+                         unread: Optional[Callable[[], Optional[int]]] = None) -> Optional[str]:
+    """
+    Read body chunks until the data-content blob is complete and return it unescaped
+    The rest of the body is consumed, so the connection stays reusable, only if `unread`
+    (e.g. lambda: unread_bytes(response)) reports at most `drain_limit` bytes left; without
+    `unread` up to `drain_limit` bytes are consumed. Pass 0 to stop reading immediately.
+    """
+    extractor = DataContentExtractor()
+    chunks = iter(chunks)
+    for chunk in chunks:
+        if extractor.feed(chunk):
+            if _should_drain(drain_limit, unread):
+                _drain(chunks, drain_limit)
+            break
+    return extractor.text(encoding)
+
+
+async def aextract_data_content(chunks: AsyncIterable[bytes], encoding: str = 'utf-8',
+                                drain_limit: int = DEFAULT_DRAIN_LIMIT,
+                                unread: Optional[Callable[[], Optional[int]]] = None) -> Optional[str]:
+    """
+    Async version of extract_data_content for httpx's aiter_bytes()
+    """
+    extractor = DataContentExtractor()
+    drained = None
+    async for chunk in chunks:
+        if drained is not None:
+            drained += len(chunk)
+            if drained > drain_limit:
+                break
+        elif extractor.feed(chunk):
+            if not _should_drain(drain_limit, unread):
+                break
+            drained = 0
+    return extractor.text(encoding)
+
+
+def extract_page_data(chunks: Iterable[bytes], encoding: str = 'utf-8',
+                      drain_limit: int = DEFAULT_DRAIN_LIMIT,
+                      unread: Optional[Callable[[], Optional[int]]] = None) -> Optional[dict]:
+    """
+    extract_data_content, decoded: the page's store as a dict, or None if there is no blob
+    """
+    json_string = extract_data_content(chunks, encoding, drain_limit, unread)
+    return None if json_string is None else loads(json_string)
+
+
+
+def search_data_content(page_text: str) -> Optional[str]:
+    """
+    Whole-document regex search for an already decoded page
+    """
+    match = DATA_CONTENT_PATTERN.search(page_text)
+    if not match:
+        return None
+    return unescape_attribute(match.group(1))
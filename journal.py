@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Persistent job journal for batch downloads
+Records each tab URL's state in SQLite so an interrupted batch can be resumed
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional
+
+from urlinput import tab_key
+
+
+PENDING = 'pending'
+TOKEN_FETCHED = 'token-fetched'
+DOWNLOADED = 'downloaded'
+FAILED = 'failed'
+
+STATES = (PENDING, TOKEN_FETCHED, DOWNLOADED, FAILED)
+
+
+class JobJournal:
+    def __init__(self, path: str):
+        """
+        Open (or create) a journal
+        path: SQLite file, usually next to the input file (e.g. in.txt.journal.sqlite)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS jobs (
+            url TEXT PRIMARY KEY,
+            state TEXT NOT NULL,
+            path TEXT,
+            sha256 TEXT,
+            reason TEXT,
+            updated_at REAL NOT NULL,
+            tab_key TEXT
+        )''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state)')
+        if 'tab_key' not in {row[1] for row in self._db.execute('PRAGMA table_info(jobs)')}:
+            # A journal from before tab keys: key its URLs once
+            self._db.execute('ALTER TABLE jobs ADD COLUMN tab_key TEXT')
+            urls = [row[0] for row in self._db.execute('SELECT url FROM jobs')]
+            self._db.executemany('UPDATE jobs SET tab_key = ? WHERE url = ?', ((tab_key(url), url) for url in urls))
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_tab_key ON jobs(tab_key)')
+        self._db.commit()
+
+    def add_pending(self, urls: Iterable[str]) -> None:
+        """Register URLs as pending; URLs already in the journal keep their state"""
+        now = time.time()
+        with self._lock:
+            self._db.executemany('INSERT OR IGNORE INTO jobs (url, state, updated_at, tab_key) VALUES (?, ?, ?, ?)',
+                                 ((url, PENDING, now, tab_key(url)) for url in urls))
+            self._db.commit()
+
+    def record(self, url: str, state: str, path: Optional[str] = None,
+               sha256: Optional[str] = None, reason: Optional[str] = None) -> None:
+        # An update in place keeps the URL's rowid, so urls_in_state() stays in input order
+        with self._lock:
+            self._db.execute('INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(url) DO UPDATE SET '
+                             'state = excluded.state, path = excluded.path, sha256 = excluded.sha256, '
+                             'reason = excluded.reason, updated_at = excluded.updated_at',
+                             (url, state, path, sha256, reason, time.time(), tab_key(url)))
+            self._db.commit()
+
+    def state(self, url: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute('SELECT state FROM jobs WHERE url = ?', (url,)).fetchone()
+        return row[0] if row else None
+
+    def is_done(self, url: str) -> bool:
+        """
+        Whether `url`, or another URL of the same tab (e.g. its bare ID), was downloaded
+        Both are index lookups, so checking a URL costs the same regardless of batch size.
+        """
+        with self._lock:
+            rows = self._db.execute('SELECT state FROM jobs WHERE url = ? OR tab_key = ?', (url, tab_key(url))).fetchall()
+        return (DOWNLOADED,) in rows
+
+    def urls_in_state(self, state: str) -> List[str]:
+        with self._lock:
+            rows = self._db.execute('SELECT url FROM jobs WHERE state = ? ORDER BY rowid', (state,)).fetchall()
+        return [row[0] for row in rows]
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._db.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall()
+        counts = {state: 0 for state in STATES}
+        counts.update(dict(rows))
+        return counts
+
+    def print_summary(self) -> None:
+        counts = self.counts()
+        print(f"📒 Journal ({self.path}): {counts[DOWNLOADED]} downloaded, {counts[FAILED]} failed, "
+              f"{counts[PENDING] + counts[TOKEN_FETCHED]} unfinished")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> 'JobJournal':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
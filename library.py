@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Artist library for incremental syncs
+Remembers, per artist, which tabs (and which revision of each) were seen and
+downloaded, so a later sync only has to fetch what is new or changed
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+DEFAULT_LIBRARY_FILE = 'library.sqlite'
+# Consecutive already-downloaded, unchanged tabs (newest first) after which a sync stops paging
+DEFAULT_STOP_AFTER = 10
+# Seen tabs written per commit during a sync (about one listing page)
+SEEN_CHUNK = 50
+
+
+def tab_revision(tab: dict) -> str:
+    """Fingerprint of a listing entry; changes when the tab is updated"""
+    return f"{tab.get('version', '')}:{tab.get('date', '')}"
+
+
+class ArtistLibrary:
+    def __init__(self, path: str = DEFAULT_LIBRARY_FILE):
+        """
+        Open (or create) a library database
+        path: SQLite file shared by every sync run
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS tabs (
+            artist_url TEXT NOT NULL,
+            tab_url TEXT NOT NULL,
+            revision TEXT NOT NULL,
+            downloaded_revision TEXT,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            PRIMARY KEY (artist_url, tab_url)
+        )''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS tabs_tab_url ON tabs(tab_url)')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS artists (
+            artist_url TEXT PRIMARY KEY,
+            last_sync REAL NOT NULL
+        )''')
+        self._db.commit()
+
+    def downloaded_revisions(self, artist_url: str) -> Dict[str, Optional[str]]:
+        """{tab_url: revision last downloaded, or None} for every tab known under the artist"""
+        with self._lock:
+            rows = self._db.execute('SELECT tab_url, downloaded_revision FROM tabs WHERE artist_url = ?',
+                                    (artist_url,)).fetchall()
+        return dict(rows)
+
+    def record_seen(self, artist_url: str, seen: Iterable[Tuple[str, str]]) -> None:
+        """Record (tab_url, revision) pairs listed under the artist, in one commit"""
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                'INSERT INTO tabs (artist_url, tab_url, revision, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (artist_url, tab_url) DO UPDATE SET revision = excluded.revision, '
+                'last_seen = excluded.last_seen',
+                ((artist_url, tab_url, revision, now, now) for tab_url, revision in seen))
+            self._db.commit()
+
+    def outstanding(self, artist_url: str) -> List[str]:
+        """Known tabs whose current revision has not been downloaded (e.g. failed last time)"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT tab_url FROM tabs WHERE artist_url = ? AND downloaded_revision IS NOT revision '
+                'ORDER BY first_seen', (artist_url,)).fetchall()
+        return [row[0] for row in rows]
+
+    def mark_downloaded(self, tab_urls: Iterable[str]) -> None:
+        """Record the current revision of each tab as downloaded, under every artist listing it"""
+        with self._lock:
+            self._db.executemany('UPDATE tabs SET downloaded_revision = revision WHERE tab_url = ?',
+                                 ((url,) for url in tab_urls))
+            self._db.commit()
+
+    def mark_skipped(self, tab_urls: Iterable[str]) -> None:
+        """Settle tabs deliberately not downloaded (e.g. versions dropped by --best) at their current revision"""
+        self.mark_downloaded(tab_urls)
+
+    def mark_synced(self, artist_url: str) -> None:
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO artists VALUES (?, ?)', (artist_url, time.time()))
+            self._db.commit()
+
+    def print_summary(self) -> None:
+        with self._lock:
+            artists = self._db.execute('SELECT COUNT(*) FROM artists').fetchone()[0]
+            tabs, downloaded = self._db.execute(
+                'SELECT COUNT(DISTINCT tab_url), COUNT(DISTINCT CASE WHEN downloaded_revision IS revision '
+                'THEN tab_url END) FROM tabs').fetchone()
+        print(f"📚 Library ({self.path}): {artists} artists, {downloaded}/{tabs} tabs up to date")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
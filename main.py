@@ -1,33 +1,125 @@
 from argparse import ArgumentParser
-from typing import List, Union, Optional
+from typing import Iterable, Iterator, List, Tuple, Union, Optional
 from pathlib import Path
+import asyncio
+import threading
 import httpx
 import re
 import os
 import json
-import html
 import random
 import time
 import secrets
 from urllib.parse import unquote
 
+from session import UGSession, AsyncUGSession, DEFAULT_MAX_CONNECTIONS
+from cookiejar import SharedCookieJar, CookieFileError
+from ratelimit import RateController, DEFAULT_RATE, DEFAULT_MAX_RATE
+from retry import RetryPolicy, CircuitBreaker, is_transient, DEFAULT_RETRIES, DEFAULT_BREAKER_THRESHOLD
+from auth import AuthState, AuthExpiredError, ON_EXPIRED_ABORT, ON_EXPIRED_CHOICES
+from metrics import Stopwatch, print_summary, write_metrics, METRICS_FORMATS
+from cache import HTTPCache, parse_ttls, DEFAULT_CACHE_MAX_MB
+from journal import JobJournal, TOKEN_FETCHED, DOWNLOADED, FAILED
+from library import ArtistLibrary, DEFAULT_LIBRARY_FILE, DEFAULT_STOP_AFTER
+from storage import (OutputStore, STORED, LINKED, UNCHANGED, REVALIDATED, response_validators, conditional_headers,
+                     is_unchanged)
+from archive import ArchiveStore, DEFAULT_ARCHIVE_MAX_MB
+from catalog import TabCatalog, is_catalog, add_query_arguments, query_from_args, DEFAULT_CATALOG_FILE
+from selection import BestVersions, SELECT_POLICIES, DEFAULT_SELECT_POLICY
+from events import (EventBus, VerboseSink, TabStarted, PageRequested, TokenFound, TabDownloaded, TabFailed,
+                    TabNotice, add_event_arguments, bus_from_args)
+from extract import (extract_data_content, aextract_data_content, drain_limit_for, unread_bytes, loads,
+                     PAGE_CHUNK_SIZE, DEFAULT_DRAIN_LIMIT)
+from urlinput import TabInput, STDIN
+
+DEFAULT_CONCURRENCY = 4
+UG_BASE_URL = 'https://www.ultimate-guitar.com'
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# URLs registered in the journal per write while the input is streamed
+JOURNAL_CHUNK = 500
+NO_BLOB_NOTICE = "ERROR: Could not find the 'data-content' JSON blob. UG site structure may have changed."
+
 # Import our scraper module
 try:
-    from scraper import UGArtistScraper
+    from scraper import (UGArtistScraper, DEFAULT_ARTIST_WORKERS, read_artist_urls, artist_breakdown_file,
+                         save_artist_breakdown)
 except ImportError:
     UGArtistScraper = None
+    DEFAULT_ARTIST_WORKERS = 4
     print("⚠️  Warning: scraper.py not found. Artist scraping functionality disabled.")
 
+class TabDownloadError(Exception):
+    """A tab could not be downloaded; the message is the reason recorded in the journal"""
+
+    def __init__(self, reason: str, transient: bool = False):
+        super().__init__(reason)
+        # Read by retry.is_transient: only transient failures are worth another attempt
+        self.transient = transient
+
+
+def failure_reason(error: Exception) -> str:
+    """Short one-line reason for the journal"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code}"
+    return str(error).splitlines()[0] if str(error) else type(error).__name__
+
+
 class UGDownloader:
-    def __init__(self, cookies_file: Optional[str] = None):
+    def __init__(self, cookies_file: Optional[str] = None, session: Optional[UGSession] = None,
+                 http2: bool = False, max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 async_session: Optional[AsyncUGSession] = None, output_dir: str = 'output',
+                 cache: Optional[HTTPCache] = None, journal: Optional[JobJournal] = None,
+                 rate_controller: Optional[RateController] = None, retry_policy: Optional[RetryPolicy] = None,
+                 on_auth_expired: str = ON_EXPIRED_ABORT, base_url: str = UG_BASE_URL,
+                 store: Optional[Union[OutputStore, ArchiveStore]] = None, events: Optional[EventBus] = None,
+                 refresh: bool = False, drain_limit: int = DEFAULT_DRAIN_LIMIT):
         """
         Initialize UG Downloader
-        cookies_file: path to cookies file (JSON format)
+        cookies_file: path to cookies file (JSON or Netscape cookies.txt), kept up to date with
+            the server's Set-Cookie refreshes (see cookiejar.SharedCookieJar)
+        session: shared UGSession to reuse (a new one is created and owned otherwise)
+        http2, max_connections: options for the owned sessions
+        async_session: shared AsyncUGSession for the *_async methods (created lazily otherwise)
+        output_dir: directory downloaded tabs are written to (indexed by an OutputStore, see storage.py)
+        cache: optional HTTPCache for tab pages, used by the owned sessions
+        journal: optional JobJournal that every tab's progress is recorded in
+        rate_controller: pacing for the owned sessions (default: the shared session's, or a new one);
+            the sync and async sessions always share it, as they share the session's Metrics
+        retry_policy: how transient failures are retried (default: RetryPolicy())
+        on_auth_expired: 'abort' or 'pause' the queue once the cookies stop working (see auth.AuthState)
+        base_url: site root for download links and the auth check (e.g. a local mock server in benchmarks)
+        store: where finished downloads go (default: an OutputStore on output_dir; ArchiveStore for tar output)
+        events: EventBus that per-tab progress is reported to (default: the classic verbose log)
+        refresh: re-request tabs that are already saved conditionally (ETag / Last-Modified), so an
+            unchanged file is neither transferred nor rewritten
+        drain_limit: most bytes of a tab page read past its blob to keep an HTTP/1.1 connection (see extract.py)
         """
-        self.cookies = {}
-        if cookies_file and os.path.exists(cookies_file):
-            with open(cookies_file, 'r') as f:
-                self.cookies = json.load(f)
+        self.cookies_file = cookies_file
+        self.cookie_jar = session.cookie_jar if session is not None else None
+        if self.cookie_jar is None and cookies_file:
+            self.cookie_jar = SharedCookieJar(cookies_file)
+        self.cookies = self.cookie_jar.values() if self.cookie_jar is not None else {}
+
+        self.output_dir = output_dir
+        self.store = store or OutputStore(output_dir)
+        self.events = events or EventBus([VerboseSink()])
+        self.refresh = refresh
+        self.drain_limit = drain_limit
+        self.base_url = base_url.rstrip('/')
+        self.http2 = http2
+        self.max_connections = max_connections
+        self.cache = cache
+        self.journal = journal
+        self._owns_session = session is None
+        self.session = session or UGSession(http2=http2, max_connections=max_connections, cache=cache,
+                                            rate_controller=rate_controller, cookie_jar=self.cookie_jar)
+        self.rate_controller = self.session.rate_controller
+        self.metrics = self.session.metrics
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.auth = AuthState(on_auth_expired, cookies_file, self.reload_cookies)
+        self._owns_async_session = async_session is None
+        self._async_session = async_session
+        self._closed_async_stats = []
         
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
@@ -45,186 +137,704 @@ class UGDownloader:
             'sec-ch-ua-platform': '"Windows"'
         }
 
+    @property
+    def async_session(self) -> AsyncUGSession:
+        """AsyncUGSession used by the *_async methods, created on first use"""
+        if self._async_session is None:
+            self._async_session = AsyncUGSession(http2=self.http2, max_connections=self.max_connections,
+                                                 cache=self.cache, rate_controller=self.rate_controller,
+                                                 metrics=self.metrics, cookie_jar=self.cookie_jar)
+        return self._async_session
+
+    def reload_cookies(self):
+        """Re-read the cookies file into both sessions (used when a paused queue resumes)"""
+        if self.cookie_jar is None:
+            return
+        self.cookie_jar.reload()
+        self.cookies = self.cookie_jar.values()
+
+    def close(self):
+        """Close the HTTP session if this downloader owns it, the output index and the event sinks"""
+        if self._owns_session:
+            self.session.close()
+        self.store.close()
+        self.events.close()
+
+    async def _aclose_async_session(self):
+        if self._owns_async_session and self._async_session is not None:
+            await self._async_session.aclose()
+            # Keep its counters for connection_stats(); a new session is created on next use
+            self._closed_async_stats.append(self._async_session.stats())
+            self._async_session = None
+
+    async def aclose(self):
+        """Close both sessions this downloader owns (call from the event loop)"""
+        await self._aclose_async_session()
+        self.close()
+
+    def connection_stats(self) -> dict:
+        """Connection usage summed over the sync and async sessions"""
+        all_stats = [self.session.stats()] + self._closed_async_stats
+        if self._async_session is not None:
+            all_stats.append(self._async_session.stats())
+        return {key: sum(stats[key] for stats in all_stats) for key in all_stats[0]}
+
+    def print_stats(self):
+        stats = self.connection_stats()
+        print(f"🔌 Connections: {stats['connections_opened']} opened, "
+              f"{stats['connections_reused']} reused ({stats['requests']} requests)")
+        if self.cache is not None:
+            self.cache.print_stats()
+        self.rate_controller.print_stats()
+        self.retry_policy.print_stats()
+        self.store.print_stats()
+        if self.cookie_jar is not None:
+            self.cookie_jar.print_stats()
+        self.auth.print_status()
+        print_summary(self.metrics_snapshot())
+
+    def metrics_snapshot(self) -> dict:
+        """Phase timings and counters of this downloader's sessions, plus retry and cache totals"""
+        stats = self.connection_stats()
+        counters = {
+            'requests': stats['requests'],
+            'connections_opened': stats['connections_opened'],
+            'retries': self.retry_policy.retried,
+            'circuit_breaker_trips': self.retry_policy.breaker.trips,
+            'files_deduplicated': self.store.counts[LINKED] + self.store.counts[UNCHANGED],
+            'files_revalidated': self.store.counts[REVALIDATED],
+            'bytes_deduplicated': self.store.bytes_saved,
+        }
+        if self.cache is not None:
+            cache_stats = self.cache.stats()
+            counters.update({f'cache_{key}': cache_stats[key] for key in ('hits', 'revalidated', 'misses')})
+        return self.metrics.snapshot(counters)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _page_headers(self) -> dict:
+        headers = self.headers.copy()
+        headers['Referer'] = self.base_url + '/'
+        return headers
+
+    def _download_headers(self, tab_url: str) -> dict:
+        headers = self.headers.copy()
+        headers['Referer'] = tab_url
+        headers['sec-fetch-dest'] = 'document'
+        headers['sec-fetch-mode'] = 'navigate'
+        headers['sec-fetch-site'] = 'same-site'
+        headers['sec-fetch-user'] = '?1'
+        headers['upgrade-insecure-requests'] = '1'
+        headers['priority'] = 'u=0, i'
+        return headers
+
+    def _parse_tab_page(self, tab_url: str, json_string: str) -> str:
+        """
+        Finds the binary_id in a tab page's embedded JSON and constructs the download URL.
+        Raises TabDownloadError if there is none, json.JSONDecodeError if the blob is malformed
+        and AuthExpiredError if the page was served to an anonymous user.
+        """
+        page_data = loads(json_string)
+
+        # --- THE REAL AUTHENTICATION CHECK ---
+        # Cached for the session: only the first page logs it, an anonymous page stops the queue
+        self.auth.observe_user(page_data.get('store', {}).get('user', {}), "tab page")
+        # --- END OF AUTH CHECK ---
+
+        # --- THE GOLDEN TICKET: ENCRYPTED DOWNLOAD TOKEN ---
+        # This is the real download token, not a simple integer ID.
+        binary_id = page_data.get('store', {}).get('page', {}).get('data', {}).get('tab_view', {}).get('binary_id')
+        if not binary_id:
+            tab_view = page_data.get('store', {}).get('page', {}).get('data', {}).get('tab_view', {})
+            self.events.emit(TabNotice, tab_url, "ERROR: Could not find 'binary_id' (the encrypted download token) "
+                                                 f"in the JSON data. Available keys in tab_view: {list(tab_view)[:10]}")
+            raise TabDownloadError("no binary_id in page data")
+
+        # Construct the final download URL exactly as the browser does
+        return f"{self.base_url}/tab/download?id={binary_id}&session_id="
+
+    def _timed_parse(self, tab_url: str, json_string: str, scan_seconds: float) -> str:
+        """_parse_tab_page, recording it plus the time spent scanning for the blob as the 'extract' phase"""
+        with Stopwatch() as parse:
+            download_url = self._parse_tab_page(tab_url, json_string)
+        self.metrics.observe('extract', scan_seconds + parse.elapsed)
+        return download_url
+
+    def _absolute_download_url(self, download_url: str) -> str:
+        # Ensure the URL is absolute
+        if download_url.startswith('/'):
+            download_url = self.base_url + download_url
+        elif not download_url.startswith('http'):
+            download_url = self.base_url + '/' + download_url
+        return download_url
+
+    def _report_html_response(self, tab_url: str, response: httpx.Response) -> None:
+        # Check auth status in response headers
+        unified_id = response.headers.get('x-ug-unified-id', 'not found')
+        self.events.emit(TabNotice, tab_url, "Got HTML response instead of file - likely need to be logged in "
+                                             f"(x-ug-unified-id: {unified_id})")
+        if unified_id == '0':
+            self.events.emit(TabNotice, tab_url, "❌ Download failed: You appear to be anonymous")
+
+    @staticmethod
+    def _filename_from_response(response: httpx.Response, tab_url: str) -> str:
+        # Get filename from Content-Disposition header
+        content_disposition = response.headers.get('content-disposition', '')
+        if content_disposition:
+            filename_match = re.search(r'filename[*]?=["\']?([^"\';\n]*)', content_disposition)
+            if filename_match:
+                return unquote(filename_match.group(1))
+        # Fallback: extract from URL or tab title
+        tab_id = re.search(r'(\d+)$', tab_url)
+        return f"tab_{tab_id.group() if tab_id else 'unknown'}.gp"
+
+    def _binary_request_headers(self, tab_url: str, refresh: Optional[bool] = None) -> Tuple[dict, Optional[dict]]:
+        """(headers, validators of the saved file or None); in refresh mode the request is conditional"""
+        headers = self._download_headers(tab_url)
+        known = self.store.validators(tab_url) if (self.refresh if refresh is None else refresh) else None
+        if known is not None:
+            headers.update(conditional_headers(known))
+        return headers, known
+
+    def _report_revalidated(self, tab_url: str, known: dict, response: httpx.Response) -> None:
+        """The saved file is current: count it without reading the body (closing the response drops it)"""
+        path = self.store.revalidated(tab_url, response_validators(response.headers))
+        self.metrics.count('tabs_downloaded')
+        self.events.emit(TabDownloaded, tab_url, path, known['size'], known['sha256'], REVALIDATED)
+        self._record(tab_url, DOWNLOADED, path=path, sha256=known['sha256'])
+
+    def _record(self, tab_url: str, state: str, **details) -> None:
+        if self.journal is not None:
+            self.journal.record(tab_url, state, **details)
+
     def get_download_token_from_page(self, tab_url: str) -> Optional[str]:
         """
         Extracts tab data from the page's embedded JSON, finds the correct
         version ID, and constructs the download URL.
         """
-        print(f"Getting tab data from: {tab_url}")
+        try:
+            return self._fetch_download_url(tab_url)
+        except TabDownloadError:
+            return None
 
-        with httpx.Client(cookies=self.cookies, timeout=30.0) as client:
-            headers = self.headers.copy()
-            headers['Referer'] = 'https://www.ultimate-guitar.com/'
+    def _fetch_download_url(self, tab_url: str) -> str:
+        """get_download_token_from_page, raising TabDownloadError with the reason on failure"""
+        self.events.emit(PageRequested, tab_url)
 
-            try:
-                response = client.get(tab_url, headers=headers, follow_redirects=True)
+        try:
+            # Stop reading the page as soon as the data-content blob is complete
+            with self.session.stream('GET', tab_url, headers=self._page_headers(), follow_redirects=True) as response:
                 response.raise_for_status()
+                network, scan = Stopwatch(), Stopwatch()
+                with scan:
+                    json_string = extract_data_content(network.wrap(response.iter_bytes(PAGE_CHUNK_SIZE)),
+                                                       response.charset_encoding or 'utf-8',
+                                                       drain_limit_for(response, self.drain_limit),
+                                                       lambda: unread_bytes(response))
+            if json_string is None:
+                self.events.emit(TabNotice, tab_url, NO_BLOB_NOTICE)
+                raise TabDownloadError("no data-content blob on page")
+            return self._timed_parse(tab_url, json_string, scan.elapsed - network.elapsed)
 
-                # NEW, MORE ROBUST REGEX: Looks for any JSON object inside data-content
-                match = re.search(r'data-content="({.+?})"', response.text)
-                if not match:
-                    print("ERROR: Could not find the 'data-content' JSON blob. UG site structure may have changed.")
-                    # Сохраняем страницу для отладки, если что-то пошло не так
-                    with open("debug_page_content.html", "w", encoding="utf-8") as f:
-                        f.write(response.text)
-                    print("Saved page content to debug_page_content.html for analysis.")
-                    return None
-
-                json_string = html.unescape(match.group(1))
-                page_data = json.loads(json_string)
-
-                # --- THE REAL AUTHENTICATION CHECK ---
-                user_info = page_data.get('store', {}).get('user', {})
-                user_id = user_info.get('id', 0)
-                username = user_info.get('username', 'anonymous')
-
-                if user_id == 0:
-                    print(f"❌ AUTHENTICATION FAILED: Logged in as anonymous user (user_id: 0).")
-                    print("💡 Your cookies are likely invalid or expired. Please export fresh cookies.")
-                    return None
-                
-                print(f"✅ Authenticated successfully as '{username}' (user_id: {user_id}).")
-                # --- END OF AUTH CHECK ---
-
-                # --- THE GOLDEN TICKET: ENCRYPTED DOWNLOAD TOKEN ---
-                # This is the real download token, not a simple integer ID.
-                binary_id = page_data.get('store', {}).get('page', {}).get('data', {}).get('tab_view', {}).get('binary_id')
-                if not binary_id:
-                    print("ERROR: Could not find 'binary_id' (the encrypted download token) in the JSON data.")
-                    print("Available keys in tab_view:", list(page_data.get('store', {}).get('page', {}).get('data', {}).get('tab_view', {}).keys())[:10])
-                    return None
-
-                print(f"✅ Found encrypted download token (binary_id): {binary_id[:50]}...")
-
-                # Construct the final download URL exactly as the browser does
-                download_url = f"https://www.ultimate-guitar.com/tab/download?id={binary_id}&session_id="
-                print(f"Successfully constructed download URL: {download_url}")
-                return download_url
-
-            except json.JSONDecodeError as e:
-                print(f"ERROR: Failed to parse JSON data from the page: {e}")
-                return None
-            except Exception as e:
-                print(f"An error occurred while getting tab data: {e}")
-                return None
+        except (TabDownloadError, AuthExpiredError):
+            raise
+        except json.JSONDecodeError as e:
+            self.events.emit(TabNotice, tab_url, f"ERROR: Failed to parse JSON data from the page: {e}")
+            raise TabDownloadError(f"invalid page JSON: {e}") from e
+        except Exception as e:
+            self.events.emit(TabNotice, tab_url, f"An error occurred while getting tab data: {e}")
+            raise TabDownloadError(failure_reason(e), transient=is_transient(e)) from e
+
+    async def get_download_token_from_page_async(self, tab_url: str) -> Optional[str]:
+        """
+        Awaitable version of get_download_token_from_page using the async session
+        """
+        try:
+            return await self._fetch_download_url_async(tab_url)
+        except TabDownloadError:
+            return None
+
+    async def _fetch_download_url_async(self, tab_url: str) -> str:
+        self.events.emit(PageRequested, tab_url)
+
+        try:
+            # Stop reading the page as soon as the data-content blob is complete
+            async with self.async_session.stream('GET', tab_url, headers=self._page_headers(),
+                                                 follow_redirects=True) as response:
+                response.raise_for_status()
+                network, scan = Stopwatch(), Stopwatch()
+                with scan:
+                    json_string = await aextract_data_content(network.awrap(response.aiter_bytes(PAGE_CHUNK_SIZE)),
+                                                              response.charset_encoding or 'utf-8',
+                                                              drain_limit_for(response, self.drain_limit),
+                                                              lambda: unread_bytes(response))
+            if json_string is None:
+                self.events.emit(TabNotice, tab_url, NO_BLOB_NOTICE)
+                raise TabDownloadError("no data-content blob on page")
+            return self._timed_parse(tab_url, json_string, scan.elapsed - network.elapsed)
+
+        except (TabDownloadError, AuthExpiredError):
+            raise
+        except json.JSONDecodeError as e:
+            self.events.emit(TabNotice, tab_url, f"ERROR: Failed to parse JSON data from the page: {e}")
+            raise TabDownloadError(f"invalid page JSON: {e}") from e
+        except Exception as e:
+            self.events.emit(TabNotice, tab_url, f"An error occurred while getting tab data: {e}")
+            raise TabDownloadError(failure_reason(e), transient=is_transient(e)) from e
 
     def check_auth_status(self) -> bool:
         """Check if we're authenticated with Ultimate Guitar"""
         print("🔐 Checking authentication status...")
         
-        with httpx.Client(cookies=self.cookies, timeout=30.0) as client:
-            headers = self.headers.copy()
-            headers['Sec-Fetch-Site'] = 'none'
-            headers['Sec-Fetch-User'] = '?1'
-            
-            try:
-                response = client.get('https://www.ultimate-guitar.com/', headers=headers)
-                unified_id = response.headers.get('x-ug-unified-id', '0')
-                
-                if unified_id == '0':
-                    print("❌ Not authenticated (x-ug-unified-id=0)")
-                    print("💡 Please check your cookies.json file and ensure you're logged in")
-                    return False
-                else:
-                    print(f"✅ Authenticated (unified ID: {unified_id})")
-                    return True
-                    
-            except Exception as e:
-                print(f"⚠️  Could not check auth status: {e}")
+        headers = self.headers.copy()
+        headers['Sec-Fetch-Site'] = 'none'
+        headers['Sec-Fetch-User'] = '?1'
+
+        try:
+            response = self.session.get(self.base_url + '/', headers=headers)
+            unified_id = response.headers.get('x-ug-unified-id', '0')
+
+            if unified_id == '0':
+                print("❌ Not authenticated (x-ug-unified-id=0)")
+                print("💡 Please check your cookies.json file and ensure you're logged in")
                 return False
+            else:
+                print(f"✅ Authenticated (unified ID: {unified_id})")
+                return True
+
+        except Exception as e:
+            print(f"⚠️  Could not check auth status: {e}")
+            return False
 
     def download_tab(self, tab_url: str) -> bool:
         """
         Download tab from Ultimate Guitar
+        Transient failures are retried according to self.retry_policy. Once the session
+        is known to be logged out nothing is sent: False is returned right away (abort)
+        or after fresh cookies were loaded and the tab retried (pause).
         """
-        # The auth check is now part of get_download_token_from_page, so we can remove the separate check.
-        download_url = self.get_download_token_from_page(tab_url)
-        if not download_url:
-            print(f"Could not get download URL for: {tab_url}")
-            return False
-        
-        # Ensure the URL is absolute
-        if download_url.startswith('/'):
-            download_url = 'https://www.ultimate-guitar.com' + download_url
-        elif not download_url.startswith('http'):
-            download_url = 'https://www.ultimate-guitar.com/' + download_url
-        
-        print(f"Downloading from: {download_url}")
-        
-        with httpx.Client(cookies=self.cookies, timeout=30.0) as client:
-            headers = self.headers.copy()
-            headers['Referer'] = tab_url
-            headers['sec-fetch-dest'] = 'document'
-            headers['sec-fetch-mode'] = 'navigate'
-            headers['sec-fetch-site'] = 'same-site'
-            headers['sec-fetch-user'] = '?1'
-            headers['upgrade-insecure-requests'] = '1'
-            headers['priority'] = 'u=0, i'
-            
+        self.metrics.begin('tabs_downloaded')
+        while True:
+            probing = False
             try:
-                response = client.get(download_url, headers=headers)
+                probing = self.auth.wait()
+                self.retry_policy.call(self._download_tab_once, tab_url)
+                return True
+            except AuthExpiredError:
+                # Not a failure of this tab: it stays pending in the journal for --resume
+                if not self.auth.pause:
+                    return False
+            except Exception as e:
+                self._record(tab_url, FAILED, reason=failure_reason(e))
+                self.events.emit(TabFailed, tab_url, failure_reason(e))
+                return False
+            finally:
+                if probing:
+                    self.auth.release()
+
+    def _download_tab_once(self, tab_url: str) -> None:
+        """One download attempt; raises on failure"""
+        # Auth is checked once per session (see download_tab and _parse_tab_page), not per tab
+        try:
+            download_url = self._fetch_download_url(tab_url)
+        except TabDownloadError:
+            self.events.emit(TabNotice, tab_url, f"Could not get download URL for: {tab_url}")
+            raise
+        self._record(tab_url, TOKEN_FETCHED)
+
+        download_url = self._absolute_download_url(download_url)
+        self.events.emit(TokenFound, tab_url, download_url)
+
+        try:
+            headers, known = self._binary_request_headers(tab_url)
+            with self.session.stream('GET', download_url, headers=headers) as response:
+                if known is not None and is_unchanged(known, response):
+                    self._report_revalidated(tab_url, known, response)
+                    return
                 response.raise_for_status()
-                
+
                 # Check if we got the file or an error page
-                content_type = response.headers.get('content-type', '')
-                if 'text/html' in content_type:
-                    print("Got HTML response instead of file - likely need to be logged in")
-                    with open("headers.txt", "w") as f:
-                        f.write(str(response.headers))
-                    with open("text.txt", "w") as f:
-                        f.write(response.text)
-                    
-                    # Check auth status in response headers
-                    unified_id = response.headers.get('x-ug-unified-id', 'not found')
-                    print(f"Response x-ug-unified-id: {unified_id}")
-                    
-                    if unified_id == '0':
-                        print("❌ Download failed: You appear to be anonymous")
-                    
-                    return False
-                
-                # Get filename from Content-Disposition header
-                content_disposition = response.headers.get('content-disposition', '')
-                if content_disposition:
-                    filename_match = re.search(r'filename[*]?=["\']?([^"\';\n]*)', content_disposition)
-                    if filename_match:
-                        filename = unquote(filename_match.group(1))
-                    else:
-                        # Fallback: extract from URL or tab title
-                        tab_id = re.search(r'(\d+)$', tab_url)
-                        filename = f"tab_{tab_id.group() if tab_id else 'unknown'}.gp"
-                else:
-                    # Fallback filename
-                    tab_id = re.search(r'(\d+)$', tab_url)
-                    filename = f"tab_{tab_id.group() if tab_id else 'unknown'}.gp"
-                
-                # Ensure output directory exists
-                if not os.path.exists('output'):
-                    os.makedirs('output')
-                
-                # Save file
-                output_path = os.path.join('output', filename)
-                with open(output_path, 'wb') as f:
-                    f.write(response.content)
-                
-                print(f"Successfully downloaded: {filename}")
+                if 'text/html' in response.headers.get('content-type', ''):
+                    self._report_html_response(tab_url, response)
+                    self.auth.observe_unified_id(response.headers.get('x-ug-unified-id'), "download")
+                    raise TabDownloadError("got HTML instead of file")
+
+                # Stream the body to a temp file; it only gets its real name once complete
+                filename = self._filename_from_response(response, tab_url)
+                disk = Stopwatch()
+                with self.store.open_writer() as writer:
+                    for chunk in response.iter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        with disk:
+                            writer.write(chunk)
+                    with disk:
+                        path, how = self.store.commit(writer, filename, tab_url,
+                                                      response_validators(response.headers))
+
+            self.metrics.observe('write', disk.elapsed)
+            self.metrics.count('tabs_downloaded')
+            if how == STORED:
+                self.metrics.count('bytes_written', writer.size)
+            self.events.emit(TabDownloaded, tab_url, path, writer.size, writer.sha256, how)
+            self._record(tab_url, DOWNLOADED, path=path, sha256=writer.sha256)
+
+        except (TabDownloadError, AuthExpiredError):
+            raise
+        except Exception as e:
+            self.events.emit(TabNotice, tab_url, f"Error downloading: {e}")
+            raise
+
+    async def download_tab_async(self, tab_url: str, refresh: Optional[bool] = None) -> bool:
+        """
+        Awaitable version of download_tab using the async session
+        refresh: overrides self.refresh for this tab (the daemon decides per job)
+        """
+        self.metrics.begin('tabs_downloaded')
+        while True:
+            probing = False
+            try:
+                probing = await self.auth.wait_async()
+                await self.retry_policy.call_async(self._download_tab_once_async, tab_url, refresh)
                 return True
-                
+            except AuthExpiredError:
+                if not self.auth.pause:
+                    return False
             except Exception as e:
-                print(f"Error downloading: {e}")
+                await self._record_async(tab_url, FAILED, reason=failure_reason(e))
+                self.events.emit(TabFailed, tab_url, failure_reason(e))
                 return False
+            finally:
+                if probing:
+                    self.auth.release()
+
+    async def _record_async(self, tab_url: str, state: str, **details) -> None:
+        """_record off the event loop: a journal commit waits for the disk"""
+        if self.journal is not None:
+            await asyncio.to_thread(self.journal.record, tab_url, state, **details)
+
+    async def _download_tab_once_async(self, tab_url: str, refresh: Optional[bool] = None) -> None:
+        # Disk and SQLite work runs in worker threads, so a slow disk never stalls other requests
+        try:
+            download_url = await self._fetch_download_url_async(tab_url)
+        except TabDownloadError:
+            self.events.emit(TabNotice, tab_url, f"Could not get download URL for: {tab_url}")
+            raise
+        await self._record_async(tab_url, TOKEN_FETCHED)
+
+        download_url = self._absolute_download_url(download_url)
+        self.events.emit(TokenFound, tab_url, download_url)
+
+        try:
+            headers, known = await asyncio.to_thread(self._binary_request_headers, tab_url, refresh)
+            async with self.async_session.stream('GET', download_url, headers=headers) as response:
+                if known is not None and is_unchanged(known, response):
+                    path = await asyncio.to_thread(self.store.revalidated, tab_url,
+                                                   response_validators(response.headers))
+                    self.metrics.count('tabs_downloaded')
+                    self.events.emit(TabDownloaded, tab_url, path, known['size'], known['sha256'], REVALIDATED)
+                    await self._record_async(tab_url, DOWNLOADED, path=path, sha256=known['sha256'])
+                    return
+                response.raise_for_status()
+
+                # Check if we got the file or an error page
+                if 'text/html' in response.headers.get('content-type', ''):
+                    self._report_html_response(tab_url, response)
+                    self.auth.observe_unified_id(response.headers.get('x-ug-unified-id'), "download")
+                    raise TabDownloadError("got HTML instead of file")
+
+                # Stream the body to a temp file; it only gets its real name once complete
+                filename = self._filename_from_response(response, tab_url)
+                disk = Stopwatch()
+                with disk:
+                    writer = await asyncio.to_thread(self.store.open_writer)
+                with writer:
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        with disk:
+                            await asyncio.to_thread(writer.write, chunk)
+                    with disk:
+                        path, how = await asyncio.to_thread(self.store.commit, writer, filename, tab_url,
+                                                            response_validators(response.headers))
+
+            self.metrics.observe('write', disk.elapsed)
+            self.metrics.count('tabs_downloaded')
+            if how == STORED:
+                self.metrics.count('bytes_written', writer.size)
+            self.events.emit(TabDownloaded, tab_url, path, writer.size, writer.sha256, how)
+            await self._record_async(tab_url, DOWNLOADED, path=path, sha256=writer.sha256)
+
+        except (TabDownloadError, AuthExpiredError):
+            raise
+        except Exception as e:
+            self.events.emit(TabNotice, tab_url, f"Error downloading: {e}")
+            raise
+
+    async def download_many_async(self, urls: Iterable[str],
+                                  concurrency: int = DEFAULT_CONCURRENCY) -> Tuple[int, List[str]]:
+        """
+        Download tabs with at most `concurrency` in flight at once
+        Returns (success_count, failed_urls); failed_urls includes tabs skipped after the session expired
+        """
+        try:
+            total = len(urls)
+        except TypeError:
+            total = None
+        pending = enumerate(urls, 1)
+        success_count = 0
+        failed_urls = []
+
+        async def worker():
+            nonlocal success_count
+            # Workers share one iterator, so each URL is taken exactly once
+            for i, url in pending:
+                if self.auth.expired and not self.auth.pause:
+                    failed_urls.append(url)
+                    continue
+                self.events.emit(TabStarted, url, i, total)
+                if await self.download_tab_async(url):
+                    success_count += 1
+                else:
+                    failed_urls.append(url)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        return success_count, failed_urls
+
+    async def download_queue_async(self, queue: asyncio.Queue,
+                                   concurrency: int = DEFAULT_CONCURRENCY) -> Tuple[int, List[str]]:
+        """
+        Download URLs taken from `queue` while it is still being filled
+        Each worker stops when it takes a None, so put one None per worker when done.
+        Returns (success_count, failed_urls)
+        """
+        taken = 0
+        success_count = 0
+        failed_urls = []
+
+        async def worker():
+            nonlocal taken, success_count
+            while True:
+                url = await queue.get()
+                if url is None:
+                    return
+                taken += 1
+                if self.auth.expired and not self.auth.pause:
+                    failed_urls.append(url)
+                    continue
+                self.events.emit(TabStarted, url, taken)
+                if await self.download_tab_async(url):
+                    success_count += 1
+                else:
+                    failed_urls.append(url)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        return success_count, failed_urls
+
+def plan_batch(journal: JobJournal, urls: List[str], resume: bool = False,
+               retry_failed: bool = False, store: Optional[OutputStore] = None) -> Tuple[List[str], int]:
+    """
+    Register a batch in the journal and pick the URLs to process
+    With `resume`, URLs whose file is already in `store` are skipped too (e.g. after the journal was deleted).
+    Returns (urls_to_download, skipped_count)
+    """
+    if retry_failed:
+        failed = journal.urls_in_state(FAILED)
+        return failed, max(0, len(urls) - len(failed))
+    journal.add_pending(urls)
+    if not resume:
+        return urls, 0
+    todo = [url for url in urls if not (journal.is_done(url) or (store is not None and store.has(url)))]
+    return todo, len(urls) - len(todo)
+
+def download_batch(downloader: UGDownloader, urls: Iterable[str],
+                   concurrency: int = DEFAULT_CONCURRENCY) -> Tuple[int, List[str]]:
+    """
+    Run UGDownloader.download_many_async from synchronous code
+    The async session is bound to this event loop, so it is closed before returning
+    """
+    async def run():
+        try:
+            return await downloader.download_many_async(urls, concurrency)
+        finally:
+            await downloader._aclose_async_session()
+            downloader.events.flush()
+
+    return asyncio.run(run())
+
+def download_pipeline(downloader: UGDownloader, urls: Iterable[str], concurrency: int = DEFAULT_CONCURRENCY,
+                      queue_size: Optional[int] = None) -> Tuple[int, List[str]]:
+    """
+    Download URLs while a blocking iterator (e.g. the artist scraper) is still producing them
+    The iterator runs in a background thread and feeds a bounded queue: it is paused
+    whenever `queue_size` URLs (default 2 x concurrency) are waiting for a download slot.
+    """
+    queue_size = queue_size or 2 * max(1, concurrency)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(queue_size)
+
+        def put(url: Optional[str]) -> None:
+            # Blocks this thread while the queue is full
+            asyncio.run_coroutine_threadsafe(queue.put(url), loop).result()
+
+        def produce():
+            try:
+                for url in urls:
+                    put(url)
+            except Exception as e:
+                print(f"❌ URL producer failed: {e}")
+            finally:
+                for _ in range(max(1, concurrency)):
+                    put(None)
+
+        # A daemon thread, so an interrupted run never waits for the producer to finish
+        threading.Thread(target=produce, name='url-producer', daemon=True).start()
+        try:
+            return await downloader.download_queue_async(queue, concurrency)
+        finally:
+            await downloader._aclose_async_session()
+            downloader.events.flush()
+
+    return asyncio.run(run())
+
+def record_urls(urls: Iterable[str], output_file: str, journal: JobJournal,
+                resume: bool = False, store: Optional[OutputStore] = None) -> Iterator[str]:
+    """
+    Pass URLs through while appending each to `output_file` and the journal as it arrives
+    With `resume`, URLs already downloaded (per the journal or `store`) are written but not yielded.
+    """
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for url in urls:
+            f.write(url + '\n')
+            f.flush()
+            journal.add_pending([url])
+            if resume and (journal.is_done(url) or (store is not None and store.has(url))):
+                print(f"⏭️  Already downloaded: {url}")
+                continue
+            yield url
+
+def stream_batch(journal: JobJournal, urls: Iterable[str], resume: bool = False,
+                 store: Optional[OutputStore] = None, counts: Optional[dict] = None) -> Iterator[str]:
+    """
+    Pass URLs through as they are read, registering them in the journal in chunks
+    With `resume`, URLs already downloaded (per the journal or `store`) are not yielded;
+    they are counted in counts['skipped'].
+    """
+    counts = counts if counts is not None else {}
+    counts.setdefault('skipped', 0)
+    pending = []
+    try:
+        for url in urls:
+            if resume and (journal.is_done(url) or (store is not None and store.has(url))):
+                counts['skipped'] += 1
+                continue
+            pending.append(url)
+            if len(pending) >= JOURNAL_CHUNK:
+                journal.add_pending(pending)
+                pending = []
+            yield url
+    finally:
+        journal.add_pending(pending)
+
+def output_store(args) -> Union[OutputStore, ArchiveStore]:
+    """Output store selected by --archive"""
+    if args.archive:
+        return ArchiveStore('output', args.archive_max_mb * 1024 * 1024)
+    return OutputStore('output')
+
+def add_client_arguments(parser: ArgumentParser, on_auth_expired: str = ON_EXPIRED_ABORT) -> None:
+    """Options of the downloader and scraper, shared by main.py and daemon.py"""
+    parser.add_argument('--cookies', '-c', help='Path to cookies file (JSON or Netscape cookies.txt)')
+    parser.add_argument('--http2', action='store_true',
+                       help='Use HTTP/2 for the shared connection pool (requires httpx[http2])')
+    parser.add_argument('--max-connections', type=int, default=DEFAULT_MAX_CONNECTIONS,
+                       help=f'Maximum pooled connections (default: {DEFAULT_MAX_CONNECTIONS})')
+    parser.add_argument('--concurrency', '-j', type=int, default=DEFAULT_CONCURRENCY,
+                       help=f'Number of tabs downloaded at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--cache-dir',
+                       help='Cache artist pages (and tab pages with --cache-ttl tab=SECONDS) on disk in this directory')
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_CACHE_MAX_MB,
+                       help=f'Cache size limit in MB, least recently used pages are evicted (default: {DEFAULT_CACHE_MAX_MB})')
+    parser.add_argument('--cache-ttl', action='append', metavar='CLASS=SECONDS',
+                       help='Override cache freshness per URL class, e.g. --cache-ttl artist=600; tab pages hold the '
+                            'download token and login state, so they are only cached with --cache-ttl tab=SECONDS')
+    parser.add_argument('--drain-kb', type=int, default=DEFAULT_DRAIN_LIMIT // 1024,
+                       help='Read up to this many KiB of a page past its data blob to keep the HTTP/1.1 connection, '
+                            f'0 always drops it (default: {DEFAULT_DRAIN_LIMIT // 1024})')
+    parser.add_argument('--rate-limit', type=float, default=DEFAULT_RATE,
+                       help=f'Starting requests per second per host; adapts to throttling (default: {DEFAULT_RATE:g})')
+    parser.add_argument('--max-rate', type=float, default=DEFAULT_MAX_RATE,
+                       help=f'Ceiling for the adaptive request rate per host (default: {DEFAULT_MAX_RATE:g})')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                       help=f'Retries for transient errors (timeouts, resets, 429/5xx) per request (default: {DEFAULT_RETRIES})')
+    parser.add_argument('--breaker-threshold', type=float, default=DEFAULT_BREAKER_THRESHOLD,
+                       help=f'Pause the batch when this share of recent requests fail, 0 disables (default: {DEFAULT_BREAKER_THRESHOLD:g})')
+    parser.add_argument('--on-auth-expired', choices=ON_EXPIRED_CHOICES, default=on_auth_expired,
+                       help='When the cookies stop working mid-batch: abort the queue, or pause it until the cookies '
+                            f'file is updated (default: {on_auth_expired})')
+    add_event_arguments(parser)
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG_FILE,
+                       help=f'Scrape/sync mode: save every listed tab\'s metadata to this catalog (default: {DEFAULT_CATALOG_FILE}); '
+                            f'pass a catalog as the input to download the tabs matching --artist/--song/--type/--version')
+    parser.add_argument('--best', type=int, default=0,
+                       help='Scrape/sync mode or catalog input: download only the best N versions of each song (default: 0, all)')
+    parser.add_argument('--best-by', choices=SELECT_POLICIES, default=DEFAULT_SELECT_POLICY,
+                       help=f'How --best ranks versions: highest rating, latest version or most votes (default: {DEFAULT_SELECT_POLICY})')
+    parser.add_argument('--archive', action='store_true',
+                       help='Write tabs into rolling tar archives in output/ (with a sidecar index per archive) instead of one file each')
+    parser.add_argument('--archive-max-mb', type=int, default=DEFAULT_ARCHIVE_MAX_MB,
+                       help=f'With --archive: start a new archive past this size in MB (default: {DEFAULT_ARCHIVE_MAX_MB})')
+
+def downloader_options(args, max_connections: int = 0) -> dict:
+    """
+    UGDownloader keyword arguments for the options of add_client_arguments()
+    Raises ValueError for a bad --cache-ttl or rate.
+    """
+    cache = None
+    if args.cache_dir:
+        cache = HTTPCache(args.cache_dir, args.cache_max_mb * 1024 * 1024, parse_ttls(args.cache_ttl))
+    return {
+        'http2': args.http2,
+        # Each in-flight tab may hold a connection to both tabs.* and www.* hosts
+        'max_connections': max(args.max_connections, 2 * args.concurrency, max_connections),
+        'drain_limit': args.drain_kb * 1024,
+        'cache': cache,
+        'rate_controller': RateController(args.rate_limit, args.max_rate),
+        'retry_policy': RetryPolicy(args.retries, breaker=CircuitBreaker(args.breaker_threshold)),
+        'on_auth_expired': args.on_auth_expired,
+        'store': output_store(args),
+        'events': bus_from_args(args),
+    }
+
+def best_versions_from_args(args) -> Optional[BestVersions]:
+    """The --best/--best-by selection, None to keep every version"""
+    return BestVersions(args.best, args.best_by) if args.best else None
+
+def scraper_for(downloader: UGDownloader, args, best_versions: Optional[BestVersions] = None) -> 'UGArtistScraper':
+    """A scraper on the downloader's connection pool and retry policy, recording into --catalog"""
+    return UGArtistScraper(args.cookies, session=downloader.session, retry_policy=downloader.retry_policy,
+                           catalog=TabCatalog(args.catalog), best_versions=best_versions,
+                           drain_limit=downloader.drain_limit)
+
+def export_metrics(downloader: UGDownloader, path: Optional[str], fmt: str) -> None:
+    """Write the downloader's metrics to `path` (nothing to do without one)"""
+    if path:
+        write_metrics(downloader.metrics_snapshot(), path, fmt)
+        print(f"📊 Metrics saved to {path} ({fmt})")
 
 def get_urls(input_file: str) -> List[str]:
     """
-    Get URLs from input file
+    Get the unique, canonical tab URLs of an input file ('-' for stdin)
     """
-    urls = []
-    with open(input_file, 'r') as f:
-        for line in f:
-            url = line.strip()
-            if url:
-                urls.append(url)
-    return urls
+    return list(TabInput(input_file))
 
 def generate_random_cookies_file():
     """
@@ -360,8 +970,7 @@ def test_cookies(cookies_file: str):
         return False
     
     try:
-        with open(cookies_file, 'r') as f:
-            cookies = json.load(f)
+        SharedCookieJar(cookies_file)
     except Exception as e:
         print(f"Error reading cookies file: {e}")
         return False
@@ -371,44 +980,45 @@ def test_cookies(cookies_file: str):
     
     downloader = UGDownloader(cookies_file)
     
-    with httpx.Client(cookies=cookies, timeout=30.0) as client:
-        headers = downloader.headers.copy()
-        try:
-            response = client.get(test_url, headers=headers)
+    headers = downloader.headers.copy()
+    try:
+        response = downloader.session.get(test_url, headers=headers)
             
-            if response.status_code == 200:
-                # Check if we're logged in by looking for user-specific content
-                if any(keyword in response.text.lower() for keyword in ["download", "logout", "profile", "subscription"]):
-                    print("✅ Cookies appear to be working!")
-                    print("Found user-specific content on the page")
-                    with open("headers.txt", "w") as f:
-                        f.write(str(response.headers))
-                    with open("text.txt", "w") as f:
-                        f.write(response.text)
-                    return True
-                else:
-                    print("⚠️  Page loads but you might not be logged in")
-                    print("Try updating your cookies")
-                    with open("headers.txt", "w") as f:
-                        f.write(str(response.headers))
-                    with open("text.txt", "w") as f:
-                        f.write(response.text)
-                    return False
+        if response.status_code == 200:
+            # Check if we're logged in by looking for user-specific content
+            if any(keyword in response.text.lower() for keyword in ["download", "logout", "profile", "subscription"]):
+                print("✅ Cookies appear to be working!")
+                print("Found user-specific content on the page")
+                with open("headers.txt", "w") as f:
+                    f.write(str(response.headers))
+                with open("text.txt", "w") as f:
+                    f.write(response.text)
+                return True
             else:
-                print(f"❌ HTTP Error: {response.status_code}")
+                print("⚠️  Page loads but you might not be logged in")
+                print("Try updating your cookies")
+                with open("headers.txt", "w") as f:
+                    f.write(str(response.headers))
+                with open("text.txt", "w") as f:
+                    f.write(response.text)
                 return False
-                
-        except Exception as e:
-            print(f"❌ Error testing cookies: {e}")
+        else:
+            print(f"❌ HTTP Error: {response.status_code}")
             return False
+                
+    except Exception as e:
+        print(f"❌ Error testing cookies: {e}")
+        return False
 
 def get_parser() -> ArgumentParser:
     """
     Get argument parser
     """
     parser = ArgumentParser(description='Download tabs from Ultimate Guitar')
-    parser.add_argument('input', nargs='?', help='Input file with tab URLs (one per line) OR artist URL for scraping')
-    parser.add_argument('--cookies', '-c', help='Path to cookies JSON file')
+    parser.add_argument('input', nargs='?',
+                       help="Input file with tab URLs or IDs (one per line, may be gzipped, '-' for stdin), a tab catalog, "
+                            "OR artist URL (or file of artist URLs) for scraping")
+    add_client_arguments(parser)
     parser.add_argument('--scrape-artist', action='store_true',
                        help='Scrape all Guitar Pro tabs from artist page URL (instead of downloading from file)')
     parser.add_argument('--output-scraped', default='in_scraped.txt',
@@ -420,6 +1030,34 @@ def get_parser() -> ArgumentParser:
     parser.add_argument('--help-cookies', action='store_true',
                        help='Show detailed instructions for getting cookies')
     parser.add_argument('--test-cookies', help='Test if cookies file works')
+    parser.add_argument('--import-cookies', metavar='FILE',
+                       help='Merge the cookies of FILE (e.g. a Netscape cookies.txt export) into the --cookies file')
+    parser.add_argument('--page-concurrency', type=int, default=1,
+                       help='Scrape mode: fetch artist listing pages this many at a time (default: 1)')
+    parser.add_argument('--artist-workers', type=int, default=DEFAULT_ARTIST_WORKERS,
+                       help=f'Scrape mode with a file of artist URLs: artists scraped at once (default: {DEFAULT_ARTIST_WORKERS})')
+    parser.add_argument('--pipeline', action='store_true',
+                       help='Scrape mode: download tabs while pages are still being scraped, without prompting')
+    parser.add_argument('--sync', action='store_true',
+                       help='Sync mode: download only tabs that are new or changed since the last sync of the artist(s)')
+    parser.add_argument('--library', default=DEFAULT_LIBRARY_FILE,
+                       help=f'Sync mode: library database remembering seen and downloaded tabs (default: {DEFAULT_LIBRARY_FILE})')
+    parser.add_argument('--sync-stop-after', type=int, default=DEFAULT_STOP_AFTER,
+                       help=f'Sync mode: stop paging after this many unchanged tabs in a row, 0 scrapes every page (default: {DEFAULT_STOP_AFTER})')
+    parser.add_argument('--metrics-out',
+                       help='Write per-phase timings, percentiles and counters to this file at the end of the run')
+    parser.add_argument('--metrics-format', choices=METRICS_FORMATS, default='json',
+                       help='Format for --metrics-out: json or prometheus text (default: json)')
+    add_query_arguments(parser)
+    parser.add_argument('--journal',
+                       help='Job journal file (default: <url file>.journal.sqlite, stdin.journal.sqlite for stdin)')
+    parser.add_argument('--resume', action='store_true',
+                       help='Skip URLs the journal already records as downloaded')
+    parser.add_argument('--retry-failed', action='store_true',
+                       help='Only download URLs the journal records as failed')
+    parser.add_argument('--refresh', action='store_true',
+                       help='Re-check tabs already in output/ with conditional requests (ETag/Last-Modified); '
+                            'unchanged files are neither transferred nor rewritten')
     return parser
 
 if __name__ == '__main__':
@@ -438,16 +1076,87 @@ if __name__ == '__main__':
         create_cookies_from_browser_export()
         exit(0)
     
+    if args.import_cookies:
+        if not args.cookies:
+            print("Error: --import-cookies needs --cookies, the file to merge into")
+            exit(1)
+        try:
+            imported = SharedCookieJar(args.cookies).import_file(args.import_cookies)
+        except (OSError, CookieFileError) as e:
+            print(f"❌ Could not import cookies: {e}")
+            exit(1)
+        print(f"✅ Imported {imported} cookies from {args.import_cookies} into {args.cookies}")
+        exit(0)
+    
     if args.test_cookies:
         if test_cookies(args.test_cookies):
             print("You can now try downloading with: python main.py input_file.txt --cookies", args.test_cookies)
         exit(0)
     
+    if args.refresh and (args.resume or args.retry_failed):
+        parser.error("--refresh re-checks every tab, it cannot be combined with --resume or --retry-failed")
+    
     if not args.input:
         print("Error: Input file or artist URL is required")
         parser.print_help()
         exit(1)
     
+    try:
+        options = downloader_options(args, args.artist_workers * args.page_concurrency)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit(1)
+    best_versions = best_versions_from_args(args)
+    
+    # Incremental sync of one artist or a file of artists
+    if args.sync:
+        if UGArtistScraper is None:
+            print("❌ Error: scraper.py module not found!")
+            exit(1)
+        
+        print("🔄 LIBRARY SYNC MODE")
+        print("=" * 50)
+        
+        library = ArtistLibrary(args.library)
+        downloader = UGDownloader(args.cookies, refresh=args.refresh, **options)
+        try:
+            scraper = scraper_for(downloader, args, best_versions)
+            artist_urls = read_artist_urls(args.input) if os.path.isfile(args.input) else [args.input]
+            
+            try:
+                # A tab listed under several artists is downloaded once
+                delta = list(dict.fromkeys(tab_url for artist_url in artist_urls
+                                           for tab_url in scraper.sync_artist_tabs(library, artist_url,
+                                                                                   args.sync_stop_after or None)))
+                
+                if not delta:
+                    print(f"\n✅ Library is up to date ({len(artist_urls)} artists checked)")
+                    success_count, failed_urls = 0, []
+                else:
+                    print(f"\n🚀 Downloading {len(delta)} new or changed tabs...")
+                    success_count, failed_urls = download_batch(downloader, delta, args.concurrency)
+                    failed = set(failed_urls)
+                    library.mark_downloaded(url for url in delta if url not in failed)
+            except KeyboardInterrupt:
+                print("\n\n⏹️  Interrupted. Unfinished tabs will be picked up by the next sync")
+                exit(130)
+            finally:
+                downloader.close()
+            
+            print(f"\n=== SYNC SUMMARY ===")
+            print(f"Successfully downloaded: {success_count}/{len(delta)}")
+            if failed_urls:
+                print(f"Failed downloads: {len(failed_urls)} (retried on the next sync)")
+            downloader.print_stats()
+            export_metrics(downloader, args.metrics_out, args.metrics_format)
+            library.print_summary()
+            scraper.catalog.print_summary()
+            if best_versions is not None:
+                best_versions.print_stats()
+        finally:
+            library.close()
+        exit(0)
+    
     # Check if we're in scraping mode
     if args.scrape_artist:
         if UGArtistScraper is None:
@@ -458,97 +1167,188 @@ if __name__ == '__main__':
         print("🎸 ARTIST SCRAPING MODE")
         print("=" * 50)
         
-        # Initialize scraper
-        scraper = UGArtistScraper(args.cookies)
-        
-        # Scrape tabs from artist page
-        tab_urls = scraper.scrape_artist_tabs(args.input, args.output_scraped)
-        
-        if not tab_urls:
-            print("😞 No Guitar Pro tabs found for this artist!")
-            exit(1)
-        
-        print(f"\n🎉 Successfully scraped {len(tab_urls)} Guitar Pro tabs!")
-        print(f"📁 URLs saved to: {args.output_scraped}")
-        
-        # Ask if user wants to download immediately
-        print(f"\n💡 Would you like to download all {len(tab_urls)} tabs now? (y/n): ", end="")
-        try:
-            user_input = input().strip().lower()
-            if user_input in ['y', 'yes', 'да', 'д']:
-                print("\n🚀 Starting download process...")
+        # Initialize downloader and scraper on one shared connection pool
+        with JobJournal(args.journal or f"{args.output_scraped}.journal.sqlite") as journal:
+            downloader = UGDownloader(args.cookies, journal=journal, refresh=args.refresh, **options)
+            try:
+                scraper = scraper_for(downloader, args, best_versions)
                 
-                # Initialize downloader and download all tabs
-                downloader = UGDownloader(args.cookies)
-                success_count = 0
-                failed_urls = []
+                # A file instead of a URL holds many artists, scraped into one merged list
+                artist_urls = read_artist_urls(args.input) if os.path.isfile(args.input) else None
+                if artist_urls is not None:
+                    print(f"🎤 {len(artist_urls)} artists from {args.input}, {args.artist_workers} at a time")
                 
-                for i, url in enumerate(sorted(tab_urls), 1):
-                    print(f"\n[{i}/{len(tab_urls)}] Processing: {url}")
-                    
-                    if downloader.download_tab(url):
-                        success_count += 1
+                if args.pipeline:
+                    # Downloads start as soon as the first listing page is parsed
+                    print(f"🚀 Pipeline mode: downloading while scraping, URLs are written to {args.output_scraped}")
+                    breakdown = {}
+                    if artist_urls is not None:
+                        tab_urls = scraper.iter_artists_tabs(artist_urls, args.artist_workers, args.page_concurrency,
+                                                             breakdown)
                     else:
-                        failed_urls.append(url)
+                        tab_urls = scraper.iter_artist_tabs(args.input, args.page_concurrency)
+                    try:
+                        success_count, failed_urls = download_pipeline(
+                            downloader, record_urls(tab_urls, args.output_scraped, journal, args.resume, downloader.store), args.concurrency)
+                    except KeyboardInterrupt:
+                        print(f"\n\n⏹️  Interrupted. URLs found so far are in {args.output_scraped}, continue with:")
+                        print(f"   python main.py {args.output_scraped} --cookies {args.cookies or 'your_cookies.json'} --resume")
+                        journal.print_summary()
+                        exit(130)
+                    
+                    if breakdown:
+                        save_artist_breakdown(breakdown, artist_breakdown_file(args.output_scraped))
+                        print(f"📊 Per-artist breakdown saved to {artist_breakdown_file(args.output_scraped)}")
+                    if not success_count and not failed_urls:
+                        print("😞 No Guitar Pro tabs found for this artist!")
+                        exit(1)
+                    
+                    print(f"\n=== DOWNLOAD SUMMARY ===")
+                    print(f"Successfully downloaded: {success_count}/{success_count + len(failed_urls)}")
+                    if failed_urls:
+                        print(f"Failed downloads: {len(failed_urls)}")
+                        print(f"💡 Retry the failures with: python main.py {args.output_scraped} "
+                              f"--cookies {args.cookies or 'your_cookies.json'} --retry-failed")
+                    downloader.print_stats()
+                    export_metrics(downloader, args.metrics_out, args.metrics_format)
+                    journal.print_summary()
+                    exit(0)
                 
-                # Summary
-                print(f"\n=== DOWNLOAD SUMMARY ===")
-                print(f"Successfully downloaded: {success_count}/{len(tab_urls)}")
+                # Scrape tabs from artist page(s)
+                if artist_urls is not None:
+                    tab_urls, _ = scraper.scrape_artists(artist_urls, args.output_scraped, args.artist_workers,
+                                                         args.page_concurrency)
+                else:
+                    tab_urls = scraper.scrape_artist_tabs(args.input, args.output_scraped, args.page_concurrency)
                 
-                if failed_urls:
-                    print(f"Failed downloads: {len(failed_urls)}")
-                    print("💡 You can retry failed downloads using the saved file:")
-                    print(f"   python main.py {args.output_scraped} --cookies {args.cookies or 'your_cookies.json'}")
-            else:
-                print(f"\n📋 URLs saved to {args.output_scraped}")
-                print(f"💡 To download later, run:")
-                print(f"   python main.py {args.output_scraped} --cookies {args.cookies or 'your_cookies.json'}")
-        except KeyboardInterrupt:
-            print(f"\n\n📋 URLs saved to {args.output_scraped}")
-            print(f"💡 To download later, run:")
-            print(f"   python main.py {args.output_scraped} --cookies {args.cookies or 'your_cookies.json'}")
-        
-        exit(0)
+                if not tab_urls:
+                    print("😞 No Guitar Pro tabs found for this artist!")
+                    exit(1)
+                
+                print(f"\n🎉 Successfully scraped {len(tab_urls)} Guitar Pro tabs!")
+                print(f"📁 URLs saved to: {args.output_scraped}")
+                scraper.catalog.print_summary()
+                if best_versions is not None:
+                    best_versions.print_stats()
+                
+                # Ask if user wants to download immediately
+                print(f"\n💡 Would you like to download all {len(tab_urls)} tabs now? (y/n): ", end="")
+                try:
+                    user_input = input().strip().lower()
+                    if user_input in ['y', 'yes', 'да', 'д']:
+                        print("\n🚀 Starting download process...")
+                        
+                        # Download all tabs
+                        todo, skipped = plan_batch(journal, sorted(tab_urls), args.resume, args.retry_failed, downloader.store)
+                        if skipped:
+                            print(f"⏭️  Skipping {skipped} tabs already handled according to {journal.path}")
+                        success_count, failed_urls = download_batch(downloader, todo, args.concurrency)
+                        
+                        # Summary
+                        print(f"\n=== DOWNLOAD SUMMARY ===")
+                        print(f"Successfully downloaded: {success_count}/{len(tab_urls)}")
+                        
+                        if failed_urls:
+                            print(f"Failed downloads: {len(failed_urls)}")
+                            print("💡 You can retry failed downloads using the saved file:")
+                            print(f"   python main.py {args.output_scraped} --cookies {args.cookies or 'your_cookies.json'} --retry-failed")
+                        downloader.print_stats()
+                        export_metrics(downloader, args.metrics_out, args.metrics_format)
+                        journal.print_summary()
+                    else:
+                        print(f"\n📋 URLs saved to {args.output_scraped}")
+                        print(f"💡 To download later, run:")
+                        print(f"   python main.py {args.output_scraped} --cookies {args.cookies or 'your_cookies.json'}")
+                except KeyboardInterrupt:
+                    print(f"\n\n📋 URLs saved to {args.output_scraped}")
+                    print(f"💡 To continue later, run:")
+                    print(f"   python main.py {args.output_scraped} --cookies {args.cookies or 'your_cookies.json'} --resume")
+                
+                exit(0)
+            finally:
+                downloader.close()
     
     # Normal download mode
     print("📥 TAB DOWNLOAD MODE")
     print("=" * 50)
     
     # Initialize downloader
-    downloader = UGDownloader(args.cookies)
-    
-    # Get URLs from input file
-    urls = get_urls(args.input)
-    
-    if not urls:
-        print("No URLs found in input file")
-        exit(1)
-    
-    print(f"Found {len(urls)} URLs to download")
-    
-    # Download each tab
-    success_count = 0
-    failed_urls = []
-    
-    for i, url in enumerate(urls, 1):
-        print(f"\n[{i}/{len(urls)}] Processing: {url}")
+    input_name = 'stdin' if args.input == STDIN else args.input
+    with JobJournal(args.journal or f"{input_name}.journal.sqlite") as journal:
+        downloader = UGDownloader(args.cookies, journal=journal, refresh=args.refresh, **options)
         
-        if downloader.download_tab(url):
-            success_count += 1
+        # URLs come from a catalog query, the journal (--retry-failed) or are streamed from the input
+        reader, counts = None, {'skipped': 0}
+        if is_catalog(args.input):
+            query = query_from_args(args)
+            # Only Guitar Pro tabs have a file to download
+            query['type_name'] = query['type_name'] or 'Guitar Pro'
+            catalog = TabCatalog(args.input)
+            rows = catalog.query(**query)
+            catalog.close()
+            if best_versions is not None:
+                rows = best_versions.select(rows)
+            urls = [row['tab_url'] for row in rows]
+            print(f"🗂️  {len(urls)} tabs match {', '.join(f'{k}={v}' for k, v in query.items() if v is not None)} in {args.input}")
+            if best_versions is not None:
+                best_versions.print_stats()
+            if not urls:
+                print("No URLs found in input file")
+                exit(1)
+            print(f"Found {len(urls)} URLs to download")
+            todo, counts['skipped'] = plan_batch(journal, urls, args.resume, args.retry_failed, downloader.store)
+        elif args.retry_failed:
+            todo = journal.urls_in_state(FAILED)
+            print(f"Found {len(todo)} failed URLs in {journal.path}")
         else:
-            failed_urls.append(url)
-    
-    # Summary
-    print(f"\n=== DOWNLOAD SUMMARY ===")
-    print(f"Successfully downloaded: {success_count}/{len(urls)}")
-    
-    if failed_urls:
-        print(f"Failed URLs:")
-        for url in failed_urls:
-            print(f"  - {url}")
+            # Downloads start with the first line; the input is never held in memory
+            reader = TabInput(args.input)
+            todo = stream_batch(journal, reader, args.resume, downloader.store, counts)
+            print(f"Streaming URLs from {reader.name}")
         
-        print("\nIf downloads are failing, you may need to:")
-        print("1. Create a cookies file with your login session")
-        print("2. Use --create-cookies-template to create a template")
-        print("3. Copy cookies from your browser's developer tools")
+        # Download tabs, up to --concurrency at a time
+        try:
+            if reader is not None:
+                success_count, failed_urls = download_pipeline(downloader, todo, args.concurrency)
+            else:
+                success_count, failed_urls = download_batch(downloader, todo, args.concurrency)
+        except KeyboardInterrupt:
+            print("\n\n⏹️  Interrupted. Progress is saved in the journal, continue with:")
+            print(f"   python main.py {args.input} --cookies {args.cookies or 'your_cookies.json'} --resume")
+            journal.print_summary()
+            exit(130)
+        finally:
+            # Also finishes the current archive with --archive
+            downloader.close()
+        
+        if reader is not None:
+            reader.print_stats()
+            if not reader.unique:
+                print("No URLs found in input file")
+                exit(1)
+        if counts['skipped']:
+            print(f"⏭️  Skipped {counts['skipped']} URLs already handled according to {journal.path}")
+        
+        # Summary
+        print(f"\n=== DOWNLOAD SUMMARY ===")
+        print(f"Successfully downloaded: {success_count}/{success_count + len(failed_urls)}")
+        downloader.print_stats()
+        export_metrics(downloader, args.metrics_out, args.metrics_format)
+        journal.print_summary()
+        
+        if downloader.auth.expired:
+            print("\n🔒 Stopped early because the session is not logged in. After refreshing your cookies, continue with:")
+            print(f"   python main.py {args.input} --cookies {args.cookies or 'your_cookies.json'} --resume")
+            exit(1)
+        
+        if failed_urls:
+            print(f"Failed URLs:")
+            for url in failed_urls:
+                print(f"  - {url}")
+            
+            print("\nIf downloads are failing, you may need to:")
+            print("1. Create a cookies file with your login session")
+            print("2. Use --create-cookies-template to create a template")
+            print("3. Copy cookies from your browser's developer tools")
+            print(f"\n💡 Retry just the failures with: python main.py {args.input} --cookies {args.cookies or 'your_cookies.json'} --retry-failed")
         
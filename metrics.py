@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Per-phase timing and throughput metrics for Ultimate Guitar runs
+Connect and time-to-first-byte come from the httpcore trace extension; body
+transfer, extraction and disk writes are timed by the code doing the work.
+Summaries report p50/p95/p99 per phase and can be exported as JSON or
+Prometheus text so a slow batch can be told apart as network-, parse- or disk-bound.
+Percentiles come from a fixed-size uniform sample per phase, so memory and the
+cost of a snapshot stay flat however long the process (e.g. daemon.py) runs.
+"""
+
+import json
+import math
+import random
+import threading
+import time
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+
+PHASES = ('connect', 'ttfb', 'body', 'extract', 'write')
+QUANTILES = (0.5, 0.95, 0.99)
+METRICS_FORMATS = ('json', 'prometheus')
+PROMETHEUS_PREFIX = 'ugdl'
+
+# Timings kept per phase for percentiles; counts and sums stay exact
+RESERVOIR_SIZE = 4096
+
+# Counters whose rate is reported as <name>_per_second
+RATE_COUNTERS = ('tabs_downloaded', 'listing_pages')
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list (0.0 when empty)"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+class Stopwatch:
+    def __init__(self):
+        """Accumulates the time spent inside `with stopwatch:` blocks (or in wrapped iterators)"""
+        self.elapsed = 0.0
+        self._started = 0.0
+
+    def __enter__(self) -> 'Stopwatch':
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.elapsed += time.perf_counter() - self._started
+
+    def wrap(self, iterable: Iterable) -> Iterator:
+        """Yield from `iterable`, timing only how long each item took to arrive"""
+        iterator = iter(iterable)
+        while True:
+            with self:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    async def awrap(self, iterable: AsyncIterable) -> AsyncIterator:
+        iterator = iterable.__aiter__()
+        while True:
+            with self:
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield item
+
+
+class _Reservoir:
+    """Uniform random sample of at most `size` values (Vitter's algorithm R), with the exact count and sum"""
+
+    def __init__(self, size: int = RESERVOIR_SIZE):
+        self.size = size
+        self.count = 0
+        self.total = 0.0
+        self.samples: List[float] = []
+        self._random = random.Random()
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            index = self._random.randrange(self.count)
+            if index < self.size:
+                self.samples[index] = value
+
+
+class _RequestTimer:
+    """Turns one request's httpcore trace events into connect / ttfb / body timings"""
+
+    def __init__(self, metrics: 'Metrics'):
+        self.metrics = metrics
+        self._connect_started = None
+        self._headers_sent = None
+        self._body_started = None
+
+    def event(self, event_name: str) -> None:
+        now = time.perf_counter()
+        if event_name in ('connection.connect_tcp.started', 'connection.connect_unix_socket.started'):
+            self._connect_started = now
+        elif event_name.endswith('.send_request_headers.started'):
+            # TCP connect and TLS handshake both count as connecting
+            if self._connect_started is not None:
+                self.metrics.observe('connect', now - self._connect_started)
+                self._connect_started = None
+            self._headers_sent = now
+        elif event_name.endswith('.receive_response_headers.complete') and self._headers_sent is not None:
+            self.metrics.observe('ttfb', now - self._headers_sent)
+        elif event_name.endswith('.receive_response_body.started'):
+            self._body_started = now
+        elif (event_name.endswith('.receive_response_body.complete')
+              or event_name.endswith('.receive_response_body.failed')) and self._body_started is not None:
+            # Includes whatever the reader did between chunks; extraction and writes are reported separately
+            self.metrics.observe('body', now - self._body_started)
+            self._body_started = None
+
+
+class Metrics:
+    def __init__(self, reservoir_size: int = RESERVOIR_SIZE):
+        """
+        Thread-safe store of phase timings and counters for one run
+        reservoir_size: timings kept per phase for the percentiles
+        """
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._timings: Dict[str, _Reservoir] = {phase: _Reservoir(reservoir_size) for phase in PHASES}
+        self._counters: Dict[str, int] = {}
+        self._first_at: Dict[str, float] = {}
+        self._last_at: Dict[str, float] = {}
+
+    def request_timer(self) -> _RequestTimer:
+        """Per-request state for the trace extension (see session.UGSession)"""
+        return _RequestTimer(self)
+
+    def observe(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self._timings[phase].add(seconds)
+
+    def begin(self, counter: str) -> None:
+        """Mark when work for `counter` started, so its rate ignores idle time before it"""
+        with self._lock:
+            self._first_at.setdefault(counter, time.monotonic())
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+            self._first_at.setdefault(counter, now)
+            self._last_at[counter] = now
+
+    def snapshot(self, extra_counters: Optional[Dict[str, int]] = None) -> dict:
+        """
+        Everything recorded so far as a plain dict
+        extra_counters: totals kept elsewhere (retries, cache hits, ...) to report alongside
+        """
+        with self._lock:
+            timings = {phase: (reservoir.count, reservoir.total, list(reservoir.samples))
+                       for phase, reservoir in self._timings.items()}
+            counters = dict(self._counters)
+            spans = {name: self._last_at[name] - self._first_at[name] for name in self._last_at}
+        counters.update(extra_counters or {})
+        phases = {}
+        for phase, (count, total, values) in timings.items():
+            values.sort()
+            phases[phase] = {'count': count, 'sum': total}
+            for q in QUANTILES:
+                phases[phase][f'p{q * 100:g}'] = percentile(values, q)
+        rates = {f'{name}_per_second': counters[name] / spans[name] if spans.get(name) else 0.0
+                 for name in RATE_COUNTERS if name in counters}
+        return {
+            'elapsed_seconds': time.monotonic() - self.started,
+            'phases': phases,
+            'counters': counters,
+            'rates': rates,
+        }
+
+
+def print_summary(snapshot: dict) -> None:
+    """End-of-run summary of a Metrics.snapshot()"""
+    timed = [(phase, stats) for phase, stats in snapshot['phases'].items() if stats['count']]
+    if timed:
+        print("⏱️  Timing in ms (p50/p95/p99):")
+        for phase, stats in timed:
+            print(f"   {phase:<8} {stats['p50'] * 1000:7.1f} {stats['p95'] * 1000:7.1f} {stats['p99'] * 1000:7.1f}"
+                  f"  ({stats['count']} samples, {stats['sum']:.1f}s total)")
+    counters = snapshot['counters']
+    parts = [f"{rate:.2f} {name[:-len('_per_second')].replace('_', ' ')}/s"
+             for name, rate in snapshot['rates'].items() if rate]
+    parts.append(f"{counters.get('bytes_received', 0) / 1e6:.1f} MB received")
+    if counters.get('bytes_skipped'):
+        parts.append(f"{counters['bytes_skipped'] / 1e6:.1f} MB not read (early exit)")
+    if counters.get('bytes_written'):
+        parts.append(f"{counters['bytes_written'] / 1e6:.1f} MB written")
+    print(f"📈 Throughput: {', '.join(parts)} in {snapshot['elapsed_seconds']:.1f}s")
+
+
+def to_prometheus(snapshot: dict) -> str:
+    """Prometheus text exposition format (phases as summaries, counters as counters)"""
+    name = f'{PROMETHEUS_PREFIX}_phase_seconds'
+    lines = [f'# HELP {name} Time spent per request phase', f'# TYPE {name} summary']
+    for phase, stats in snapshot['phases'].items():
+        for q in QUANTILES:
+            lines.append(f'{name}{{phase="{phase}",quantile="{q:g}"}} {stats[f"p{q * 100:g}"]:.6f}')
+        lines.append(f'{name}_sum{{phase="{phase}"}} {stats["sum"]:.6f}')
+        lines.append(f'{name}_count{{phase="{phase}"}} {stats["count"]}')
+    for counter, value in sorted(snapshot['counters'].items()):
+        lines.append(f'# TYPE {PROMETHEUS_PREFIX}_{counter}_total counter')
+        lines.append(f'{PROMETHEUS_PREFIX}_{counter}_total {value}')
+    for rate, value in sorted(snapshot['rates'].items()):
+        lines.append(f'# TYPE {PROMETHEUS_PREFIX}_{rate} gauge')
+        lines.append(f'{PROMETHEUS_PREFIX}_{rate} {value:.6f}')
+    lines.append(f'# TYPE {PROMETHEUS_PREFIX}_elapsed_seconds gauge')
+    lines.append(f'{PROMETHEUS_PREFIX}_elapsed_seconds {snapshot["elapsed_seconds"]:.3f}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(snapshot: dict, path: str, fmt: str = 'json') -> None:
+    """Export a snapshot to `path` as 'json' or 'prometheus' text"""
+    if fmt not in METRICS_FORMATS:
+        raise ValueError(f"Unknown metrics format '{fmt}' (expected one of {METRICS_FORMATS})")
+    with open(path, 'w', encoding='utf-8') as f:
+        if fmt == 'json':
+            json.dump(snapshot, f, indent=2)
+            f.write('\n')
+        else:
+            f.write(to_prometheus(snapshot))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Adaptive request pacing for Ultimate Guitar requests
+One token bucket per host; the rate grows while responses are healthy and is
+halved on 429/503 (AIMD), with Retry-After honoured. Plugged in as an httpx
+transport so the scraper and downloader share the same budget.
+"""
+
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import httpx
+
+
+DEFAULT_RATE = 4.0
+DEFAULT_MAX_RATE = 16.0
+DEFAULT_MIN_RATE = 0.25
+DEFAULT_BURST = 2.0
+# Until a host first throttles us its rate grows by this factor per healthy response
+# (slow start), afterwards by RATE_INCREASE requests/second; throttling multiplies it by RATE_DECREASE
+SLOW_START_FACTOR = 1.05
+RATE_INCREASE = 0.1
+RATE_DECREASE = 0.5
+# Responses to requests already in flight when we backed off must not halve the rate again
+BACKOFF_COOLDOWN = 1.0
+MAX_RETRY_AFTER = 300.0
+
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), capped at MAX_RETRY_AFTER"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        seconds = float(value)
+    else:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class _HostBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        # Monotonic time the token count refers to; in the future while blocked by Retry-After
+        self.updated = time.monotonic()
+        self.last_backoff = float('-inf')
+        self.slow_start = True
+        self.backoffs = 0
+        self.requests = 0
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """Take a token and return how long the caller must wait before using it"""
+        self._refill(now)
+        self.tokens -= 1
+        self.requests += 1
+        ready = self.updated + max(0.0, -self.tokens) / self.rate
+        return max(0.0, ready - now)
+
+    def block(self, now: float, until: float) -> None:
+        """Hand out no tokens before `until`; waiting callers keep their spacing after it"""
+        self._refill(now)
+        if until > self.updated:
+            self.tokens = min(self.tokens, 0.0)
+            self.updated = until
+
+
+class RateController:
+    def __init__(self, rate: float = DEFAULT_RATE, max_rate: float = DEFAULT_MAX_RATE,
+                 min_rate: float = DEFAULT_MIN_RATE, burst: float = DEFAULT_BURST):
+        """
+        Shared, thread-safe pacing for every host we talk to
+        rate: starting requests/second per host
+        max_rate, min_rate: bounds the adaptive rate stays within
+        burst: requests a host may receive back to back after being idle
+        """
+        if rate <= 0 or min_rate <= 0:
+            raise ValueError("rates must be positive")
+        self.rate = rate
+        self.max_rate = max(max_rate, rate)
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, _HostBucket] = {}
+
+    def _bucket(self, host: str) -> _HostBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = _HostBucket(self.rate, self.burst)
+        return bucket
+
+    def reserve(self, host: str) -> float:
+        with self._lock:
+            return self._bucket(host).reserve(time.monotonic())
+
+    def acquire(self, host: str) -> None:
+        """Block until a request to `host` may be sent"""
+        delay = self.reserve(host)
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self, host: str) -> None:
+        delay = self.reserve(host)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def observe(self, host: str, status_code: int, headers: httpx.Headers) -> None:
+        """Adapt the host's rate to a response: back off on throttling, probe upward otherwise"""
+        message = None
+        with self._lock:
+            bucket = self._bucket(host)
+            now = time.monotonic()
+            if status_code in THROTTLE_STATUSES:
+                retry_after = parse_retry_after(headers.get('retry-after'))
+                if retry_after:
+                    bucket.block(now, now + retry_after)
+                if now - bucket.last_backoff < BACKOFF_COOLDOWN:
+                    return
+                bucket.rate = max(self.min_rate, bucket.rate * RATE_DECREASE)
+                bucket.slow_start = False
+                bucket.last_backoff = now
+                bucket.backoffs += 1
+                message = f"🚦 {host} throttled (HTTP {status_code}), slowing to {bucket.rate:.2g} req/s"
+                if retry_after:
+                    message += f", pausing {retry_after:.0f}s"
+            elif status_code < 500:
+                if bucket.slow_start:
+                    bucket.rate = min(self.max_rate, bucket.rate * SLOW_START_FACTOR)
+                else:
+                    bucket.rate = min(self.max_rate, bucket.rate + RATE_INCREASE)
+        if message:
+            print(message)
+
+    def stats(self) -> dict:
+        """{host: {'rate', 'requests', 'backoffs'}}"""
+        with self._lock:
+            return {host: {'rate': bucket.rate, 'requests': bucket.requests, 'backoffs': bucket.backoffs}
+                    for host, bucket in self._buckets.items()}
+
+    def print_stats(self) -> None:
+        for host, stats in self.stats().items():
+            print(f"🚦 Rate: {host} at {stats['rate']:.2g} req/s after {stats['requests']} requests "
+                  f"({stats['backoffs']} backoffs)")
+
+
+class RateControlledTransport(httpx.BaseTransport):
+    def __init__(self, transport: httpx.BaseTransport, controller: RateController):
+        """Wraps another transport and paces every request that reaches the network"""
+        self.transport = transport
+        self.controller = controller
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        self.controller.acquire(host)
+        response = self.transport.handle_request(request)
+        self.controller.observe(host, response.status_code, response.headers)
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncRateControlledTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport, controller: RateController):
+        """Async counterpart of RateControlledTransport"""
+        self.transport = transport
+        self.controller = controller
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        await self.controller.acquire_async(host)
+        response = await self.transport.handle_async_request(request)
+        self.controller.observe(host, response.status_code, response.headers)
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Retry policy for Ultimate Guitar requests
+Transient errors (timeouts, dropped connections, 429/5xx) are retried with capped
+exponential backoff and full jitter; permanent ones (404, missing binary_id, ...)
+fail at once. A circuit breaker pauses the whole batch when failures spike.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import httpx
+
+
+DEFAULT_RETRIES = 3
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 30.0
+
+# Circuit breaker: pause everything for BREAKER_COOLDOWN seconds once this share
+# of the last BREAKER_WINDOW attempts failed with a transient error
+DEFAULT_BREAKER_THRESHOLD = 0.5
+BREAKER_WINDOW = 20
+BREAKER_COOLDOWN = 30.0
+
+_TRANSIENT_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether retrying `error` can help
+    Errors may decide for themselves with a `transient` attribute (see TabDownloadError).
+    """
+    transient = getattr(error, 'transient', None)
+    if transient is not None:
+        return transient
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, _TRANSIENT_ERRORS)
+
+
+def _describe(error: BaseException) -> str:
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code}"
+    return str(error).splitlines()[0] if str(error) else type(error).__name__
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: float = DEFAULT_BREAKER_THRESHOLD, window: int = BREAKER_WINDOW,
+                 cooldown: float = BREAKER_COOLDOWN):
+        """
+        Trips when `threshold` of the last `window` attempts failed (0 disables it)
+        While open, every caller of wait()/wait_async() is held for `cooldown` seconds.
+        """
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.trips = 0
+        self._outcomes = deque(maxlen=window)
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool) -> None:
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            self._outcomes.append(ok)
+            if len(self._outcomes) < self.window:
+                return
+            failure_rate = self._outcomes.count(False) / len(self._outcomes)
+            if failure_rate < self.threshold or time.monotonic() < self._open_until:
+                return
+            self._open_until = time.monotonic() + self.cooldown
+            self._outcomes.clear()
+            self.trips += 1
+        print(f"⛔ {failure_rate:.0%} of the last {self.window} requests failed, "
+              f"pausing the batch for {self.cooldown:.0f}s")
+
+    def remaining(self) -> float:
+        """Seconds until the breaker closes again (0 when closed)"""
+        with self._lock:
+            return max(0.0, self._open_until - time.monotonic())
+
+    def wait(self) -> None:
+        delay = self.remaining()
+        if delay:
+            time.sleep(delay)
+
+    async def wait_async(self) -> None:
+        delay = self.remaining()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class RetryPolicy:
+    def __init__(self, retries: int = DEFAULT_RETRIES, base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY, breaker: Optional[CircuitBreaker] = None):
+        """
+        retries: extra attempts after the first for transient errors
+        base_delay, max_delay: backoff before retry n is uniform in [0, min(max_delay, base_delay * 2**n)]
+        breaker: CircuitBreaker shared by everything using this policy (a default one otherwise)
+        """
+        self.retries = max(0, retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.retried = 0
+        self._lock = threading.Lock()
+
+    def backoff(self, retry: int) -> float:
+        """Delay before the given retry (0-based), with full jitter"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def _should_retry(self, error: Exception, retry: int) -> bool:
+        transient = is_transient(error)
+        if transient:
+            self.breaker.record(False)
+        if not transient or retry >= self.retries:
+            return False
+        with self._lock:
+            self.retried += 1
+        return True
+
+    def _report_retry(self, error: Exception, retry: int, delay: float) -> None:
+        print(f"🔁 {_describe(error)}, retrying in {delay:.1f}s (retry {retry + 1}/{self.retries})")
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Call fn, retrying transient errors; the last error is re-raised"""
+        retry = 0
+        while True:
+            self.breaker.wait()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not self._should_retry(e, retry):
+                    raise
+                delay = self.backoff(retry)
+                self._report_retry(e, retry, delay)
+                time.sleep(delay)
+                retry += 1
+            else:
+                self.breaker.record(True)
+                return result
+
+    async def call_async(self, fn: Callable, *args, **kwargs):
+        """Awaitable version of call() for coroutine functions"""
+        retry = 0
+        while True:
+            await self.breaker.wait_async()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                if not self._should_retry(e, retry):
+                    raise
+                delay = self.backoff(retry)
+                self._report_retry(e, retry, delay)
+                await asyncio.sleep(delay)
+                retry += 1
+            else:
+                self.breaker.record(True)
+                return result
+
+    def print_stats(self) -> None:
+        print(f"🔁 Retries: {self.retried} (circuit breaker tripped {self.breaker.trips} times)")
@@ -5,30 +5,67 @@ Extracts Guitar Pro tab URLs from artist pages with pagination support
 """
 
 import httpx
-import re
 import json
-import html
-import time
-from typing import Set, Optional
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Set, Optional, Tuple
 from argparse import ArgumentParser
 
+from session import UGSession, DEFAULT_MAX_CONNECTIONS
+from cookiejar import SharedCookieJar, CookieFileError
+from cache import HTTPCache, parse_ttls, DEFAULT_CACHE_MAX_MB
+from extract import extract_page_data, drain_limit_for, unread_bytes, PAGE_CHUNK_SIZE, DEFAULT_DRAIN_LIMIT
+from ratelimit import RateController, DEFAULT_RATE, DEFAULT_MAX_RATE
+from retry import RetryPolicy, CircuitBreaker, DEFAULT_RETRIES, DEFAULT_BREAKER_THRESHOLD
+from library import ArtistLibrary, tab_revision, DEFAULT_STOP_AFTER, SEEN_CHUNK
+from catalog import TabCatalog, DEFAULT_CATALOG_FILE
+from selection import BestVersions, SELECT_POLICIES, DEFAULT_SELECT_POLICY
+from metrics import Stopwatch, print_summary, write_metrics, METRICS_FORMATS
+from urlinput import canonical_url
+
+# Artists scraped at once in multi-artist mode
+DEFAULT_ARTIST_WORKERS = 4
+# Listing order that puts new and updated tabs on the first pages
+NEWEST_FIRST = 'date_desc'
+
 
 class UGArtistScraper:
-    def __init__(self, cookies_file: Optional[str] = None):
+    def __init__(self, cookies_file: Optional[str] = None, session: Optional[UGSession] = None,
+                 http2: bool = False, max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 cache: Optional[HTTPCache] = None, rate_controller: Optional[RateController] = None,
+                 retry_policy: Optional[RetryPolicy] = None, catalog: Optional[TabCatalog] = None,
+                 best_versions: Optional[BestVersions] = None, drain_limit: int = DEFAULT_DRAIN_LIMIT):
         """
         Initialize UG Artist Scraper
-        cookies_file: path to cookies file (JSON format)
+        cookies_file: path to cookies file (JSON or Netscape cookies.txt)
+        session: shared UGSession (e.g. UGDownloader.session); a new one is created and owned otherwise
+        http2, max_connections, cache, rate_controller: options for the owned session
+        retry_policy: how transient listing page errors are retried (default: RetryPolicy())
+        catalog: optional TabCatalog that every listing entry's metadata is saved to
+        best_versions: only yield the best version(s) of each song (see selection.BestVersions)
+        drain_limit: most bytes of a page read past its blob to keep an HTTP/1.1 connection (see extract.py)
         """
-        self.cookies = {}
-        if cookies_file:
-            try:
-                with open(cookies_file, 'r') as f:
-                    self.cookies = json.load(f)
-                print(f"[OK] Loaded cookies from {cookies_file}")
-            except FileNotFoundError:
+        # A shared session brings its cookie jar along
+        self.cookie_jar = session.cookie_jar if session is not None else None
+        if self.cookie_jar is None and cookies_file:
+            if not os.path.exists(cookies_file):
                 print(f"[WARNING] Cookies file {cookies_file} not found")
-            except json.JSONDecodeError:
-                print(f"[ERROR] Invalid JSON in cookies file {cookies_file}")
+            try:
+                self.cookie_jar = SharedCookieJar(cookies_file)
+            except CookieFileError as e:
+                print(f"[ERROR] Invalid cookies file {cookies_file}: {e}")
+        if self.cookie_jar is not None:
+            print(f"[OK] Loaded cookies from {self.cookie_jar.path}")
+        self.cookies = self.cookie_jar.values() if self.cookie_jar is not None else {}
+
+        self._owns_session = session is None
+        self.session = session or UGSession(http2=http2, max_connections=max_connections, cache=cache,
+                                            rate_controller=rate_controller, cookie_jar=self.cookie_jar)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.catalog = catalog
+        self.best_versions = best_versions
+        self.drain_limit = drain_limit
         
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36 Edg/138.0.0.0',
@@ -48,18 +85,181 @@ class UGArtistScraper:
             'sec-ch-ua-platform': '"Windows"'
         }
 
-    def scrape_artist_tabs(self, artist_url: str, output_file: str = "in_scraped.txt") -> Set[str]:
+    def metrics_snapshot(self) -> dict:
+        """Phase timings and counters of the session, plus retry and cache totals"""
+        stats = self.session.stats()
+        counters = {
+            'requests': stats['requests'],
+            'connections_opened': stats['connections_opened'],
+            'retries': self.retry_policy.retried,
+            'circuit_breaker_trips': self.retry_policy.breaker.trips,
+        }
+        if self.session.cache is not None:
+            cache_stats = self.session.cache.stats()
+            counters.update({f'cache_{key}': cache_stats[key] for key in ('hits', 'revalidated', 'misses')})
+        return self.session.metrics.snapshot(counters)
+
+    def close(self):
+        """Close the HTTP session if this scraper owns it"""
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _fetch_page_data(self, url: str, headers: dict, **kwargs) -> Optional[dict]:
+        """
+        GET a page and parse its data-content JSON, reading only as far as needed
+        Returns None if there is no blob; raises httpx.HTTPStatusError and json.JSONDecodeError
+        """
+        network, extract = Stopwatch(), Stopwatch()
+        with self.session.stream('GET', url, headers=headers, **kwargs) as response:
+            response.raise_for_status()
+            with extract:
+                page_data = extract_page_data(network.wrap(response.iter_bytes(PAGE_CHUNK_SIZE)),
+                                              response.charset_encoding or 'utf-8', drain_limit_for(response, self.drain_limit),
+                                              lambda: unread_bytes(response))
+        if page_data is not None:
+            self.session.metrics.observe('extract', extract.elapsed - network.elapsed)
+        return page_data
+
+    @staticmethod
+    def _listing_url(artist_url: str, page_num: int, order: Optional[str] = None) -> str:
+        # Construct URL with Guitar Pro filter and page number
+        if order:
+            return f"{artist_url}?filter=guitar_pro&order={order}&page={page_num}"
+        return f"{artist_url}?filter=guitar_pro&page={page_num}"
+
+    def _fetch_listing_page(self, artist_url: str, page_num: int, order: Optional[str] = None) -> Optional[dict]:
+        """
+        Fetch one listing page and parse its data-content JSON
+        Returns None if the page has no data-content blob; HTTP and JSON errors are raised
+        """
+        # Set referer for this request
+        headers = self.headers.copy()
+        if page_num > 1:
+            headers['Referer'] = self._listing_url(artist_url, page_num - 1, order)
+        else:
+            headers['Referer'] = artist_url
+
+        # Extract JSON data from the page
+        self.session.metrics.begin('listing_pages')
+        page_data = self._fetch_page_data(self._listing_url(artist_url, page_num, order), headers,
+                                          follow_redirects=True)
+        self.session.metrics.count('listing_pages')
+        return page_data
+
+    @staticmethod
+    def _report_auth(page_data: dict) -> None:
+        # Check authentication status
+        user_info = page_data.get('store', {}).get('user', {})
+        user_id = user_info.get('id', 0)
+        username = user_info.get('username', 'anonymous')
+
+        if user_id == 0:
+            print("  [WARNING] Not authenticated (user_id: 0). Some tabs might not be accessible.")
+        else:
+            print(f"  [OK] Authenticated as '{username}' (user_id: {user_id})")
+
+    def _catalog_page(self, artist_url: str, tabs_on_page: list) -> None:
+        # Every entry, not only Guitar Pro, so the catalog can be queried by type
+        if self.catalog is not None and tabs_on_page:
+            self.catalog.record(artist_url, tabs_on_page)
+
+    @staticmethod
+    def _collect_tabs(tabs_on_page: list, all_tab_urls: Set[str]) -> List[dict]:
+        """Add the page's Guitar Pro tab URLs to all_tab_urls; returns the new tabs in page order"""
+        new_tabs = []
+        for tab in tabs_on_page:
+            # Check if it's a Guitar Pro tab and has a valid URL
+            if (tab.get('type_name') == 'Guitar Pro' and 
+                'tab_url' in tab and 
+                tab['tab_url']):
+
+                tab_url = tab['tab_url']
+                song_name = tab.get('song_name', 'Unknown')
+                artist_name = tab.get('artist_name', 'Unknown')
+                version = tab.get('version', '')
+
+                # Add to our collection
+                if tab_url not in all_tab_urls:
+                    all_tab_urls.add(tab_url)
+                    new_tabs.append(tab)
+
+                    # Log each found tab
+                    version_str = f" (v{version})" if version else ""
+                    print(f"    [FOUND] {artist_name} - {song_name}{version_str}")
+        return new_tabs
+
+    @staticmethod
+    def _max_page(page_data: dict) -> Optional[int]:
+        pagination_info = page_data.get('store', {}).get('page', {}).get('data', {}).get('pagination', {})
+        pages_info = pagination_info.get('pages', []) if pagination_info else []
+        if not pages_info:
+            return None
+        return max([p.get('page', 0) for p in pages_info])
+
+    def scrape_artist_tabs(self, artist_url: str, output_file: str = "in_scraped.txt",
+                           concurrency: int = 1) -> Set[str]:
         """
         Scrape all Guitar Pro tabs from artist pages with pagination
         
         Args:
             artist_url: URL to artist page (e.g., "https://www.ultimate-guitar.com/artist/dance_gavin_dance_16507")
             output_file: File to save URLs to
+            concurrency: pages fetched at once; above 1, pages 2..N are fetched in
+                parallel once page 1 has revealed the page count; requests are
+                paced by the session's rate controller either way
             
         Returns:
             Set of found tab URLs
         """
+        print(f"[SCRAPER] Results will be saved to: {output_file}")
+        all_tab_urls = set(self.iter_artist_tabs(artist_url, concurrency))
+        
+        # Save results to file
+        if all_tab_urls:
+            print(f"\n[SAVE] Saving {len(all_tab_urls)} URLs to {output_file}...")
+            try:
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    for url in sorted(all_tab_urls):
+                        f.write(url + '\n')
+                print(f"[OK] Successfully saved all URLs to {output_file}")
+            except Exception as e:
+                print(f"[ERROR] Error saving to file: {e}")
+        else:
+            print("\n[RESULT] No Guitar Pro tabs found!")
+        
+        return all_tab_urls
+
+    def iter_artist_tabs(self, artist_url: str, concurrency: int = 1) -> Iterator[str]:
+        """
+        Yield the artist's Guitar Pro tab URLs as each listing page is parsed
+        Every URL is yielded once, in page order. Arguments as for scrape_artist_tabs.
+        With best_versions set, the artist's URLs only come once the whole listing is read.
+        """
+        entries = self.iter_artist_tab_entries(artist_url, concurrency)
+        if self.best_versions is not None:
+            # A better version of a song may be listed on a later page
+            found = list(entries)
+            entries = self.best_versions.select(found)
+            print(f"[SELECT] {artist_url}: keeping {len(entries)} of {len(found)} tabs "
+                  f"({self.best_versions.describe()})")
+        for tab in entries:
+            yield tab['tab_url']
+
+    def iter_artist_tab_entries(self, artist_url: str, concurrency: int = 1,
+                                order: Optional[str] = None) -> Iterator[dict]:
+        """
+        Yield the listing entries (tab_url, version, song_name, ...) of the artist's Guitar Pro tabs
+        Pages are only fetched as the caller consumes entries, so closing the
+        generator stops paging. `order` is passed through to the listing (e.g. NEWEST_FIRST).
+        """
         all_tab_urls = set()
+        skipped_pages = []
         page_num = 1
         
         # Ensure the artist URL has the correct format and add guitar_pro filter
@@ -67,144 +267,265 @@ class UGArtistScraper:
             artist_url = artist_url.rstrip('/')
         
         print(f"[SCRAPER] Starting to scrape Guitar Pro tabs from: {artist_url}")
-        print(f"[SCRAPER] Results will be saved to: {output_file}")
         
-        with httpx.Client(cookies=self.cookies, timeout=30.0, follow_redirects=True) as client:
-            while True:
-                # Construct URL with Guitar Pro filter and page number
-                page_url = f"{artist_url}?filter=guitar_pro&page={page_num}"
+        while True:
+            print(f"\n[PAGE {page_num}] Scraping: {self._listing_url(artist_url, page_num, order)}")
                 
-                print(f"\n[PAGE {page_num}] Scraping: {page_url}")
-                
-                try:
-                    # Set referer for this request
-                    headers = self.headers.copy()
-                    if page_num > 1:
-                        headers['Referer'] = f"{artist_url}?filter=guitar_pro&page={page_num-1}"
-                    else:
-                        headers['Referer'] = artist_url
-                    
-                    response = client.get(page_url, headers=headers)
-                    response.raise_for_status()
-
-                    # Extract JSON data from the page
-                    match = re.search(r'data-content="({.+?})"', response.text)
-                    if not match:
-                        print(f"  [ERROR] Could not find 'data-content' JSON on page {page_num}")
-                        print("  [INFO] This might mean we've reached the end or there's an issue with the page")
-                        break
+            try:
+                page_data = self.retry_policy.call(self._fetch_listing_page, artist_url, page_num, order)
+                if page_data is None:
+                    print(f"  [ERROR] Could not find 'data-content' JSON on page {page_num}")
+                    print("  [INFO] This might mean we've reached the end or there's an issue with the page")
+                    break
 
-                    # Parse the JSON data
-                    json_string = html.unescape(match.group(1))
-                    page_data = json.loads(json_string)
-                    
-                    # Check authentication status
-                    user_info = page_data.get('store', {}).get('user', {})
-                    user_id = user_info.get('id', 0)
-                    username = user_info.get('username', 'anonymous')
-                    
-                    if user_id == 0:
-                        print("  [WARNING] Not authenticated (user_id: 0). Some tabs might not be accessible.")
-                    else:
-                        print(f"  [OK] Authenticated as '{username}' (user_id: {user_id})")
+                self._report_auth(page_data)
                     
-                    # Extract tabs from the page
-                    tabs_on_page = page_data.get('store', {}).get('page', {}).get('data', {}).get('other_tabs', [])
+                # Extract tabs from the page
+                tabs_on_page = page_data.get('store', {}).get('page', {}).get('data', {}).get('other_tabs', [])
                     
-                    if not tabs_on_page:
-                        print(f"  [INFO] No tabs found on page {page_num}. End of pagination reached.")
-                        break
+                if not tabs_on_page:
+                    print(f"  [INFO] No tabs found on page {page_num}. End of pagination reached.")
+                    break
+                self._catalog_page(artist_url, tabs_on_page)
                     
-                    # Filter and collect Guitar Pro tabs
-                    found_count = 0
-                    for tab in tabs_on_page:
-                        # Check if it's a Guitar Pro tab and has a valid URL
-                        if (tab.get('type_name') == 'Guitar Pro' and 
-                            'tab_url' in tab and 
-                            tab['tab_url']):
-                            
-                            tab_url = tab['tab_url']
-                            song_name = tab.get('song_name', 'Unknown')
-                            artist_name = tab.get('artist_name', 'Unknown')
-                            version = tab.get('version', '')
-                            
-                            # Add to our collection
-                            if tab_url not in all_tab_urls:
-                                all_tab_urls.add(tab_url)
-                                found_count += 1
-                                
-                                # Log each found tab
-                                version_str = f" (v{version})" if version else ""
-                                print(f"    [FOUND] {artist_name} - {song_name}{version_str}")
+                # Filter and collect Guitar Pro tabs
+                new_tabs = self._collect_tabs(tabs_on_page, all_tab_urls)
                     
-                    print(f"  [STATS] Found {found_count} new Guitar Pro tabs on this page")
-                    print(f"  [STATS] Total unique tabs collected so far: {len(all_tab_urls)}")
+                print(f"  [STATS] Found {len(new_tabs)} new Guitar Pro tabs on this page")
+                print(f"  [STATS] Total unique tabs collected so far: {len(all_tab_urls)}")
+                yield from new_tabs
 
-                    # Check pagination to see if there are more pages
-                    pagination_info = page_data.get('store', {}).get('page', {}).get('data', {}).get('pagination', {})
+                # Check pagination to see if there are more pages
+                pagination_info = page_data.get('store', {}).get('page', {}).get('data', {}).get('pagination', {})
                     
-                    if pagination_info:
-                        current_page = pagination_info.get('current', page_num)
-                        pages_info = pagination_info.get('pages', [])
+                if pagination_info:
+                    current_page = pagination_info.get('current', page_num)
+                    max_page = self._max_page(page_data)
                         
-                        if pages_info:
-                            max_page = max([p.get('page', 0) for p in pages_info])
-                            print(f"  [PAGINATION] Page {current_page} of {max_page}")
+                    if max_page:
+                        print(f"  [PAGINATION] Page {current_page} of {max_page}")
                             
-                            if current_page >= max_page:
-                                print(f"  [DONE] Reached the last page ({max_page})")
-                                break
-                        else:
-                            print("  [INFO] No pagination info found, assuming last page")
+                        if current_page >= max_page:
+                            print(f"  [DONE] Reached the last page ({max_page})")
                             break
-                    else:
-                        print("  [INFO] No pagination data found, checking for more tabs manually...")
-                        # If no pagination info but we found tabs, there might be more pages
-                        if found_count == 0:
+
+                        if concurrency > 1:
+                            # The full page range is known now, fetch the rest in parallel
+                            yield from self._scrape_pages_parallel(artist_url, range(current_page + 1, max_page + 1),
+                                                                   all_tab_urls, skipped_pages, concurrency, order)
                             break
+                    else:
+                        print("  [INFO] No pagination info found, assuming last page")
+                        break
+                else:
+                    print("  [INFO] No pagination data found, checking for more tabs manually...")
+                    # If no pagination info but we found tabs, there might be more pages
+                    if not new_tabs:
+                        break
                     
+                page_num += 1
+
+            except httpx.HTTPStatusError as e:
+                print(f"  [HTTP ERROR] on page {page_num}: {e.response.status_code}")
+                if e.response.status_code == 404:
+                    print("  [INFO] Page not found - likely reached end of pagination")
+                    break
+                else:
+                    print(f"  [INFO] Continuing to next page...")
+                    skipped_pages.append(page_num)
                     page_num += 1
+                    continue
+                        
+            except json.JSONDecodeError as e:
+                print(f"  [JSON ERROR] on page {page_num}: {e}")
+                print("  [INFO] Page structure might have changed, continuing...")
+                skipped_pages.append(page_num)
+                page_num += 1
+                continue
                     
-                    # Be polite to the server
-                    print(f"  [WAIT] Waiting 2 seconds before next page...")
-                    time.sleep(2)
+            except Exception as e:
+                print(f"  [ERROR] Unexpected error on page {page_num}: {e}")
+                print("  [INFO] Continuing to next page...")
+                skipped_pages.append(page_num)
+                page_num += 1
+                continue
+
+        if skipped_pages:
+            print(f"  [WARNING] {artist_url}: pages {', '.join(map(str, skipped_pages))} failed even after "
+                  f"retries, their tabs are missing")
+
+    def _scrape_pages_parallel(self, artist_url: str, page_nums: range, all_tab_urls: Set[str],
+                               skipped_pages: List[int], concurrency: int,
+                               order: Optional[str] = None) -> Iterator[dict]:
+        """
+        Fetch listing pages concurrently (paced by the session's rate controller), then
+        merge them in page order so the result and the log are deterministic
+        """
+        print(f"  [PARALLEL] Fetching pages {page_nums.start}-{page_nums.stop - 1} ({concurrency} at a time)")
 
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {page_num: pool.submit(self.retry_policy.call, self._fetch_listing_page,
+                                             artist_url, page_num, order)
+                       for page_num in page_nums}
+
+            for page_num in page_nums:
+                print(f"\n[PAGE {page_num}] {self._listing_url(artist_url, page_num, order)}")
+                try:
+                    page_data = futures[page_num].result()
                 except httpx.HTTPStatusError as e:
-                    print(f"  [HTTP ERROR] on page {page_num}: {e.response.status_code}")
-                    if e.response.status_code == 404:
-                        print("  [INFO] Page not found - likely reached end of pagination")
-                        break
-                    else:
-                        print(f"  [INFO] Continuing to next page...")
-                        page_num += 1
-                        continue
-                        
+                    print(f"  [HTTP ERROR] on page {page_num}: {e.response.status_code}, skipping")
+                    skipped_pages.append(page_num)
+                    continue
                 except json.JSONDecodeError as e:
-                    print(f"  [JSON ERROR] on page {page_num}: {e}")
-                    print("  [INFO] Page structure might have changed, continuing...")
-                    page_num += 1
+                    print(f"  [JSON ERROR] on page {page_num}: {e}, skipping")
+                    skipped_pages.append(page_num)
                     continue
-                    
                 except Exception as e:
-                    print(f"  [ERROR] Unexpected error on page {page_num}: {e}")
-                    print("  [INFO] Continuing to next page...")
-                    page_num += 1
+                    print(f"  [ERROR] Unexpected error on page {page_num}: {e}, skipping")
+                    skipped_pages.append(page_num)
+                    continue
+
+                if page_data is None:
+                    print(f"  [ERROR] Could not find 'data-content' JSON on page {page_num}, skipping")
+                    skipped_pages.append(page_num)
+                    continue
+
+                tabs_on_page = page_data.get('store', {}).get('page', {}).get('data', {}).get('other_tabs', [])
+                self._catalog_page(artist_url, tabs_on_page)
+                new_tabs = self._collect_tabs(tabs_on_page, all_tab_urls)
+                print(f"  [STATS] Found {len(new_tabs)} new Guitar Pro tabs on this page")
+                print(f"  [STATS] Total unique tabs collected so far: {len(all_tab_urls)}")
+                yield from new_tabs
+
+    def iter_artists_tabs(self, artist_urls: List[str], workers: int = DEFAULT_ARTIST_WORKERS,
+                          concurrency: int = 1,
+                          breakdown: Optional[Dict[str, List[str]]] = None) -> Iterator[str]:
+        """
+        Yield the Guitar Pro tab URLs of many artists, each URL once across all of them
+        Artists are scraped by `workers` threads on the shared session, so all their
+        page requests draw from the session's per-host rate budget.
+        If `breakdown` is given, it is filled with every tab URL found per artist.
+        """
+        if breakdown is None:
+            breakdown = {}
+        for artist_url in artist_urls:
+            breakdown[artist_url] = []
+
+        # Unbounded on purpose: workers must never block if the consumer stops early
+        results = queue.Queue()
+
+        def scrape(artist_url: str) -> None:
+            try:
+                for tab_url in self.iter_artist_tabs(artist_url, concurrency):
+                    results.put((artist_url, tab_url))
+            except Exception as e:
+                print(f"[ERROR] Scraping {artist_url} failed: {e}")
+            finally:
+                results.put((artist_url, None))
+
+        print(f"[SCRAPER] Scraping {len(artist_urls)} artists with {workers} workers")
+        seen = set()
+        pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        try:
+            for artist_url in artist_urls:
+                pool.submit(scrape, artist_url)
+            remaining = len(artist_urls)
+            while remaining:
+                artist_url, tab_url = results.get()
+                if tab_url is None:
+                    remaining -= 1
                     continue
+                breakdown[artist_url].append(tab_url)
+                if tab_url not in seen:
+                    seen.add(tab_url)
+                    yield tab_url
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def scrape_artists(self, artist_urls: List[str], output_file: str = "in_scraped.txt",
+                       workers: int = DEFAULT_ARTIST_WORKERS,
+                       concurrency: int = 1) -> Tuple[Set[str], Dict[str, List[str]]]:
+        """
+        Scrape many artists and save one merged, deduplicated URL list
+        A per-artist breakdown is saved next to it (see artist_breakdown_file).
         
-        # Save results to file
+        Returns:
+            (set of unique tab URLs, {artist_url: tab URLs found for that artist})
+        """
+        print(f"[SCRAPER] Results will be saved to: {output_file}")
+        breakdown = {}
+        all_tab_urls = set(self.iter_artists_tabs(artist_urls, workers, concurrency, breakdown))
+
+        print(f"\n[ARTISTS] Per-artist breakdown:")
+        for artist_url, tab_urls in breakdown.items():
+            print(f"  {len(tab_urls):5d}  {artist_url}")
+
         if all_tab_urls:
             print(f"\n[SAVE] Saving {len(all_tab_urls)} URLs to {output_file}...")
             try:
                 with open(output_file, 'w', encoding='utf-8') as f:
                     for url in sorted(all_tab_urls):
                         f.write(url + '\n')
+                save_artist_breakdown(breakdown, artist_breakdown_file(output_file))
                 print(f"[OK] Successfully saved all URLs to {output_file}")
+                print(f"[OK] Per-artist breakdown saved to {artist_breakdown_file(output_file)}")
             except Exception as e:
                 print(f"[ERROR] Error saving to file: {e}")
         else:
             print("\n[RESULT] No Guitar Pro tabs found!")
-        
-        return all_tab_urls
+
+        return all_tab_urls, breakdown
+
+    def sync_artist_tabs(self, library: ArtistLibrary, artist_url: str,
+                         stop_after: Optional[int] = DEFAULT_STOP_AFTER) -> List[str]:
+        """
+        Scrape an artist newest first and return the tab URLs that need downloading
+        New tabs and tabs whose version/date changed are returned, plus tabs an earlier
+        sync saw but never downloaded. Paging stops after `stop_after` consecutive tabs
+        that are already downloaded at their current revision (None walks every page);
+        the first sync of an artist always walks every page.
+        """
+        known = library.downloaded_revisions(artist_url)
+        if not known:
+            stop_after = None
+        delta = []
+        listed_tabs = []
+        seen = []
+        unchanged_run = 0
+
+        entries = self.iter_artist_tab_entries(artist_url, order=NEWEST_FIRST)
+        try:
+            for tab in entries:
+                tab_url, revision = tab['tab_url'], tab_revision(tab)
+                seen.append((tab_url, revision))
+                if len(seen) >= SEEN_CHUNK:
+                    library.record_seen(artist_url, seen)
+                    seen = []
+                listed_tabs.append(tab)
+                if known.get(tab_url) == revision:
+                    unchanged_run += 1
+                    if stop_after is not None and unchanged_run >= stop_after:
+                        print(f"  [SYNC] {unchanged_run} unchanged tabs in a row, no newer tabs expected")
+                        break
+                else:
+                    unchanged_run = 0
+                    delta.append(tab_url)
+        finally:
+            # Stops paging: the next listing page is never requested
+            entries.close()
+            library.record_seen(artist_url, seen)
+
+        if self.best_versions is not None:
+            # Only among the entries this sync paged through; the versions dropped are settled so
+            # later syncs do not offer them again until they change
+            best = {tab['tab_url'] for tab in self.best_versions.select(listed_tabs)}
+            library.mark_skipped(tab['tab_url'] for tab in listed_tabs if tab['tab_url'] not in best)
+            delta = [tab_url for tab_url in delta if tab_url in best]
+        listed = set(delta)
+        delta.extend(tab_url for tab_url in library.outstanding(artist_url) if tab_url not in listed)
+        library.mark_synced(artist_url)
+        print(f"[SYNC] {artist_url}: {len(delta)} new or changed tabs")
+        return delta
 
     def get_artist_info(self, artist_url: str) -> dict:
         """
@@ -212,34 +533,69 @@ class UGArtistScraper:
         """
         print(f"[INFO] Getting artist info from: {artist_url}")
         
-        with httpx.Client(cookies=self.cookies, timeout=30.0) as client:
-            try:
-                response = client.get(artist_url, headers=self.headers)
-                response.raise_for_status()
-                
-                # Extract JSON data
-                match = re.search(r'data-content="({.+?})"', response.text)
-                if not match:
-                    return {"error": "Could not extract data from page"}
-                
-                json_string = html.unescape(match.group(1))
-                page_data = json.loads(json_string)
+        try:
+            # Extract JSON data
+            page_data = self._fetch_page_data(artist_url, self.headers)
+            if page_data is None:
+                return {"error": "Could not extract data from page"}
                 
-                # Extract artist info
-                artist_data = page_data.get('store', {}).get('page', {}).get('data', {})
-                artist_name = artist_data.get('artist', {}).get('name', 'Unknown')
+            # Extract artist info
+            artist_data = page_data.get('store', {}).get('page', {}).get('data', {})
+            artist_name = artist_data.get('artist', {}).get('name', 'Unknown')
                 
-                # Count total tabs
-                tabs_count = len(artist_data.get('other_tabs', []))
+            # Count total tabs
+            tabs_count = len(artist_data.get('other_tabs', []))
                 
-                return {
-                    "name": artist_name,
-                    "total_tabs": tabs_count,
-                    "url": artist_url
-                }
+            return {
+                "name": artist_name,
+                "total_tabs": tabs_count,
+                "url": artist_url
+            }
                 
-            except Exception as e:
-                return {"error": str(e)}
+        except Exception as e:
+            return {"error": str(e)}
+
+
+def read_artist_urls(input_file: str) -> List[str]:
+    """
+    Read artist URLs from a file, one per line; blank lines and # comments are skipped
+    Variants of one URL (trailing slash, query string, host case) are read once.
+    """
+    artist_urls = []
+    seen = set()
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            url = line.strip()
+            if not url or url.startswith('#'):
+                continue
+            key = canonical_url(url) or url
+            if key not in seen:
+                seen.add(key)
+                artist_urls.append(key)
+    return artist_urls
+
+
+def artist_breakdown_file(output_file: str) -> str:
+    return f"{output_file}.artists.json"
+
+
+def save_artist_breakdown(breakdown: Dict[str, List[str]], path: str) -> None:
+    """
+    Save {artist_url: tab URLs} as JSON, noting how many of each artist's tabs
+    were also found under another artist
+    """
+    owners = {}
+    for artist_url, tab_urls in breakdown.items():
+        for tab_url in tab_urls:
+            owners[tab_url] = owners.get(tab_url, 0) + 1
+    artists = [{
+        'artist_url': artist_url,
+        'tabs': len(tab_urls),
+        'shared': sum(1 for tab_url in tab_urls if owners[tab_url] > 1),
+        'tab_urls': sorted(tab_urls),
+    } for artist_url, tab_urls in breakdown.items()]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'unique_tabs': len(owners), 'artists': artists}, f, indent=2)
 
 
 def main():
@@ -247,19 +603,86 @@ def main():
     Main function for command line usage
     """
     parser = ArgumentParser(description='Scrape Guitar Pro tabs from Ultimate Guitar artist pages')
-    parser.add_argument('artist_url', help='Artist URL to scrape')
-    parser.add_argument('--cookies', '-c', help='Path to cookies JSON file')
+    parser.add_argument('artist_url', nargs='?', help='Artist URL to scrape')
+    parser.add_argument('--artists-file', '-a',
+                       help='File with artist URLs (one per line) to scrape into one merged URL list')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_ARTIST_WORKERS,
+                       help=f'Artists scraped at once with --artists-file (default: {DEFAULT_ARTIST_WORKERS})')
+    parser.add_argument('--cookies', '-c', help='Path to cookies file (JSON or Netscape cookies.txt)')
     parser.add_argument('--output', '-o', default='in_scraped.txt', 
                        help='Output file for scraped URLs (default: in_scraped.txt)')
     parser.add_argument('--info-only', action='store_true',
                        help='Only get artist info, don\'t scrape tabs')
+    parser.add_argument('--http2', action='store_true',
+                       help='Use HTTP/2 for the connection pool (requires httpx[http2])')
+    parser.add_argument('--max-connections', type=int, default=DEFAULT_MAX_CONNECTIONS,
+                       help=f'Maximum pooled connections (default: {DEFAULT_MAX_CONNECTIONS})')
+    parser.add_argument('--cache-dir',
+                       help='Cache artist pages on disk in this directory')
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_CACHE_MAX_MB,
+                       help=f'Cache size limit in MB (default: {DEFAULT_CACHE_MAX_MB})')
+    parser.add_argument('--cache-ttl', action='append', metavar='CLASS=SECONDS',
+                       help='Override cache freshness per URL class, e.g. --cache-ttl artist=600')
+    parser.add_argument('--drain-kb', type=int, default=DEFAULT_DRAIN_LIMIT // 1024,
+                       help='Read up to this many KiB of a page past its data blob to keep the HTTP/1.1 connection, '
+                            f'0 always drops it (default: {DEFAULT_DRAIN_LIMIT // 1024})')
+    parser.add_argument('--page-concurrency', type=int, default=1,
+                       help='Fetch listing pages this many at a time once the page count is known (default: 1)')
+    parser.add_argument('--rate-limit', type=float, default=DEFAULT_RATE,
+                       help=f'Starting requests per second per host; adapts to throttling (default: {DEFAULT_RATE:g})')
+    parser.add_argument('--max-rate', type=float, default=DEFAULT_MAX_RATE,
+                       help=f'Ceiling for the adaptive request rate per host (default: {DEFAULT_MAX_RATE:g})')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                       help=f'Retries for transient errors (timeouts, resets, 429/5xx) per page (default: {DEFAULT_RETRIES})')
+    parser.add_argument('--breaker-threshold', type=float, default=DEFAULT_BREAKER_THRESHOLD,
+                       help=f'Pause when this share of recent requests fail, 0 disables (default: {DEFAULT_BREAKER_THRESHOLD:g})')
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG_FILE,
+                       help=f'Save every listed tab\'s metadata to this catalog, query it with catalog.py (default: {DEFAULT_CATALOG_FILE})')
+    parser.add_argument('--best', type=int, default=0,
+                       help='Keep only the best N versions of each song (default: 0, keep all)')
+    parser.add_argument('--best-by', choices=SELECT_POLICIES, default=DEFAULT_SELECT_POLICY,
+                       help=f'How --best ranks versions: highest rating, latest version or most votes (default: {DEFAULT_SELECT_POLICY})')
+    parser.add_argument('--metrics-out',
+                       help='Write per-phase timings, percentiles and counters to this file at the end of the run')
+    parser.add_argument('--metrics-format', choices=METRICS_FORMATS, default='json',
+                       help='Format for --metrics-out: json or prometheus text (default: json)')
     
     args = parser.parse_args()
+    if not args.artist_url and not args.artists_file:
+        parser.error('an artist URL or --artists-file is required')
+    if args.info_only and args.artists_file:
+        parser.error('--info-only works on a single artist URL, not with --artists-file')
+    
+    cache = None
+    if args.cache_dir:
+        try:
+            cache = HTTPCache(args.cache_dir, args.cache_max_mb * 1024 * 1024, parse_ttls(args.cache_ttl))
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        rate_controller = RateController(args.rate_limit, args.max_rate)
+    except ValueError as e:
+        parser.error(str(e))
     
     # Initialize scraper
-    scraper = UGArtistScraper(args.cookies)
+    scraper = UGArtistScraper(args.cookies, http2=args.http2,
+                              max_connections=max(args.max_connections, args.workers * args.page_concurrency),
+                              cache=cache, rate_controller=rate_controller,
+                              retry_policy=RetryPolicy(args.retries, breaker=CircuitBreaker(args.breaker_threshold)),
+                              catalog=TabCatalog(args.catalog),
+                              best_versions=BestVersions(args.best, args.best_by) if args.best else None,
+                              drain_limit=args.drain_kb * 1024)
     
-    if args.info_only:
+    if args.artists_file:
+        # Scrape many artists into one merged list
+        urls, breakdown = scraper.scrape_artists(read_artist_urls(args.artists_file), args.output, args.workers,
+                                                 args.page_concurrency)
+        
+        print(f"\n[SUMMARY]")
+        print(f"  Artists scraped: {len(breakdown)}")
+        print(f"  Total unique Guitar Pro tabs found: {len(urls)}")
+        print(f"  URLs saved to: {args.output}")
+    elif args.info_only:
         # Just get artist info
         info = scraper.get_artist_info(args.artist_url)
         print(f"\n[ARTIST INFO]")
@@ -267,7 +690,7 @@ def main():
             print(f"  {key}: {value}")
     else:
         # Scrape all tabs
-        urls = scraper.scrape_artist_tabs(args.artist_url, args.output)
+        urls = scraper.scrape_artist_tabs(args.artist_url, args.output, args.page_concurrency)
         
         print(f"\n[SUMMARY]")
         print(f"  Total Guitar Pro tabs found: {len(urls)}")
@@ -277,6 +700,22 @@ def main():
             print(f"\n[NEXT STEP] You can now download these tabs with:")
             print(f"  python main.py {args.output} --cookies {args.cookies or 'cookies.json'}")
 
+    scraper.session.print_stats()
+    if cache is not None:
+        cache.print_stats()
+    rate_controller.print_stats()
+    scraper.retry_policy.print_stats()
+    scraper.catalog.print_summary()
+    if scraper.best_versions is not None:
+        scraper.best_versions.print_stats()
+    snapshot = scraper.metrics_snapshot()
+    print_summary(snapshot)
+    if args.metrics_out:
+        write_metrics(snapshot, args.metrics_out, args.metrics_format)
+        print(f"[METRICS] Saved to {args.metrics_out} ({args.metrics_format})")
+    scraper.catalog.close()
+    scraper.close()
+
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Best-version selection for artist listings
+Listings often hold several versions of the same song; grouping entries by
+(artist, song) and keeping only the top N per group before anything is downloaded
+saves both the tab page fetch and the binary download for every dropped version.
+"""
+
+import re
+import threading
+from typing import Iterable, List
+
+
+SELECT_POLICIES = ('rating', 'latest', 'votes')
+DEFAULT_SELECT_POLICY = 'rating'
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def song_key(tab: dict) -> tuple:
+    """(artist, song) a listing entry belongs to, ignoring case and spacing"""
+    return tuple(re.sub(r'\s+', ' ', str(tab.get(field) or '')).strip().casefold()
+                 for field in ('artist_name', 'song_name'))
+
+
+# Higher sorts first; later fields break ties
+_RANKINGS = {
+    'rating': lambda tab: (_number(tab.get('rating')), _number(tab.get('votes')), _number(tab.get('version'))),
+    'latest': lambda tab: (_number(tab.get('version')), _number(tab.get('date'))),
+    'votes': lambda tab: (_number(tab.get('votes')), _number(tab.get('rating'))),
+}
+
+
+class BestVersions:
+    def __init__(self, keep: int = 1, policy: str = DEFAULT_SELECT_POLICY):
+        """
+        Keep the top `keep` entries per (artist, song)
+        policy: 'rating' (highest rated, then most votes), 'latest' (highest version number,
+            then newest date) or 'votes' (most votes, then highest rated)
+        """
+        if policy not in SELECT_POLICIES:
+            raise ValueError(f"policy must be one of {SELECT_POLICIES}")
+        self.keep = max(1, keep)
+        self.policy = policy
+        self.seen = 0
+        self.kept = 0
+        self._lock = threading.Lock()
+
+    def select(self, tabs: Iterable[dict]) -> List[dict]:
+        """The entries to download, in their original order"""
+        tabs = list(tabs)
+        groups = {}
+        for position, tab in enumerate(tabs):
+            groups.setdefault(song_key(tab), []).append(position)
+        rank = _RANKINGS[self.policy]
+        chosen = set()
+        for positions in groups.values():
+            # sorted() is stable, so ties keep listing order
+            chosen.update(sorted(positions, key=lambda p: rank(tabs[p]), reverse=True)[:self.keep])
+        selected = [tab for position, tab in enumerate(tabs) if position in chosen]
+        with self._lock:
+            self.seen += len(tabs)
+            self.kept += len(selected)
+        return selected
+
+    def describe(self) -> str:
+        return f"best {self.keep} per song by {self.policy}"
+
+    def print_stats(self) -> None:
+        print(f"🏆 Selection ({self.describe()}): kept {self.kept} of {self.seen} tabs, "
+              f"{self.seen - self.kept} other versions skipped")
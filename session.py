@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP session for Ultimate Guitar requests
+Keeps connections alive across tabs and reports how many were opened vs reused
+"""
+
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+import httpx
+
+from cache import HTTPCache, CachingTransport, AsyncCachingTransport
+from ratelimit import RateController, RateControlledTransport, AsyncRateControlledTransport
+from metrics import Metrics
+from cookiejar import SharedCookieJar
+from extract import unread_bytes
+
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+
+def http2_available() -> bool:
+    """Check whether the optional h2 package needed for HTTP/2 is installed"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class _PoolStats:
+    """Connection/request counters fed by the httpcore trace extension"""
+
+    def _init_stats(self) -> None:
+        self._lock = threading.Lock()
+        self.requests_sent = 0
+        self.connections_opened = 0
+
+    def _count_bytes(self, response: httpx.Response) -> None:
+        # Cache hits never touched the network
+        if not response.extensions.get('from_cache'):
+            self.metrics.count('bytes_received', response.num_bytes_downloaded)
+            # Body left unread, e.g. the rest of a page after its data-content blob
+            self.metrics.count('bytes_skipped', unread_bytes(response) or 0)
+
+    def _track_cookies(self, response: httpx.Response) -> None:
+        if self.cookie_jar is not None:
+            self.cookie_jar.after_response(self.client.cookies, response)
+
+    def _count(self, event_name: str) -> None:
+        if event_name.endswith('.send_request_headers.started'):
+            with self._lock:
+                self.requests_sent += 1
+        elif event_name in ('connection.connect_tcp.complete', 'connection.connect_unix_socket.complete'):
+            with self._lock:
+                self.connections_opened += 1
+
+    def stats(self) -> dict:
+        """
+        Connection usage so far
+        Every request either opens a new connection or reuses a pooled one
+        """
+        with self._lock:
+            sent = self.requests_sent
+            opened = self.connections_opened
+        return {
+            "requests": sent,
+            "connections_opened": opened,
+            "connections_reused": max(sent - opened, 0),
+        }
+
+    def print_stats(self) -> None:
+        stats = self.stats()
+        print(f"🔌 Connections: {stats['connections_opened']} opened, "
+              f"{stats['connections_reused']} reused ({stats['requests']} requests)")
+
+
+def _client_options(http2: bool, max_connections: int, max_keepalive_connections: Optional[int],
+                    keepalive_expiry: float) -> dict:
+    if http2 and not http2_available():
+        print("⚠️  Warning: h2 package not installed, falling back to HTTP/1.1 (pip install httpx[http2])")
+        http2 = False
+    if max_keepalive_connections is None:
+        max_keepalive_connections = max_connections
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    return {"http2": http2, "limits": limits}
+
+
+class UGSession(_PoolStats):
+    def __init__(self, cookies: Optional[dict] = None, http2: bool = False,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 max_keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+                 timeout: float = DEFAULT_TIMEOUT, cache: Optional[HTTPCache] = None,
+                 rate_controller: Optional[RateController] = None, metrics: Optional[Metrics] = None,
+                 cookie_jar: Optional[SharedCookieJar] = None):
+        """
+        Initialize a long-lived HTTP session
+        cookies: dict of cookie name -> value sent with every request
+        http2: enable HTTP/2 (requires `pip install httpx[http2]`)
+        max_connections: upper bound on open connections in the pool
+        max_keepalive_connections: idle connections kept for reuse (default: max_connections)
+        keepalive_expiry: seconds an idle connection stays in the pool
+        cache: optional HTTPCache that artist and tab pages are served from
+        rate_controller: pacing shared with other sessions (a default RateController otherwise);
+            cache hits are never paced
+        metrics: timings and byte counts shared with other sessions (a new Metrics otherwise)
+        cookie_jar: SharedCookieJar the cookies come from (instead of `cookies`); Set-Cookie updates
+            are saved to it and its updates from other sessions or processes are picked up
+        """
+        self._init_stats()
+        options = _client_options(http2, max_connections, max_keepalive_connections, keepalive_expiry)
+        self.http2 = options['http2']
+        self.limits = options['limits']
+        self.cache = cache
+        self.rate_controller = rate_controller or RateController()
+        self.metrics = metrics or Metrics()
+        transport = RateControlledTransport(httpx.HTTPTransport(**options), self.rate_controller)
+        if cache is not None:
+            transport = CachingTransport(transport, cache)
+        self.client = httpx.Client(cookies=cookies or {}, timeout=timeout, transport=transport)
+        self.cookie_jar = cookie_jar
+        if cookie_jar is not None:
+            cookie_jar.attach(self.client.cookies)
+
+    def _with_trace(self, kwargs: dict) -> dict:
+        timer = self.metrics.request_timer()
+
+        def trace(event_name: str, info: dict) -> None:
+            self._count(event_name)
+            timer.event(event_name)
+
+        extensions = dict(kwargs.pop('extensions', None) or {})
+        extensions['trace'] = trace
+        kwargs['extensions'] = extensions
+        return kwargs
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request over the pooled client (same arguments as httpx.Client.request)"""
+        response = self.client.request(method, url, **self._with_trace(kwargs))
+        self._track_cookies(response)
+        self._count_bytes(response)
+        return response
+
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        return self.request('GET', url, **kwargs)
+
+    @contextmanager
+    def stream(self, method: str, url: str, **kwargs):
+        """Context manager yielding a streamed response (same arguments as httpx.Client.stream)"""
+        with self.client.stream(method, url, **self._with_trace(kwargs)) as response:
+            self._track_cookies(response)
+            try:
+                yield response
+            finally:
+                self._count_bytes(response)
+
+    def close(self) -> None:
+        if self.cookie_jar is not None:
+            self.cookie_jar.detach(self.client.cookies)
+        self.client.close()
+
+    def __enter__(self) -> 'UGSession':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class AsyncUGSession(_PoolStats):
+    def __init__(self, cookies: Optional[dict] = None, http2: bool = False,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 max_keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+                 timeout: float = DEFAULT_TIMEOUT, cache: Optional[HTTPCache] = None,
+                 rate_controller: Optional[RateController] = None, metrics: Optional[Metrics] = None,
+                 cookie_jar: Optional[SharedCookieJar] = None):
+        """
+        asyncio counterpart of UGSession, built on httpx.AsyncClient
+        Takes the same options; must be used and closed from within an event loop
+        """
+        self._init_stats()
+        options = _client_options(http2, max_connections, max_keepalive_connections, keepalive_expiry)
+        self.http2 = options['http2']
+        self.limits = options['limits']
+        self.cache = cache
+        self.rate_controller = rate_controller or RateController()
+        self.metrics = metrics or Metrics()
+        transport = AsyncRateControlledTransport(httpx.AsyncHTTPTransport(**options), self.rate_controller)
+        if cache is not None:
+            transport = AsyncCachingTransport(transport, cache)
+        self.client = httpx.AsyncClient(cookies=cookies or {}, timeout=timeout, transport=transport)
+        self.cookie_jar = cookie_jar
+        if cookie_jar is not None:
+            cookie_jar.attach(self.client.cookies)
+
+    def _with_trace(self, kwargs: dict) -> dict:
+        timer = self.metrics.request_timer()
+
+        async def trace(event_name: str, info: dict) -> None:
+            self._count(event_name)
+            timer.event(event_name)
+
+        extensions = dict(kwargs.pop('extensions', None) or {})
+        extensions['trace'] = trace
+        kwargs['extensions'] = extensions
+        return kwargs
+
+    async def _track_cookies_async(self, response: httpx.Response) -> None:
+        # A cookie write locks, merges and fsyncs the cookies file: never on the event loop
+        if self.cookie_jar is not None:
+            await asyncio.to_thread(self.cookie_jar.after_response, self.client.cookies, response)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request over the pooled client (same arguments as httpx.AsyncClient.request)"""
+        response = await self.client.request(method, url, **self._with_trace(kwargs))
+        await self._track_cookies_async(response)
+        self._count_bytes(response)
+        return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('GET', url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs):
+        """Async context manager yielding a streamed response"""
+        async with self.client.stream(method, url, **self._with_trace(kwargs)) as response:
+            await self._track_cookies_async(response)
+            try:
+                yield response
+            finally:
+                self._count_bytes(response)
+
+    async def aclose(self) -> None:
+        if self.cookie_jar is not None:
+            self.cookie_jar.detach(self.client.cookies)
+        await self.client.aclose()
+
+    async def __aenter__(self) -> 'AsyncUGSession':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
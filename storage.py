@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Output storage helpers for downloaded tabs
+Files are streamed to a temporary sibling and atomically renamed into place.
+OutputStore indexes them by content hash, so identical files are hard-linked or
+skipped instead of rewritten and tabs sharing a filename never overwrite each other.
+The validators each download came with (ETag, Last-Modified) are kept too, so a
+refresh can ask the server whether a tab changed instead of downloading it again.
+"""
+
+import base64
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from typing import Iterator, Optional, Tuple
+
+from urlinput import tab_key
+
+
+PARTIAL_PREFIX = '.'
+PARTIAL_SUFFIX = '.part'
+
+# Index kept inside the output directory (hidden, like partial files)
+INDEX_FILENAME = '.ugstore.sqlite'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# How OutputStore.commit() placed a file
+STORED = 'stored'
+LINKED = 'linked'
+UNCHANGED = 'unchanged'
+# Confirmed unchanged by the server (304 or matching validators): nothing was transferred
+REVALIDATED = 'revalidated'
+
+# mkstemp creates files as 0600; committed files get the usual umask-based mode
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+
+
+class AtomicFileWriter:
+    def __init__(self, directory: str):
+        """
+        Stream a file into `directory` without ever exposing a partial file
+        Byte count and SHA-256 are computed while writing; nothing appears
+        under the final name until commit() succeeds.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(dir=directory, prefix=PARTIAL_PREFIX, suffix=PARTIAL_SUFFIX)
+        self._file = os.fdopen(fd, 'wb')
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.path: Optional[str] = None
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+        self._hash.update(chunk)
+        self.size += len(chunk)
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def finish(self) -> None:
+        """Flush the temporary file to disk and close it (idempotent)"""
+        if self._file.closed:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.chmod(self.temp_path, FILE_MODE)
+
+    def publish(self, final_path: str, overwrite: bool = True) -> str:
+        """
+        Move the finished file to `final_path`; returns it
+        With overwrite=False an existing file is never replaced: FileExistsError is raised instead.
+        """
+        self.finish()
+        if overwrite:
+            os.replace(self.temp_path, final_path)
+        else:
+            try:
+                # link() fails atomically if the name is taken, even by another process
+                os.link(self.temp_path, final_path)
+            except FileExistsError:
+                raise
+            except OSError:
+                # No hard links on this filesystem
+                if os.path.exists(final_path):
+                    raise FileExistsError(final_path)
+                os.replace(self.temp_path, final_path)
+            else:
+                os.remove(self.temp_path)
+        self.path = final_path
+        return final_path
+
+    def commit(self, filename: str) -> str:
+        """Flush to disk and rename the temporary file to `filename`; returns the final path"""
+        # Never let a server-supplied name escape the output directory
+        return self.publish(os.path.join(self.directory, os.path.basename(filename)))
+
+    def discard(self) -> None:
+        """Drop the temporary file (no-op after a successful commit)"""
+        if not self._file.closed:
+            self._file.close()
+        if self.path is None and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def __enter__(self) -> 'AtomicFileWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.discard()
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def candidate_names(filename: str, tab_url: str, sha256: str) -> Iterator[str]:
+    """
+    Names to try for a file, in order: the server's name, then one qualified by the tab ID,
+    then by the content hash as well, so the same tab always ends up under the same name
+    """
+    name = os.path.basename(filename) or 'tab'
+    stem, ext = os.path.splitext(name)
+    tab_id = re.search(r'(\d+)$', tab_url)
+    tag = tab_id.group(1) if tab_id else sha256[:8]
+    yield name
+    yield f"{stem} ({tag}){ext}"
+    yield f"{stem} ({tag}-{sha256[:12]}){ext}"
+
+
+def response_validators(headers) -> dict:
+    """What a download response says about its content version, to be stored with the file"""
+    return {'etag': headers.get('etag'), 'last_modified': headers.get('last-modified')}
+
+
+def conditional_headers(known: dict) -> dict:
+    """If-None-Match / If-Modified-Since for re-requesting a file saved with `known` validators"""
+    headers = {}
+    if known.get('etag'):
+        headers['If-None-Match'] = known['etag']
+    if known.get('last_modified'):
+        headers['If-Modified-Since'] = known['last_modified']
+    return headers
+
+
+def _sha256_digest(headers) -> Optional[str]:
+    """Hex SHA-256 from a Digest / Repr-Digest header (RFC 3230 / RFC 9530), if the server sent one"""
+    for name in ('repr-digest', 'digest'):
+        for part in headers.get(name, '').split(','):
+            algorithm, _, value = part.strip().partition('=')
+            if algorithm.lower() == 'sha-256' and value:
+                try:
+                    return base64.b64decode(value.strip(':')).hex()
+                except ValueError:
+                    return None
+    return None
+
+
+def is_unchanged(known: dict, response) -> bool:
+    """
+    Whether `response` to a conditional request is for the file saved with `known` validators
+    A 304 is; so is a 200 whose ETag, content digest, or Last-Modified plus Content-Length
+    match, for servers that ignore conditional headers (its body then need not be read).
+    """
+    if response.status_code == 304:
+        return True
+    if response.status_code != 200:
+        return False
+    headers = response.headers
+    etag = headers.get('etag')
+    if etag and known.get('etag'):
+        return etag.removeprefix('W/') == known['etag'].removeprefix('W/')
+    digest = _sha256_digest(headers)
+    if digest:
+        return digest == known['sha256']
+    length = headers.get('content-length')
+    return bool(known.get('last_modified') and headers.get('last-modified') == known['last_modified']
+                and length is not None and length.isdigit() and int(length) == known['size'])
+
+
+class OutputStore:
+    def __init__(self, directory: str):
+        """
+        Content-addressed index of the files in an output directory
+        Maps tab URL -> SHA-256 -> filename (relative to `directory`) in a SQLite file
+        next to the tabs, so "is this tab already saved?" is one primary-key lookup. Tabs are
+        indexed by urlinput.tab_key() too, so one saved under another of its URLs is found.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, INDEX_FILENAME)
+        self.counts = {STORED: 0, LINKED: 0, UNCHANGED: 0, REVALIDATED: 0, 'renamed': 0}
+        self.bytes_saved = 0
+        # Also serializes naming decisions, so concurrent downloads cannot pick the same name
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS tabs (
+            url TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            name TEXT NOT NULL,
+            tab_key TEXT
+        )''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS tabs_name ON tabs(name)')
+        if 'tab_key' not in {row[1] for row in self._db.execute('PRAGMA table_info(tabs)')}:
+            # An index from before tab keys: key its URLs once
+            self._db.execute('ALTER TABLE tabs ADD COLUMN tab_key TEXT')
+            urls = [row[0] for row in self._db.execute('SELECT url FROM tabs')]
+            self._db.executemany('UPDATE tabs SET tab_key = ? WHERE url = ?', ((tab_key(url), url) for url in urls))
+        self._db.execute('CREATE INDEX IF NOT EXISTS tabs_tab_key ON tabs(tab_key)')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            size INTEGER NOT NULL
+        )''')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS validators (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT
+        )''')
+        self._db.commit()
+
+    def open_writer(self) -> AtomicFileWriter:
+        """Writer for one download, to be passed back to commit()"""
+        return AtomicFileWriter(self.directory)
+
+    def _full_path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def lookup(self, url: str) -> Optional[str]:
+        """Path of the file saved for `url` (or another URL of the same tab), if it is indexed and still on disk"""
+        with self._lock:
+            row = self._db.execute('SELECT name FROM tabs WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                row = self._db.execute('SELECT name FROM tabs WHERE tab_key = ? LIMIT 1', (tab_key(url),)).fetchone()
+        if row is None or not os.path.exists(self._full_path(row[0])):
+            return None
+        return self._full_path(row[0])
+
+    def has(self, url: str) -> bool:
+        return self.lookup(url) is not None
+
+    def _indexed_url(self, url: str) -> str:
+        """The URL the tab of `url` is indexed under: `url`, else another URL with its tab key (caller holds the lock)"""
+        if self._db.execute('SELECT 1 FROM tabs WHERE url = ?', (url,)).fetchone() is None:
+            row = self._db.execute('SELECT url FROM tabs WHERE tab_key = ? LIMIT 1', (tab_key(url),)).fetchone()
+            if row is not None:
+                return row[0]
+        return url
+
+    def validators(self, url: str) -> Optional[dict]:
+        """
+        path, sha256, size, etag and last_modified of the file saved for `url` (or another URL
+        of the same tab), or None when there is none or it no longer has the size it was saved with
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT tabs.name, tabs.sha256, blobs.size, validators.etag, validators.last_modified '
+                'FROM tabs JOIN blobs ON blobs.sha256 = tabs.sha256 '
+                'LEFT JOIN validators ON validators.url = tabs.url WHERE tabs.url = ?',
+                (self._indexed_url(url),)).fetchone()
+        if row is None:
+            return None
+        path = self._full_path(row[0])
+        try:
+            if os.path.getsize(path) != row[2]:
+                return None
+        except OSError:
+            return None
+        return {'path': path, 'sha256': row[1], 'size': row[2], 'etag': row[3], 'last_modified': row[4]}
+
+    def revalidated(self, tab_url: str, validators: Optional[dict] = None) -> str:
+        """Count a tab the server confirmed unchanged, keeping any new validators; returns its path"""
+        with self._lock:
+            # validators() may have found the tab under another of its URLs
+            indexed_url = self._indexed_url(tab_url)
+            name, size = self._db.execute('SELECT tabs.name, blobs.size FROM tabs JOIN blobs '
+                                          'ON blobs.sha256 = tabs.sha256 WHERE tabs.url = ?', (indexed_url,)).fetchone()
+            self._save_validators(indexed_url, validators)
+            self._db.commit()
+            self.counts[REVALIDATED] += 1
+            self.bytes_saved += size
+        return self._full_path(name)
+
+    def _save_validators(self, tab_url: str, validators: Optional[dict]) -> None:
+        # A 304 may leave out validators that did not change
+        if validators and any(validators.values()):
+            self._db.execute('INSERT INTO validators VALUES (?, ?, ?) ON CONFLICT(url) DO UPDATE SET '
+                             'etag = COALESCE(excluded.etag, etag), '
+                             'last_modified = COALESCE(excluded.last_modified, last_modified)',
+                             (tab_url, validators.get('etag'), validators.get('last_modified')))
+
+    def _name_sha256(self, name: str) -> str:
+        """Hash of an existing file: from the index when we wrote it, else by reading it"""
+        row = self._db.execute('SELECT sha256 FROM tabs WHERE name = ? LIMIT 1', (name,)).fetchone()
+        return row[0] if row else file_sha256(self._full_path(name))
+
+    def commit(self, writer: AtomicFileWriter, filename: str, tab_url: str,
+               validators: Optional[dict] = None) -> Tuple[str, str]:
+        """
+        Place a finished download for `tab_url`; returns (path, how) where how is one of
+        STORED (written under a new name), LINKED (hard link to identical content saved for
+        another tab) or UNCHANGED (identical to what is already on disk, nothing written).
+        The writer's temporary file is always consumed.
+        validators: response_validators() of the download, replacing the tab's old ones
+        """
+        sha256 = writer.sha256
+        # fsync outside the lock: concurrent commits only wait for each other's index updates
+        writer.finish()
+        with self._lock:
+            if validators is not None:
+                self._db.execute('DELETE FROM validators WHERE url = ?', (tab_url,))
+                self._save_validators(tab_url, validators)
+            row = self._db.execute('SELECT sha256, name FROM tabs WHERE url = ?', (tab_url,)).fetchone()
+            if row is not None and os.path.exists(self._full_path(row[1])):
+                if row[0] == sha256:
+                    return self._done(writer, tab_url, row[1], UNCHANGED)
+                shared = self._db.execute('SELECT 1 FROM tabs WHERE name = ? AND url != ? LIMIT 1',
+                                          (row[1], tab_url)).fetchone()
+                if shared is None:
+                    # The tab itself was updated: replace its own file, whatever the server calls it now
+                    writer.publish(self._full_path(row[1]))
+                    return self._done(writer, tab_url, row[1], STORED)
+
+            blob = self._db.execute('SELECT name FROM blobs WHERE sha256 = ?', (sha256,)).fetchone()
+            source = self._full_path(blob[0]) if blob and os.path.exists(self._full_path(blob[0])) else None
+            for attempt, name in enumerate(candidate_names(filename, tab_url, sha256)):
+                final_path = self._full_path(name)
+                if os.path.exists(final_path):
+                    if self._name_sha256(name) == sha256:
+                        return self._done(writer, tab_url, name, UNCHANGED)
+                    continue
+                try:
+                    if source is None:
+                        writer.publish(final_path, overwrite=False)
+                    else:
+                        os.link(source, final_path)
+                except FileExistsError:
+                    # Taken since we looked (another process); try the next name
+                    continue
+                except OSError:
+                    # Hard links unsupported: point this tab at the existing copy instead
+                    return self._done(writer, tab_url, os.path.basename(source), UNCHANGED)
+                if attempt:
+                    self.counts['renamed'] += 1
+                return self._done(writer, tab_url, name, STORED if source is None else LINKED)
+        raise FileExistsError(f"no free name for {filename} in {self.directory}")
+
+    def _done(self, writer: AtomicFileWriter, tab_url: str, name: str, how: str) -> Tuple[str, str]:
+        """Index the placement (caller holds the lock) and drop whatever of the writer is left"""
+        writer.discard()
+        self._db.execute('DELETE FROM blobs WHERE name = ? AND sha256 != ?', (name, writer.sha256))
+        self._db.execute('INSERT OR REPLACE INTO tabs VALUES (?, ?, ?, ?)',
+                         (tab_url, writer.sha256, name, tab_key(tab_url)))
+        self._db.execute('INSERT OR REPLACE INTO blobs VALUES (?, ?, ?)', (writer.sha256, name, writer.size))
+        self._db.commit()
+        self.counts[how] += 1
+        if how != STORED:
+            self.bytes_saved += writer.size
+        return self._full_path(name), how
+
+    def print_stats(self) -> None:
+        print(f"🗃️  Output store: {self.counts[STORED]} written, {self.counts[LINKED]} hard-linked, "
+              f"{self.counts[UNCHANGED]} unchanged, {self.counts[REVALIDATED]} not modified on the server "
+              f"({self.bytes_saved / 1e6:.1f} MB not rewritten), {self.counts['renamed']} renamed to avoid a collision")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
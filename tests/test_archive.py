@@ -0,0 +1,108 @@
+import json
+import os
+import tarfile
+
+from archive import ArchiveStore, INDEX_SUFFIX, SPOOL_MAX_BYTES
+from storage import STORED, LINKED, UNCHANGED
+
+
+def tab_url(number: int) -> str:
+    return f'https://tabs.ultimate-guitar.com/tab/band/song-guitar-pro-{number}'
+
+
+def add(store: ArchiveStore, number: int, data: bytes):
+    writer = store.open_writer()
+    writer.write(data)
+    return store.commit(writer, f'song-{number}.gp5', tab_url(number))
+
+
+def crash(store: ArchiveStore) -> None:
+    """Drop the store's files without writing the end-of-archive blocks"""
+    store._file.close()
+    store._index.close()
+
+
+def test_reopen_after_crash_truncates_and_keeps_appending(tmp_path):
+    store = ArchiveStore(str(tmp_path))
+    add(store, 1, b'one' * 100)
+    add(store, 2, b'two' * 100)
+    archive = str(tmp_path / 'tabs-00001.tar')
+    end = os.path.getsize(archive)
+    crash(store)
+
+    # A half-written entry in the tar and a torn line in the index
+    with open(archive, 'ab') as f:
+        f.write(b'\0' * 700 + b'partial entry')
+    with open(archive + INDEX_SUFFIX, 'a', encoding='utf-8') as f:
+        f.write('{"url": "' + tab_url(3) + '", "archi')
+
+    store = ArchiveStore(str(tmp_path))
+    assert store.has(tab_url(1)) and store.has(tab_url(2))
+    assert not store.has(tab_url(3))
+    with open(archive + INDEX_SUFFIX, encoding='utf-8') as f:
+        assert [json.loads(line)['url'] for line in f] == [tab_url(1), tab_url(2)]
+
+    path, how = add(store, 3, b'three' * 100)
+    assert (path, how) == (f'{archive}:song-3.gp5', STORED)
+    store.close()
+
+    with tarfile.open(archive) as tar:
+        assert tar.getnames() == ['song-1.gp5', 'song-2.gp5', 'song-3.gp5']
+        assert tar.getmember('song-3.gp5').offset == end
+        assert tar.extractfile('song-3.gp5').read() == b'three' * 100
+    with open(archive + INDEX_SUFFIX, encoding='utf-8') as f:
+        assert [json.loads(line)['url'] for line in f] == [tab_url(1), tab_url(2), tab_url(3)]
+
+
+def test_archives_stay_within_max_bytes(tmp_path):
+    max_bytes = 256 * 1024
+    store = ArchiveStore(str(tmp_path), max_bytes=max_bytes)
+    for number in range(20):
+        add(store, number, os.urandom(20_000 + number))
+    store.close()
+
+    archives = sorted(name for name in os.listdir(tmp_path) if name.endswith('.tar'))
+    assert len(archives) > 1
+    names = []
+    for name in archives:
+        assert os.path.getsize(tmp_path / name) <= max_bytes
+        with tarfile.open(tmp_path / name) as tar:
+            names += tar.getnames()
+    assert names == [f'song-{number}.gp5' for number in range(20)]
+
+
+def test_large_entries_spool_to_disk_and_dedupe(tmp_path):
+    store = ArchiveStore(str(tmp_path))
+    data = os.urandom(SPOOL_MAX_BYTES + 1)
+    writer = store.open_writer()
+    writer.write(data)
+    assert writer._buffer._rolled
+    store.commit(writer, 'big.gp5', tab_url(1))
+    assert add(store, 2, data)[1] == LINKED
+    store.close()
+
+    with tarfile.open(tmp_path / 'tabs-00001.tar') as tar:
+        assert tar.getnames() == ['big.gp5']
+        assert tar.extractfile('big.gp5').read() == data
+
+
+def test_other_urls_of_a_tab_resolve_to_its_entry(tmp_path):
+    store = ArchiveStore(str(tmp_path))
+    writer = store.open_writer()
+    writer.write(b'tab')
+    path, _ = store.commit(writer, 'song.gp5', tab_url(1), {'etag': '"v1"'})
+    bare = 'https://tabs.ultimate-guitar.com/tab/1'
+
+    assert store.validators(bare)['etag'] == '"v1"'
+    assert store.revalidated(bare, {'etag': '"v2"'}) == path
+    assert store.validators(tab_url(1))['etag'] == store.validators(bare)['etag'] == '"v2"'
+
+    # The same content downloaded under the bare-ID URL is this tab again, not a copy of it
+    writer = store.open_writer()
+    writer.write(b'tab')
+    assert store.commit(writer, 'song.gp5', bare) == (path, UNCHANGED)
+    store.close()
+
+    reopened = ArchiveStore(str(tmp_path))
+    assert reopened.validators(bare)['etag'] == '"v2"'
+    reopened.close()
@@ -0,0 +1,100 @@
+import os
+import threading
+
+import pytest
+
+import auth
+from auth import AuthState, AuthExpiredError, AUTHENTICATED, EXPIRED, UNKNOWN, ON_EXPIRED_ABORT, ON_EXPIRED_PAUSE
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(auth, 'PROBE_POLL_INTERVAL', 0.001)
+    monkeypatch.setattr(auth, 'PAUSE_POLL_INTERVAL', 0.001)
+
+
+def test_only_one_caller_probes_until_auth_is_known():
+    state = AuthState()
+    assert state.wait() is True
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(state.wait()))
+    waiter.start()
+    waiter.join(0.05)
+    # Held back while the probe is in flight
+    assert waiter.is_alive()
+
+    state.observe_user({'id': 42, 'username': 'me'}, 'tab page')
+    state.release()
+    waiter.join(5)
+    assert results == [False]
+    assert (state.status, state.username) == (AUTHENTICATED, 'me')
+
+
+def test_inconclusive_probe_lets_the_next_caller_probe():
+    state = AuthState()
+    assert state.wait() is True
+    state.release()
+    assert state.wait() is True
+
+
+def test_auth_is_checked_once_per_session(capsys):
+    state = AuthState()
+    state.observe_user({'id': 42, 'username': 'me'}, 'tab page')
+    state.observe_unified_id('42', 'download')
+    state.observe_unified_id(None, 'download')
+    assert capsys.readouterr().out.count('Authenticated') == 1
+    assert state.wait() is False
+
+
+def test_anonymous_response_aborts_the_queue(capsys):
+    state = AuthState(ON_EXPIRED_ABORT)
+    state.observe_user({'id': 42}, 'tab page')
+    with pytest.raises(AuthExpiredError):
+        state.observe_unified_id('0', 'download')
+    assert state.expired
+    assert 'SESSION EXPIRED' in capsys.readouterr().out
+
+    with pytest.raises(AuthExpiredError):
+        state.observe_user({'id': 0}, 'tab page')
+    with pytest.raises(AuthExpiredError):
+        state.wait()
+    # Reported once, counted every time
+    assert state.anonymous_responses == 2
+    assert 'EXPIRED' not in capsys.readouterr().out
+
+
+def test_pause_without_a_cookies_file_aborts():
+    state = AuthState(ON_EXPIRED_PAUSE, cookies_file=None)
+    with pytest.raises(AuthExpiredError):
+        state.observe_user({}, 'tab page')
+    with pytest.raises(AuthExpiredError):
+        state.wait()
+
+
+def test_pause_resumes_once_the_cookies_file_changes(tmp_path):
+    cookies = tmp_path / 'cookies.json'
+    cookies.write_text('{}')
+    reloads = []
+    state = AuthState(ON_EXPIRED_PAUSE, str(cookies), lambda: reloads.append(True))
+    with pytest.raises(AuthExpiredError):
+        state.observe_user({'id': 0}, 'tab page')
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(state.wait()))
+    waiter.start()
+    waiter.join(0.05)
+    assert waiter.is_alive() and state.status == EXPIRED
+
+    cookies.write_text('{"session": "fresh"}')
+    stat = os.stat(cookies)
+    os.utime(cookies, (stat.st_atime, stat.st_mtime + 10))
+    waiter.join(5)
+    # Resumed with auth unknown again: the first caller probes it
+    assert results == [True]
+    assert reloads == [True]
+    assert state.status == UNKNOWN
+
+
+def test_invalid_mode_is_rejected():
+    with pytest.raises(ValueError):
+        AuthState('retry')
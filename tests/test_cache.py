@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+import httpx
+
+from cache import HTTPCache, AsyncCachingTransport, blob_page
+
+
+ARTIST = 'https://www.ultimate-guitar.com/artist/band_{}'
+PAGE = b'<html><div class="js-store" data-content="{&quot;a&quot;:1}"></div>' + b'x' * 1000 + b'</html>'
+
+
+def stored(cache: HTTPCache, url: str, body: bytes = b'x' * 100) -> None:
+    cache.store(url, 200, httpx.Headers({'etag': '"e"'}), body)
+
+
+def test_hits_are_not_written_until_the_next_store(tmp_path):
+    cache = HTTPCache(str(tmp_path))
+    stored(cache, ARTIST.format(1))
+    changes = cache._db.total_changes
+    assert cache.lookup(ARTIST.format(1))['fresh']
+    assert cache.lookup(ARTIST.format(1))['fresh']
+    assert cache._db.total_changes == changes
+    cache.close()
+
+
+def test_eviction_sees_deferred_hits(tmp_path):
+    cache = HTTPCache(str(tmp_path), max_bytes=250)
+    stored(cache, ARTIST.format(1))
+    stored(cache, ARTIST.format(2))
+    # The oldest entry was read since, so the other one is least recently used
+    cache.lookup(ARTIST.format(1))
+    stored(cache, ARTIST.format(3))
+
+    assert cache.lookup(ARTIST.format(1)) is not None
+    assert cache.lookup(ARTIST.format(2)) is None
+    assert cache.lookup(ARTIST.format(3)) is not None
+    cache.close()
+
+
+def test_hits_survive_a_reopen(tmp_path):
+    cache = HTTPCache(str(tmp_path), max_bytes=250)
+    stored(cache, ARTIST.format(1))
+    stored(cache, ARTIST.format(2))
+    cache.lookup(ARTIST.format(1))
+    cache.close()
+
+    cache = HTTPCache(str(tmp_path), max_bytes=250)
+    stored(cache, ARTIST.format(3))
+    assert cache.lookup(ARTIST.format(1)) is not None
+    assert cache.lookup(ARTIST.format(2)) is None
+    cache.close()
+
+
+def test_async_transport_keeps_sqlite_off_the_event_loop(tmp_path):
+    cache = HTTPCache(str(tmp_path))
+    loop_threads, db_threads = set(), set()
+    for name in ('lookup', 'store'):
+        method = getattr(cache, name)
+
+        def recorded(*args, method=method):
+            db_threads.add(threading.get_ident())
+            return method(*args)
+
+        setattr(cache, name, recorded)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=PAGE)
+
+    async def run() -> list:
+        loop_threads.add(threading.get_ident())
+        client = httpx.AsyncClient(transport=AsyncCachingTransport(httpx.MockTransport(handler), cache))
+        bodies = []
+        for _ in range(2):
+            response = await client.get(ARTIST.format(1))
+            bodies.append((response.content, response.extensions.get('from_cache', False)))
+        await client.aclose()
+        return bodies
+
+    assert asyncio.run(run()) == [(PAGE, False), (blob_page(b'{&quot;a&quot;:1}'), True)]
+    assert db_threads and not db_threads & loop_threads
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    cache.close()
@@ -0,0 +1,162 @@
+import asyncio
+import fcntl
+import json
+import multiprocessing
+import threading
+import time
+
+import httpx
+import pytest
+
+from cookiejar import (SharedCookieJar, parse_cookies, FORMAT_JSON, FORMAT_JSON_LIST, FORMAT_NETSCAPE,
+                       NETSCAPE_HEADER, HTTPONLY_PREFIX)
+from session import AsyncUGSession
+
+
+DOMAIN = '.ultimate-guitar.com'
+
+
+def server_sets(jar: SharedCookieJar, **values) -> httpx.Cookies:
+    """A session of `jar` that received Set-Cookie for `values`"""
+    cookies = httpx.Cookies()
+    jar.attach(cookies)
+    for name, value in values.items():
+        cookies.set(name, value, domain=DOMAIN)
+    jar.absorb(cookies, values)
+    return cookies
+
+
+def read_records(path) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return parse_cookies(f.read())[1]
+
+
+def test_two_writers_merge_their_changes(tmp_path):
+    path = tmp_path / 'cookies.json'
+    path.write_text(json.dumps({'session': 'old'}))
+    first, second = SharedCookieJar(str(path)), SharedCookieJar(str(path))
+
+    server_sets(first, session='new')
+    # `second` still holds the old file; its write must not undo the first one
+    server_sets(second, token='t')
+
+    assert json.loads(path.read_text()) == {'session': 'new', 'token': 't'}
+    assert first.reload()
+    assert first.values() == {'session': 'new', 'token': 't'}
+
+
+def _write_many(path: str, prefix: str, count: int) -> None:
+    jar = SharedCookieJar(path)
+    for index in range(count):
+        server_sets(jar, **{f'{prefix}{index}': str(index)})
+
+
+def test_writer_processes_do_not_lose_updates(tmp_path):
+    path = str(tmp_path / 'cookies.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'session': 'x'}, f)
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_write_many, args=(path, prefix, 10)) for prefix in 'abcd']
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    names = set(read_records(path))
+    assert names == {'session'} | {f'{prefix}{index}' for prefix in 'abcd' for index in range(10)}
+
+
+def test_deletion_survives_a_merge(tmp_path):
+    path = tmp_path / 'cookies.json'
+    path.write_text(json.dumps({'session': 's', 'stale': 'x'}))
+    jar, other = SharedCookieJar(str(path)), SharedCookieJar(str(path))
+    cookies = httpx.Cookies()
+    jar.attach(cookies)
+
+    server_sets(other, token='t')
+    # The server expired `stale` on our session
+    cookies.delete('stale')
+    jar.absorb(cookies, {'stale'})
+
+    assert json.loads(path.read_text()) == {'session': 's', 'token': 't'}
+    other.reload()
+    assert 'stale' not in other.values()
+
+
+NETSCAPE = (NETSCAPE_HEADER
+            + f'{HTTPONLY_PREFIX}{DOMAIN}\tTRUE\t/\tTRUE\t2000000000\tsession\ts\n'
+            + f'{DOMAIN}\tTRUE\t/\tFALSE\t0\tlang\ten\n')
+JSON_LIST = json.dumps([{'name': 'session', 'value': 's', 'domain': DOMAIN, 'path': '/', 'secure': True,
+                         'httpOnly': True, 'expirationDate': 2000000000},
+                        {'name': 'lang', 'value': 'en', 'domain': DOMAIN, 'path': '/'}])
+
+
+@pytest.mark.parametrize('text, file_format', [
+    (json.dumps({'session': 's', 'lang': 'en'}), FORMAT_JSON),
+    (JSON_LIST, FORMAT_JSON_LIST),
+    (NETSCAPE, FORMAT_NETSCAPE),
+])
+def test_formats_are_kept_on_write(tmp_path, text, file_format):
+    path = tmp_path / 'cookies'
+    path.write_text(text)
+    jar = SharedCookieJar(str(path))
+    assert jar.format == file_format
+    assert jar.values() == {'session': 's', 'lang': 'en'}
+
+    server_sets(jar, token='t')
+
+    assert parse_cookies(path.read_text())[0] == file_format
+    records = read_records(path)
+    assert {name: record['value'] for name, record in records.items()} == {'session': 's', 'lang': 'en', 'token': 't'}
+    if file_format != FORMAT_JSON:
+        # Attributes of the cookies we did not touch are written back as they were
+        assert records['session']['http_only'] and records['session']['secure']
+        assert records['session']['expires'] == 2000000000
+        assert records['token']['domain'] == DOMAIN
+
+
+def test_async_session_merges_cookies_off_the_event_loop(tmp_path):
+    path = tmp_path / 'cookies.json'
+    path.write_text(json.dumps({'session': 'old'}))
+    jar = SharedCookieJar(str(path))
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={'set-cookie': f'session=new; Domain={DOMAIN}; Path=/'})
+
+    async def run() -> int:
+        session = AsyncUGSession(cookie_jar=jar)
+        await session.aclose()
+        session.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        jar.attach(session.client.cookies)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        # Another process holds the cookies file lock for a while
+        locked = threading.Event()
+
+        def hold_lock():
+            with open(jar.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                locked.set()
+                time.sleep(0.3)
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        locked.wait()
+        ticking = asyncio.ensure_future(ticker())
+        await session.get('https://www.ultimate-guitar.com/')
+        holder.join()
+        ticking.cancel()
+        await session.client.aclose()
+        return ticks
+
+    # The loop kept running while the merge waited for the lock
+    assert asyncio.run(run()) >= 10
+    assert json.loads(path.read_text()) == {'session': 'new'}
@@ -0,0 +1,116 @@
+import pytest
+
+from daemon import JobManager, JobError, DONE, URL_DOWNLOADED, URL_FAILED, URL_SKIPPED
+from events import EventBus
+
+
+class FakeStore:
+    def __init__(self, saved=()):
+        self.saved = set(saved)
+
+    def has(self, url: str) -> bool:
+        return url in self.saved
+
+
+class FakeAuth:
+    expired = False
+
+
+class FakeDownloader:
+    def __init__(self, fail=(), crash=(), saved=()):
+        self.events = EventBus()
+        self.store = FakeStore(saved)
+        self.auth = FakeAuth()
+        self.refresh = False
+        self.fail, self.crash = set(fail), set(crash)
+        self.calls = []
+
+    async def download_tab_async(self, url: str, refresh=None) -> bool:
+        self.calls.append((url, refresh))
+        if url in self.crash:
+            raise RuntimeError("boom")
+        return url not in self.fail
+
+    async def aclose(self) -> None:
+        pass
+
+
+def tab(number: int) -> str:
+    return f'https://tabs.ultimate-guitar.com/tab/band/song-guitar-pro-{number}'
+
+
+@pytest.fixture
+def manager_for():
+    managers = []
+
+    def start(downloader: FakeDownloader) -> JobManager:
+        manager = JobManager(downloader, scraper=None, concurrency=2)
+        manager.start()
+        managers.append(manager)
+        return manager
+
+    yield start
+    for manager in managers:
+        manager.stop()
+
+
+def test_download_job_reports_each_url(manager_for):
+    downloader = FakeDownloader(fail=[tab(2)], saved=[tab(3)])
+    manager = manager_for(downloader)
+    job, deduplicated = manager.submit({'urls': [tab(1), tab(2), tab(3)]})
+    assert not deduplicated
+    assert job.done_event.wait(5)
+    assert job.urls == {tab(1): URL_DOWNLOADED, tab(2): URL_FAILED, tab(3): URL_SKIPPED}
+
+
+def test_worker_error_fails_the_url_and_finishes_the_job(manager_for, capsys):
+    downloader = FakeDownloader(crash=[tab(1)])
+    manager = manager_for(downloader)
+    job, _ = manager.submit({'urls': [tab(1), tab(2)]})
+    assert job.done_event.wait(5)
+    assert job.status == DONE
+    assert job.urls == {tab(1): URL_FAILED, tab(2): URL_DOWNLOADED}
+    assert 'boom' in job.reasons[tab(1)] and 'boom' in job.error
+    assert 'RuntimeError' in capsys.readouterr().err
+
+    # The worker survived: later jobs still run
+    again, _ = manager.submit({'urls': [tab(3)]})
+    assert again.done_event.wait(5)
+    assert again.urls == {tab(3): URL_DOWNLOADED}
+
+
+def test_refresh_and_force_reach_saved_tabs(manager_for):
+    downloader = FakeDownloader(saved=[tab(1)])
+    manager = manager_for(downloader)
+    job, _ = manager.submit({'urls': [tab(1)], 'refresh': True})
+    assert job.done_event.wait(5)
+    job, _ = manager.submit({'urls': [tab(1)], 'force': True})
+    assert job.done_event.wait(5)
+    assert downloader.calls == [(tab(1), True), (tab(1), False)]
+
+
+@pytest.mark.parametrize('payload', [
+    {'urls': tab(1)},
+    {'urls': [{'url': tab(1)}]},
+    {'urls': []},
+    {'type': 'scrape'},
+    {'type': 'scrape', 'artist_url': 'not a url'},
+    {'type': 'other'},
+])
+def test_malformed_jobs_are_rejected(payload):
+    manager = JobManager(FakeDownloader(), scraper=None)
+    with pytest.raises(JobError):
+        manager.submit(payload)
+
+
+def test_url_variants_are_one_job():
+    manager = JobManager(FakeDownloader(), scraper=None)
+    manager.loop.call_soon_threadsafe = lambda *args: None
+    job, _ = manager.submit({'urls': [tab(1), 'https://www.ultimate-guitar.com/tab/band/song-guitar-pro-1?x=1', '1']})
+    assert list(job.urls) == [tab(1)]
+    assert manager.submit({'urls': ['1']}) == (job, True)
+
+    scrape, _ = manager.submit({'type': 'scrape', 'artist_url': 'https://www.ultimate-guitar.com/artist/band_1'})
+    for variant in ('https://WWW.Ultimate-Guitar.com/artist/band_1/', 'https://tabs.ultimate-guitar.com/artist/band_1?page=2',
+                    'ultimate-guitar.com/artist/band_1'):
+        assert manager.submit({'type': 'scrape', 'artist_url': variant}) == (scrape, True)
@@ -0,0 +1,131 @@
+import asyncio
+import html
+import json
+
+import pytest
+
+from extract import (DataContentExtractor, DATA_CONTENT_MARKER, DEFAULT_DRAIN_LIMIT, extract_data_content,
+                     aextract_data_content, drain_limit_for, unread_bytes, _should_drain, unescape_attribute, loads)
+
+
+STORE = {'store': {'page': {'data': {'tab_view': {'binary_id': 'TOKEN'}}}}, 'note': 'a "quoted" <b>&</b>'}
+BLOB = html.escape(json.dumps(STORE), quote=True)
+PAGE = f'<html><div data-content="not json"></div><div class="js-store" data-content="{BLOB}"></div>'.encode()
+
+
+def chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, len(DATA_CONTENT_MARKER) - 1, len(DATA_CONTENT_MARKER), 7, 64, len(PAGE)])
+def test_blob_is_found_across_chunk_boundaries(size):
+    extractor = DataContentExtractor()
+    results = [extractor.feed(chunk) for chunk in chunked(PAGE, size)]
+    assert results[-1] and extractor.done
+    assert json.loads(extractor.text()) == STORE
+
+
+def test_marker_split_at_every_position():
+    for split in range(1, len(DATA_CONTENT_MARKER)):
+        extractor = DataContentExtractor()
+        assert not extractor.feed(b'<div ' + DATA_CONTENT_MARKER[:split])
+        assert extractor.feed(DATA_CONTENT_MARKER[split:] + b'{&quot;a&quot;:1}">')
+        assert extractor.text() == '{"a":1}'
+
+
+def test_non_blob_data_content_is_skipped():
+    extractor = DataContentExtractor()
+    assert not extractor.feed(b'<a data-content="menu">x</a><b data-content="{unfinished')
+    assert extractor.feed(b'}">')
+    assert extractor.blob == b'{unfinished}'
+
+
+def test_page_without_blob():
+    extractor = DataContentExtractor()
+    assert not any(extractor.feed(chunk) for chunk in chunked(b'<html>' + b'x' * 1000 + b'</html>', 100))
+    assert extractor.text() is None
+    # Only a possible marker prefix is buffered, never the page
+    assert len(extractor._buffer) < len(DATA_CONTENT_MARKER)
+
+
+def test_reading_stops_at_the_blob():
+    tail = [b'x' * 100] * 10
+    chunks = iter(chunked(PAGE, 50) + tail)
+    assert json.loads(extract_data_content(chunks, drain_limit=0)) == STORE
+    assert len(list(chunks)) == len(tail)
+
+
+class FakeResponse:
+    def __init__(self, http_version: str = 'HTTP/1.1', content_length=None, downloaded: int = 0):
+        self.http_version = http_version
+        self.headers = {} if content_length is None else {'content-length': str(content_length)}
+        self.num_bytes_downloaded = downloaded
+
+
+def test_drain_limit_for():
+    assert drain_limit_for(FakeResponse()) == DEFAULT_DRAIN_LIMIT
+    assert drain_limit_for(FakeResponse(), 1024) == 1024
+    assert drain_limit_for(FakeResponse('HTTP/2'), 1024) == 0
+
+
+def test_unread_bytes():
+    assert unread_bytes(FakeResponse(content_length=1000, downloaded=400)) == 600
+    assert unread_bytes(FakeResponse(content_length=1000, downloaded=1200)) == 0
+    assert unread_bytes(FakeResponse()) is None
+
+
+@pytest.mark.parametrize('drain_limit, unread, drain', [
+    (0, None, False),
+    (0, lambda: 10, False),
+    (100, None, True),
+    (100, lambda: 100, True),
+    (100, lambda: 101, False),
+    (100, lambda: None, False),
+])
+def test_should_drain(drain_limit, unread, drain):
+    assert _should_drain(drain_limit, unread) is drain
+
+
+@pytest.mark.parametrize('left, drained', [(300, True), (301, False)])
+def test_rest_of_page_is_drained_only_when_small(left, drained):
+    tail = [b'x' * 100] * 3 + ([b'x'] if left > 300 else [])
+
+    def run_sync():
+        chunks = iter([PAGE] + tail)
+        extract_data_content(chunks, drain_limit=300, unread=lambda: left)
+        return list(chunks)
+
+    async def run_async():
+        rest = list(tail)
+
+        async def chunks():
+            yield PAGE
+            while rest:
+                yield rest.pop(0)
+
+        await aextract_data_content(chunks(), drain_limit=300, unread=lambda: left)
+        return rest
+
+    assert (run_sync() == []) is drained
+    assert (asyncio.run(run_async()) == []) is drained
+
+
+@pytest.mark.parametrize('value', [
+    '{&quot;a&quot;:&quot;b&quot;}',
+    'it&#039;s &#39;quoted&#39; &#x27;thrice&#x27;',
+    '&lt;b&gt;bold&lt;/b&gt; &amp;amp; &amp;quot;',
+    'caf&eacute; &copy; &#233; &nbsp;',
+    '&amp;eacute; &ampx &amp',
+    'no entities at all',
+    '',
+])
+def test_unescape_attribute_matches_html_unescape(value):
+    assert unescape_attribute(value) == html.unescape(value)
+
+
+def test_unescaped_blob_decodes_like_the_json_module():
+    extractor = DataContentExtractor()
+    extractor.feed(PAGE)
+    assert loads(extractor.text()) == json.loads(html.unescape(BLOB)) == STORE
+    with pytest.raises(json.JSONDecodeError):
+        loads('{"a": ')
@@ -0,0 +1,116 @@
+import sqlite3
+
+import pytest
+
+from journal import JobJournal, PENDING, TOKEN_FETCHED, DOWNLOADED, FAILED
+from main import plan_batch, stream_batch, JOURNAL_CHUNK
+
+
+def tab(number: int) -> str:
+    return f'https://tabs.ultimate-guitar.com/tab/band/song-guitar-pro-{number}'
+
+
+class FakeStore:
+    def __init__(self, saved=()):
+        self.saved = set(saved)
+
+    def has(self, url: str) -> bool:
+        return url in self.saved
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = JobJournal(str(tmp_path / 'in.txt.journal.sqlite'))
+    yield journal
+    journal.close()
+
+
+def test_states_survive_a_reopen(tmp_path):
+    path = str(tmp_path / 'journal.sqlite')
+    with JobJournal(path) as journal:
+        journal.add_pending([tab(1), tab(2), tab(3)])
+        journal.record(tab(1), DOWNLOADED, path='output/one.gp5', sha256='abc')
+        journal.record(tab(2), FAILED, reason='HTTP 404')
+        journal.record(tab(3), TOKEN_FETCHED)
+
+    with JobJournal(path) as journal:
+        assert [journal.state(tab(n)) for n in (1, 2, 3, 4)] == [DOWNLOADED, FAILED, TOKEN_FETCHED, None]
+        assert journal.counts() == {PENDING: 0, TOKEN_FETCHED: 1, DOWNLOADED: 1, FAILED: 1}
+        # Registering the batch again keeps what was recorded
+        journal.add_pending([tab(1), tab(4)])
+        assert journal.state(tab(1)) == DOWNLOADED
+        assert journal.urls_in_state(PENDING) == [tab(4)]
+
+
+def test_plan_without_resume_downloads_everything(journal):
+    journal.add_pending([tab(1)])
+    journal.record(tab(1), DOWNLOADED)
+    assert plan_batch(journal, [tab(1), tab(2)]) == ([tab(1), tab(2)], 0)
+    assert journal.state(tab(2)) == PENDING
+
+
+def test_resume_skips_tabs_done_in_the_journal_or_the_store(journal):
+    journal.add_pending([tab(1), tab(2)])
+    journal.record(tab(1), DOWNLOADED)
+    journal.record(tab(2), FAILED, reason='timeout')
+    urls = [tab(1), tab(2), tab(3), tab(4)]
+
+    todo, skipped = plan_batch(journal, urls, resume=True, store=FakeStore([tab(4)]))
+    assert (todo, skipped) == ([tab(2), tab(3)], 2)
+
+
+def test_resume_knows_a_tab_under_its_other_urls(journal):
+    journal.record('https://tabs.ultimate-guitar.com/tab/1', DOWNLOADED)
+    variant = 'https://www.ultimate-guitar.com/tab/other/name-guitar-pro-1?page=2'
+    assert journal.is_done(tab(1)) and journal.is_done(variant)
+    assert plan_batch(journal, [tab(1), tab(2)], resume=True) == ([tab(2)], 1)
+
+
+def test_retry_failed_picks_only_failed_urls_in_order(journal):
+    journal.add_pending([tab(n) for n in range(1, 6)])
+    for n in (4, 2):
+        journal.record(tab(n), FAILED, reason='HTTP 503')
+    journal.record(tab(1), DOWNLOADED)
+
+    assert journal.urls_in_state(FAILED) == [tab(2), tab(4)]
+    todo, skipped = plan_batch(journal, [tab(n) for n in range(1, 6)], retry_failed=True)
+    assert (todo, skipped) == ([tab(2), tab(4)], 3)
+
+
+def test_stream_batch_registers_urls_in_chunks(journal):
+    urls = [tab(n) for n in range(JOURNAL_CHUNK + 10)]
+    stream = stream_batch(journal, urls)
+    first = [next(stream) for _ in range(JOURNAL_CHUNK)]
+    assert first == urls[:JOURNAL_CHUNK]
+    assert journal.counts()[PENDING] == JOURNAL_CHUNK
+
+    assert list(stream) == urls[JOURNAL_CHUNK:]
+    assert journal.counts()[PENDING] == len(urls)
+
+
+def test_stream_batch_resume_counts_skips(journal):
+    journal.record(tab(1), DOWNLOADED)
+    counts = {}
+    urls = list(stream_batch(journal, [tab(1), tab(2), tab(3)], resume=True, store=FakeStore([tab(3)]), counts=counts))
+    assert urls == [tab(2)]
+    assert counts == {'skipped': 2}
+
+
+def test_stream_batch_registers_what_was_read_when_stopped(journal):
+    stream = stream_batch(journal, [tab(n) for n in range(10)])
+    assert [next(stream) for _ in range(3)] == [tab(0), tab(1), tab(2)]
+    stream.close()
+    assert journal.urls_in_state(PENDING) == [tab(0), tab(1), tab(2)]
+
+
+def test_journal_without_tab_keys_is_migrated(tmp_path):
+    path = str(tmp_path / 'old.sqlite')
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE jobs (url TEXT PRIMARY KEY, state TEXT NOT NULL, path TEXT, sha256 TEXT, '
+               'reason TEXT, updated_at REAL NOT NULL)')
+    db.execute('INSERT INTO jobs VALUES (?, ?, NULL, NULL, NULL, 0)', (tab(7), DOWNLOADED))
+    db.commit()
+    db.close()
+
+    with JobJournal(path) as journal:
+        assert journal.is_done('https://tabs.ultimate-guitar.com/tab/7')
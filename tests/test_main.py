@@ -0,0 +1,148 @@
+import html
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+from archive import ArchiveStore
+from events import EventBus, TabNotice, TabFailed, TabDownloaded
+from main import UGDownloader, NO_BLOB_NOTICE, download_batch
+from ratelimit import RateController
+from storage import OutputStore, STORED, UNCHANGED, REVALIDATED
+
+
+BASE = 'https://ug.test'
+TAB = f'{BASE}/tab/band/song-guitar-pro-111'
+
+
+def tab_page(tab_view: dict) -> bytes:
+    store = {'store': {'user': {'id': 4242}, 'page': {'data': {'tab_view': tab_view}}}}
+    return f'<div class="js-store" data-content="{html.escape(json.dumps(store), quote=True)}"></div>'.encode()
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    def handle(self, event) -> None:
+        self.events.append(event)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def downloader_for(tmp_path, monkeypatch):
+    # Diagnostics used to be dumped into the working directory
+    monkeypatch.chdir(tmp_path)
+    downloaders = []
+
+    def start(handler):
+        recorder = Recorder()
+        downloader = UGDownloader(base_url=BASE, store=OutputStore(str(tmp_path / 'output')),
+                                  events=EventBus([recorder]))
+        downloader.session.client = httpx.Client(transport=httpx.MockTransport(handler))
+        downloaders.append(downloader)
+        return downloader, recorder
+
+    yield start
+    for downloader in downloaders:
+        downloader.close()
+    assert sorted(os.listdir(tmp_path)) == ['output']
+
+
+def notices(recorder: Recorder) -> list:
+    return [event.message for event in recorder.events if isinstance(event, TabNotice)]
+
+
+def failures(recorder: Recorder) -> list:
+    return [event.reason for event in recorder.events if isinstance(event, TabFailed)]
+
+
+def test_page_without_blob_is_reported_as_an_event(downloader_for):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        return httpx.Response(200, html=('<html>' + 'x' * 1000 + '</html>'))
+
+    downloader, recorder = downloader_for(handler)
+    assert not downloader.download_tab(TAB)
+    assert NO_BLOB_NOTICE in notices(recorder)
+    assert failures(recorder) == ['no data-content blob on page']
+    # The page is not fetched a second time for a debug dump
+    assert requests == ['/tab/band/song-guitar-pro-111']
+
+
+def test_page_without_token_lists_the_keys(downloader_for):
+    downloader, recorder = downloader_for(lambda request: httpx.Response(200, content=tab_page({'title': 'x'})))
+    assert not downloader.download_tab(TAB)
+    assert any("'binary_id'" in message and "['title']" in message for message in notices(recorder))
+    assert failures(recorder) == ['no binary_id in page data']
+
+
+def test_html_instead_of_file_is_reported_as_an_event(downloader_for):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == '/tab/download':
+            return httpx.Response(200, html='<html>log in</html>', headers={'x-ug-unified-id': '4242'})
+        return httpx.Response(200, content=tab_page({'binary_id': 'TOKEN'}))
+
+    downloader, recorder = downloader_for(handler)
+    assert not downloader.download_tab(TAB)
+    assert any('instead of file' in message and 'x-ug-unified-id: 4242' in message for message in notices(recorder))
+    assert failures(recorder) == ['got HTML instead of file']
+
+
+@pytest.fixture(scope='module')
+def mock_site():
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+    from mock_ug_server import MockUGServer, MockConfig
+
+    server = MockUGServer(MockConfig(page_kb=8, file_kb=4))
+    yield server.start(), server
+    server.shutdown()
+    server.server_close()
+
+
+def download_all(base: str, store_type, urls: list, refresh: bool = False) -> tuple:
+    """One run of main.py over `urls`, into ./output; the downloader closes its store"""
+    recorder = Recorder()
+    downloader = UGDownloader(base_url=base, store=store_type('output'), events=EventBus([recorder]), refresh=refresh,
+                              rate_controller=RateController(1000, 1000))
+    success, failed = download_batch(downloader, urls, concurrency=4)
+    downloader.close()
+    how = [event.how for event in recorder.events if isinstance(event, TabDownloaded)]
+    return success, failed, how, downloader.metrics_snapshot()['counters']
+
+
+@pytest.mark.parametrize('store_type, first_id', [(OutputStore, 100), (ArchiveStore, 200)])
+def test_refresh_revalidates_saved_tabs_without_transferring_them(mock_site, tmp_path, monkeypatch,
+                                                                  store_type, first_id):
+    monkeypatch.chdir(tmp_path)
+    base, server = mock_site
+    ids = range(first_id, first_id + 6)
+    urls = [f'{base}/tab/band/song-guitar-pro-{tab_id}' for tab_id in ids]
+
+    assert download_all(base, store_type, urls)[:3] == (6, [], [STORED] * 6)
+    # Without refresh a saved tab is transferred again, only to find it unchanged
+    downloads = server.counts['downloads']
+    assert download_all(base, store_type, urls)[:3] == (6, [], [UNCHANGED] * 6)
+    assert server.counts['downloads'] == downloads + 6
+
+    downloads = server.counts['downloads']
+    not_modified = server.counts.get('not_modified', 0)
+    success, failed, how, counters = download_all(base, store_type, urls, refresh=True)
+    assert (success, failed, how) == (6, [], [REVALIDATED] * 6)
+    assert counters['files_revalidated'] == 6
+    assert server.counts['not_modified'] - not_modified == 6
+    assert server.counts['downloads'] == downloads
+
+    # A tab saved under its full URL is revalidated under its bare-ID URL too
+    bare = [f'{base}/tab/{tab_id}' for tab_id in ids[:2]]
+    assert download_all(base, store_type, bare, refresh=True)[:3] == (2, [], [REVALIDATED] * 2)
+    assert server.counts['downloads'] == downloads
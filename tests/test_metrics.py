@@ -0,0 +1,33 @@
+from metrics import Metrics, percentile, to_prometheus
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 0.5) == 50.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_small_runs_are_exact():
+    metrics = Metrics()
+    for ms in range(1, 101):
+        metrics.observe('ttfb', ms / 1000)
+    ttfb = metrics.snapshot()['phases']['ttfb']
+    assert ttfb['count'] == 100
+    assert round(ttfb['sum'], 6) == 5.05
+    assert (ttfb['p50'], ttfb['p99']) == (0.05, 0.099)
+
+
+def test_timings_stay_bounded_with_exact_totals():
+    metrics = Metrics(reservoir_size=500)
+    for i in range(50_000):
+        metrics.observe('body', (i % 1000) / 1000)
+
+    assert len(metrics._timings['body'].samples) == 500
+    body = metrics.snapshot()['phases']['body']
+    assert body['count'] == 50_000
+    assert round(body['sum'], 3) == 50 * 499.5
+    # A uniform sample of a uniform spread keeps the percentiles close
+    assert abs(body['p50'] - 0.5) < 0.1
+    assert body['p99'] > 0.9
+    assert 'ugdl_phase_seconds_count{phase="body"} 50000' in to_prometheus(metrics.snapshot())
@@ -0,0 +1,107 @@
+import email.utils
+import time
+
+import httpx
+import pytest
+
+import ratelimit
+from ratelimit import (RateController, parse_retry_after, SLOW_START_FACTOR, RATE_INCREASE, RATE_DECREASE,
+                       BACKOFF_COOLDOWN, MAX_RETRY_AFTER)
+
+
+HOST = 'tabs.ultimate-guitar.com'
+OK = httpx.Headers()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, 'monotonic', clock)
+    return clock
+
+
+def rate(controller: RateController, host: str = HOST) -> float:
+    return controller._buckets[host].rate
+
+
+def test_burst_then_paced(clock):
+    controller = RateController(rate=4, burst=2)
+    delays = [controller.reserve(HOST) for _ in range(4)]
+    assert delays == [0.0, 0.0, 0.25, 0.5]
+    # Other hosts have their own budget
+    assert controller.reserve('www.ultimate-guitar.com') == 0.0
+
+
+def test_slow_start_then_additive_increase(clock):
+    controller = RateController(rate=4, max_rate=16)
+    controller.observe(HOST, 200, OK)
+    assert rate(controller) == pytest.approx(4 * SLOW_START_FACTOR)
+
+    controller.observe(HOST, 429, OK)
+    backed_off = 4 * SLOW_START_FACTOR * RATE_DECREASE
+    assert rate(controller) == pytest.approx(backed_off)
+    controller.observe(HOST, 200, OK)
+    assert rate(controller) == pytest.approx(backed_off + RATE_INCREASE)
+
+
+def test_rate_stays_within_bounds(clock):
+    controller = RateController(rate=4, max_rate=5, min_rate=1)
+    for _ in range(100):
+        controller.observe(HOST, 200, OK)
+    assert rate(controller) == 5
+    for _ in range(10):
+        clock.now += BACKOFF_COOLDOWN
+        controller.observe(HOST, 503, OK)
+    assert rate(controller) == 1
+
+
+def test_in_flight_throttles_back_off_once(clock, capsys):
+    controller = RateController(rate=8)
+    for _ in range(5):
+        controller.observe(HOST, 429, OK)
+    assert rate(controller) == 8 * RATE_DECREASE
+    assert controller._buckets[HOST].backoffs == 1
+    assert capsys.readouterr().out.count('throttled') == 1
+
+    clock.now += BACKOFF_COOLDOWN
+    controller.observe(HOST, 429, OK)
+    assert rate(controller) == 8 * RATE_DECREASE ** 2
+
+
+def test_server_errors_other_than_503_do_not_adapt(clock):
+    controller = RateController(rate=4)
+    controller.observe(HOST, 500, OK)
+    assert rate(controller) == 4
+
+
+def test_retry_after_blocks_the_host(clock):
+    controller = RateController(rate=4, burst=2)
+    controller.observe(HOST, 429, httpx.Headers({'Retry-After': '30'}))
+    # No token is handed out before the pause ends, and requests then resume at the new rate
+    interval = 1 / rate(controller)
+    assert controller.reserve(HOST) == pytest.approx(30 + interval)
+    assert controller.reserve(HOST) == pytest.approx(30 + 2 * interval)
+    assert controller.reserve('www.ultimate-guitar.com') == 0.0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('12') == 12
+    assert parse_retry_after('99999') == MAX_RETRY_AFTER
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    in_a_minute = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert 55 <= parse_retry_after(in_a_minute) <= 60
+    assert parse_retry_after(email.utils.formatdate(time.time() - 60, usegmt=True)) == 0
+
+
+def test_invalid_rates_are_rejected():
+    with pytest.raises(ValueError):
+        RateController(rate=0)
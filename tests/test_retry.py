@@ -0,0 +1,160 @@
+import asyncio
+
+import httpx
+import pytest
+
+import retry
+from retry import CircuitBreaker, RetryPolicy, is_transient
+from main import TabDownloadError
+
+
+def status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request('GET', 'https://www.ultimate-guitar.com/')
+    return httpx.HTTPStatusError('error', request=request, response=httpx.Response(status, request=request))
+
+
+@pytest.mark.parametrize('error, transient', [
+    (status_error(429), True),
+    (status_error(500), True),
+    (status_error(503), True),
+    (status_error(404), False),
+    (status_error(403), False),
+    (httpx.ReadTimeout('timed out'), True),
+    (httpx.ConnectError('refused'), True),
+    (httpx.RemoteProtocolError('server disconnected'), True),
+    (TabDownloadError('no binary_id in page data'), False),
+    (TabDownloadError('HTTP 503', transient=True), True),
+    (ValueError('bad'), False),
+])
+def test_is_transient(error, transient):
+    assert is_transient(error) is transient
+
+
+def test_backoff_is_capped_exponential_with_full_jitter(monkeypatch):
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+    monkeypatch.setattr(retry.random, 'uniform', lambda low, high: high)
+    assert [policy.backoff(n) for n in range(5)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+    monkeypatch.setattr(retry.random, 'uniform', lambda low, high: low)
+    assert policy.backoff(3) == 0
+
+
+class Flaky:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self, value):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return value
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    delays = []
+    monkeypatch.setattr(retry.time, 'sleep', delays.append)
+    return delays
+
+
+def test_transient_errors_are_retried(no_sleep, capsys):
+    policy = RetryPolicy(retries=3, base_delay=0.0, breaker=CircuitBreaker(0))
+    fn = Flaky(httpx.ReadTimeout('t'), status_error(503))
+    assert policy.call(fn, 'ok') == 'ok'
+    assert (fn.calls, policy.retried) == (3, 2)
+    assert capsys.readouterr().out.count('retrying') == 2
+
+
+def test_permanent_errors_fail_at_once(no_sleep):
+    policy = RetryPolicy(retries=3, breaker=CircuitBreaker(0))
+    fn = Flaky(status_error(404))
+    with pytest.raises(httpx.HTTPStatusError):
+        policy.call(fn, 'ok')
+    assert (fn.calls, policy.retried, no_sleep) == (1, 0, [])
+
+
+def test_last_error_is_raised_when_retries_run_out(no_sleep):
+    policy = RetryPolicy(retries=2, base_delay=0.0, breaker=CircuitBreaker(0))
+    fn = Flaky(*[httpx.ConnectError(str(n)) for n in range(5)])
+    with pytest.raises(httpx.ConnectError, match='2'):
+        policy.call(fn, 'ok')
+    assert fn.calls == 3
+
+
+def test_async_calls_retry_the_same_way(monkeypatch):
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(retry.asyncio, 'sleep', no_sleep)
+    policy = RetryPolicy(retries=1, base_delay=0.0, breaker=CircuitBreaker(0))
+    fn = Flaky(httpx.ReadTimeout('t'))
+
+    async def attempt(value):
+        return fn(value)
+
+    assert asyncio.run(policy.call_async(attempt, 'ok')) == 'ok'
+    assert fn.calls == 2
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(retry.time, 'monotonic', clock)
+    return clock
+
+
+def test_breaker_trips_when_failures_spike(clock, capsys):
+    breaker = CircuitBreaker(threshold=0.5, window=4, cooldown=30)
+    for ok in (True, False, True):
+        breaker.record(ok)
+    assert breaker.remaining() == 0
+    breaker.record(False)
+    assert breaker.trips == 1
+    assert breaker.remaining() == 30
+    assert 'pausing the batch for 30s' in capsys.readouterr().out
+
+    clock.now += 30
+    assert breaker.remaining() == 0
+
+
+def test_breaker_needs_a_full_window_and_can_be_disabled(clock):
+    breaker = CircuitBreaker(threshold=0.5, window=4)
+    for _ in range(3):
+        breaker.record(False)
+    assert breaker.trips == 0
+
+    disabled = CircuitBreaker(threshold=0, window=4)
+    for _ in range(10):
+        disabled.record(False)
+    assert disabled.trips == 0 and disabled.remaining() == 0
+
+
+def test_breaker_does_not_trip_again_while_open(clock):
+    breaker = CircuitBreaker(threshold=0.5, window=2, cooldown=30)
+    breaker.record(False)
+    breaker.record(False)
+    clock.now += 10
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.trips == 1
+    assert breaker.remaining() == 20
+
+
+def test_transient_failures_feed_the_breaker(no_sleep, clock):
+    breaker = CircuitBreaker(threshold=0.5, window=2, cooldown=30)
+    policy = RetryPolicy(retries=1, base_delay=0.0, breaker=breaker)
+    with pytest.raises(httpx.ReadTimeout):
+        policy.call(Flaky(httpx.ReadTimeout('a'), httpx.ReadTimeout('b')), 'ok')
+    assert breaker.trips == 1
+
+    # The next call waits for the breaker to close
+    assert policy.call(Flaky(), 'ok') == 'ok'
+    assert no_sleep[-1] == 30
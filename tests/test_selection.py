@@ -0,0 +1,56 @@
+import pytest
+
+from selection import BestVersions, song_key
+
+
+def entry(url: str, song: str = 'Song', artist: str = 'Band', **fields) -> dict:
+    return dict(url=url, song_name=song, artist_name=artist, **fields)
+
+
+VERSIONS = [
+    entry('v1', rating=4.5, votes=10, version=1, date=100),
+    entry('v2', rating=4.9, votes=3, version=2, date=300),
+    entry('v3', rating=4.5, votes=50, version=3, date=200),
+    entry('other', song='Other Song', rating=1.0),
+]
+
+
+def urls(tabs) -> list:
+    return [tab['url'] for tab in tabs]
+
+
+@pytest.mark.parametrize('policy, keep, expected', [
+    ('rating', 1, ['v2', 'other']),
+    ('rating', 2, ['v2', 'v3', 'other']),
+    ('latest', 1, ['v3', 'other']),
+    ('votes', 1, ['v3', 'other']),
+    ('votes', 5, ['v1', 'v2', 'v3', 'other']),
+])
+def test_best_versions_per_song_in_listing_order(policy, keep, expected):
+    assert urls(BestVersions(keep, policy).select(VERSIONS)) == expected
+
+
+def test_songs_are_grouped_ignoring_case_and_spacing():
+    assert song_key(entry('a', song='  The   Song ', artist='BAND')) == song_key(entry('b', song='the song'))
+    tabs = [entry('a', song='The  Song', rating=3), entry('b', song='the song', rating=5),
+            entry('c', song='The Song', artist='Other Band', rating=1)]
+    assert urls(BestVersions(1).select(tabs)) == ['b', 'c']
+
+
+def test_ties_and_missing_fields_keep_listing_order():
+    tabs = [entry('first', rating='n/a'), entry('second'), entry('third', rating=None)]
+    assert urls(BestVersions(1).select(tabs)) == ['first']
+    assert urls(BestVersions(2, 'latest').select(tabs)) == ['first', 'second']
+
+
+def test_counts_accumulate_across_pages():
+    best = BestVersions(1)
+    best.select(VERSIONS)
+    best.select([entry('x'), entry('y')])
+    assert (best.seen, best.kept) == (6, 3)
+    assert best.describe() == 'best 1 per song by rating'
+
+
+def test_invalid_policy_is_rejected():
+    with pytest.raises(ValueError):
+        BestVersions(1, 'newest')
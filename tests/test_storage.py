@@ -0,0 +1,199 @@
+import base64
+import hashlib
+import os
+import sqlite3
+import threading
+
+import httpx
+import pytest
+
+import storage
+from storage import OutputStore, is_unchanged, STORED, LINKED, UNCHANGED
+
+
+TAB_A = 'https://tabs.ultimate-guitar.com/tab/band/song-guitar-pro-111'
+TAB_B = 'https://tabs.ultimate-guitar.com/tab/band/song-live-guitar-pro-222'
+
+
+def writer_for(store: OutputStore, data: bytes):
+    writer = store.open_writer()
+    writer.write(data)
+    return writer
+
+
+def read(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = OutputStore(str(tmp_path / 'output'))
+    yield store
+    store.close()
+
+
+def test_identical_content_is_hard_linked(store):
+    path_a, how_a = store.commit(writer_for(store, b'same'), 'a.gp5', TAB_A)
+    path_b, how_b = store.commit(writer_for(store, b'same'), 'b.gp5', TAB_B)
+
+    assert (how_a, how_b) == (STORED, LINKED)
+    assert os.path.basename(path_b) == 'b.gp5'
+    assert os.stat(path_a).st_ino == os.stat(path_b).st_ino
+    assert store.bytes_saved == 4
+    assert not [name for name in os.listdir(store.directory) if name.endswith(storage.PARTIAL_SUFFIX)]
+
+
+def test_link_fallback_points_at_existing_copy(store, monkeypatch):
+    path_a, _ = store.commit(writer_for(store, b'same'), 'a.gp5', TAB_A)
+
+    def no_links(source, target):
+        raise PermissionError("hard links not supported")
+
+    monkeypatch.setattr(storage.os, 'link', no_links)
+    path_b, how = store.commit(writer_for(store, b'same'), 'b.gp5', TAB_B)
+
+    assert how == UNCHANGED
+    assert path_b == path_a
+    assert store.lookup(TAB_B) == path_a
+    assert not os.path.exists(os.path.join(store.directory, 'b.gp5'))
+
+
+def test_publish_without_links_still_refuses_taken_names(tmp_path, monkeypatch):
+    def no_links(source, target):
+        raise PermissionError("hard links not supported")
+
+    monkeypatch.setattr(storage.os, 'link', no_links)
+    store = OutputStore(str(tmp_path))
+    path, how = store.commit(writer_for(store, b'first'), 'song.gp5', TAB_A)
+    assert (os.path.basename(path), how) == ('song.gp5', STORED)
+    path, how = store.commit(writer_for(store, b'second'), 'song.gp5', TAB_B)
+    assert os.path.basename(path) == 'song (222).gp5'
+    assert read(os.path.join(str(tmp_path), 'song.gp5')) == b'first'
+    store.close()
+
+
+def test_collision_names_are_deterministic(store):
+    store.commit(writer_for(store, b'first'), 'song.gp5', TAB_A)
+    path, how = store.commit(writer_for(store, b'second'), 'song.gp5', TAB_B)
+    assert (os.path.basename(path), how) == ('song (222).gp5', STORED)
+    assert store.counts['renamed'] == 1
+
+    # The same download again lands on the same name, without a new file
+    again, how = store.commit(writer_for(store, b'second'), 'song.gp5', TAB_B)
+    assert (again, how) == (path, UNCHANGED)
+
+
+def test_collision_with_tab_id_name_adds_the_hash(store):
+    store.commit(writer_for(store, b'first'), 'song.gp5', TAB_A)
+    # A file we did not write already holds the tab-ID name
+    with open(os.path.join(store.directory, 'song (222).gp5'), 'wb') as f:
+        f.write(b'not ours')
+
+    data = b'second'
+    path, how = store.commit(writer_for(store, data), 'song.gp5', TAB_B)
+    assert how == STORED
+    assert os.path.basename(path) == f"song (222-{hashlib.sha256(data).hexdigest()[:12]}).gp5"
+    assert read(os.path.join(store.directory, 'song (222).gp5')) == b'not ours'
+
+
+def test_name_taken_during_commit_moves_to_next_name(store, monkeypatch):
+    real_link = os.link
+    taken = os.path.join(store.directory, 'song.gp5')
+
+    def racing_link(source, target):
+        # Another process creates the name between our existence check and the link
+        if target == taken and not os.path.exists(taken):
+            with open(taken, 'wb') as f:
+                f.write(b'other process')
+        return real_link(source, target)
+
+    monkeypatch.setattr(storage.os, 'link', racing_link)
+    path, how = store.commit(writer_for(store, b'ours'), 'song.gp5', TAB_A)
+
+    assert (os.path.basename(path), how) == ('song (111).gp5', STORED)
+    assert read(taken) == b'other process'
+    assert read(path) == b'ours'
+
+
+def test_concurrent_commits_never_share_a_name(store):
+    urls = [f'https://tabs.ultimate-guitar.com/tab/band/song-guitar-pro-{i}' for i in range(8)]
+    results = {}
+    barrier = threading.Barrier(len(urls))
+
+    def commit(index: int, url: str) -> None:
+        writer = writer_for(store, f'content {index}'.encode())
+        barrier.wait()
+        results[url] = store.commit(writer, 'song.gp5', url)
+
+    threads = [threading.Thread(target=commit, args=(i, url)) for i, url in enumerate(urls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    paths = [path for path, _ in results.values()]
+    assert len(set(paths)) == len(urls)
+    for i, url in enumerate(urls):
+        assert read(results[url][0]) == f'content {i}'.encode()
+
+
+def test_updated_tab_replaces_its_own_file(store):
+    path, _ = store.commit(writer_for(store, b'v1'), 'song.gp5', TAB_A)
+    updated, how = store.commit(writer_for(store, b'v2'), 'song-renamed.gp5', TAB_A)
+    assert (updated, how) == (path, STORED)
+    assert read(path) == b'v2'
+
+
+def response(status: int, **headers) -> httpx.Response:
+    return httpx.Response(status, headers={name.replace('_', '-'): value for name, value in headers.items()})
+
+
+KNOWN = {'etag': '"abc"', 'last_modified': 'Mon, 01 Jan 2024 00:00:00 GMT', 'size': 4,
+         'sha256': hashlib.sha256(b'same').hexdigest()}
+
+
+@pytest.mark.parametrize('resp, unchanged', [
+    (response(304), True),
+    (response(200, etag='W/"abc"'), True),
+    (response(200, etag='"other"'), False),
+    (response(200, digest='sha-256=' + base64.b64encode(hashlib.sha256(b'same').digest()).decode()), True),
+    (response(200, last_modified=KNOWN['last_modified'], content_length='4'), True),
+    (response(200, last_modified=KNOWN['last_modified'], content_length='5'), False),
+    (response(200), False),
+    (response(404, etag='"abc"'), False),
+])
+def test_is_unchanged(resp, unchanged):
+    assert is_unchanged(KNOWN, resp) is unchanged
+
+
+def test_tab_is_found_under_its_other_urls(store):
+    store.commit(writer_for(store, b'tab'), 'song.gp5', TAB_A)
+    assert store.has('https://tabs.ultimate-guitar.com/tab/111')
+    assert store.has('https://www.ultimate-guitar.com/tab/other/name-guitar-pro-111/?page=2')
+    assert not store.has('https://tabs.ultimate-guitar.com/tab/222')
+
+
+def test_index_without_tab_keys_is_migrated(tmp_path):
+    db = sqlite3.connect(str(tmp_path / storage.INDEX_FILENAME))
+    db.execute('CREATE TABLE tabs (url TEXT PRIMARY KEY, sha256 TEXT NOT NULL, name TEXT NOT NULL)')
+    db.execute('INSERT INTO tabs VALUES (?, ?, ?)', (TAB_A, 'old', 'song.gp5'))
+    db.commit()
+    db.close()
+    (tmp_path / 'song.gp5').write_bytes(b'tab')
+
+    store = OutputStore(str(tmp_path))
+    assert store.lookup('https://tabs.ultimate-guitar.com/tab/111') == str(tmp_path / 'song.gp5')
+    store.close()
+
+
+def test_validators_and_revalidation_follow_the_tab_key(store):
+    store.commit(writer_for(store, b'same'), 'song.gp5', TAB_A, {'etag': '"v1"'})
+    bare = 'https://tabs.ultimate-guitar.com/tab/111'
+
+    known = store.validators(bare)
+    assert known is not None and known['etag'] == '"v1"'
+    path = store.revalidated(bare, {'etag': '"v2"', 'last_modified': None})
+    assert path == known['path']
+    assert store.validators(TAB_A)['etag'] == store.validators(bare)['etag'] == '"v2"'
+    assert store.counts[UNCHANGED] == 0
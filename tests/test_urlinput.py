@@ -0,0 +1,99 @@
+import gzip
+
+import pytest
+
+from urlinput import canonical_url, canonical_tab, tab_key, SeenSet, TabInput
+
+
+@pytest.mark.parametrize('text, url', [
+    ('ultimate-guitar.com/tab/band/song-111', 'https://ultimate-guitar.com/tab/band/song-111'),
+    ('WWW.Ultimate-Guitar.com/artist/band_1/', 'https://www.ultimate-guitar.com/artist/band_1'),
+    ('tabs.ultimate-guitar.com:443/tab/111?x=1', 'https://tabs.ultimate-guitar.com:443/tab/111'),
+    ('notultimate-guitar.com/tab/band/song-111', None),
+    ('evil.com/ultimate-guitar.com/tab/111', None),
+    ('http://example.com//a//b/', 'http://example.com/a/b'),
+    ('ftp://ultimate-guitar.com/tab/111', None),
+])
+def test_canonical_url(text, url):
+    assert canonical_url(text) == url
+
+
+TAB = 'https://tabs.ultimate-guitar.com/tab/band/song-guitar-pro-111'
+KEY = 'tabs.ultimate-guitar.com/111'
+
+
+@pytest.mark.parametrize('text', [
+    TAB,
+    'https://www.ultimate-guitar.com/tab/band/song-guitar-pro-111',
+    'https://WWW.Ultimate-Guitar.com/tab/band/song-guitar-pro-111/?app=1#top',
+    'http://ultimate-guitar.com//tab/band/song-guitar-pro-111',
+    'tabs.ultimate-guitar.com/tab/band/song-guitar-pro-111',
+])
+def test_tab_url_variants_share_a_key(text):
+    key, url = canonical_tab(text)
+    assert key == KEY
+    assert url == TAB
+
+
+def test_bare_ids_and_their_pages_share_a_key():
+    assert canonical_tab(' 111 ') == (KEY, 'https://tabs.ultimate-guitar.com/tab/111')
+    assert canonical_tab('111', 'http://127.0.0.1:8000/') == ('127.0.0.1:8000/111', 'http://127.0.0.1:8000/tab/111')
+    assert tab_key('https://tabs.ultimate-guitar.com/tab/111') == tab_key(TAB) == KEY
+
+
+@pytest.mark.parametrize('text, result', [
+    # Downloads live under /tab/ but are not tab pages
+    ('https://www.ultimate-guitar.com/tab/download?id=111',
+     ('https://www.ultimate-guitar.com/tab/download', 'https://www.ultimate-guitar.com/tab/download')),
+    # Pages of other hosts keep their host and are keyed by it
+    ('http://127.0.0.1:8000/tab/band/song-guitar-pro-111',
+     ('127.0.0.1:8000/111', 'http://127.0.0.1:8000/tab/band/song-guitar-pro-111')),
+    # Not a tab page: the URL is its own key
+    ('https://www.ultimate-guitar.com/artist/band_1',
+     ('https://www.ultimate-guitar.com/artist/band_1', 'https://www.ultimate-guitar.com/artist/band_1')),
+    ('not a url', None),
+    ('example.com/tab/111', None),
+])
+def test_canonical_tab_special_cases(text, result):
+    assert canonical_tab(text) == result
+
+
+def test_tab_key_of_other_text_is_the_text():
+    assert tab_key('not a url') == 'not a url'
+
+
+def write_input(tmp_path, lines, compress=False) -> str:
+    path = tmp_path / ('urls.txt.gz' if compress else 'urls.txt')
+    data = ('\n'.join(lines) + '\n').encode()
+    path.write_bytes(gzip.compress(data) if compress else data)
+    return str(path)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_input_counts_unique_duplicate_and_invalid_lines(tmp_path, compress):
+    source = write_input(tmp_path, [
+        '# comment', '', TAB, '111', 'https://www.ultimate-guitar.com/tab/band/song-guitar-pro-111?x=1',
+        'https://tabs.ultimate-guitar.com/tab/band/other-guitar-pro-222', 'nonsense',
+    ], compress)
+    tabs = TabInput(source)
+    assert list(tabs) == [TAB, 'https://tabs.ultimate-guitar.com/tab/band/other-guitar-pro-222']
+    assert (tabs.lines, tabs.unique, tabs.duplicates, tabs.invalid) == (7, 2, 2, 1)
+    assert not tabs.seen.spilled
+
+
+def test_input_dedupes_after_spilling_to_disk(tmp_path):
+    source = write_input(tmp_path, [str(n) for n in range(50)] + [str(n) for n in range(0, 50, 5)])
+    tabs = TabInput(source, max_memory_keys=10)
+    urls = list(tabs)
+    assert tabs.seen.spilled
+    assert urls == [f'https://tabs.ultimate-guitar.com/tab/{n}' for n in range(50)]
+    assert (tabs.unique, tabs.duplicates) == (50, 10)
+
+
+def test_seen_set_keeps_keys_across_the_spill():
+    seen = SeenSet(max_memory_keys=3)
+    assert all(seen.add(key) for key in 'abcd')
+    assert seen.spilled
+    assert not seen.add('a') and not seen.add('d')
+    assert seen.add('e')
+    seen.close()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Streaming reader for tab URL input
+Lines are read one at a time (from a file, a gzip file or stdin), canonicalized and
+deduplicated by tab ID, so the www./tabs. variants, trailing slashes, query strings
+and repeats of one tab are downloaded once, and downloads can start on the first
+line. Bare tab IDs are accepted too. Seen IDs are kept in memory up to a limit and
+then moved to a temporary on-disk SQLite set, so multi-million-line inputs run in
+bounded memory.
+"""
+
+import gzip
+import io
+import re
+import sqlite3
+import sys
+from typing import Iterator, Optional, TextIO, Tuple
+from urllib.parse import urlsplit
+
+
+TABS_BASE_URL = 'https://tabs.ultimate-guitar.com'
+UG_DOMAIN = 'ultimate-guitar.com'
+TAB_PATH = '/tab/'
+# Under TAB_PATH but not a tab page
+DOWNLOAD_PATH = '/tab/download'
+STDIN = '-'
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Seen keys kept in a Python set before they move to disk (roughly 100 bytes each)
+DEFAULT_MEMORY_KEYS = 200_000
+_SPILL_BATCH = 10_000
+
+_TAB_ID = re.compile(r'(\d+)$')
+_SCHEME = re.compile(r'^https?://', re.IGNORECASE)
+
+
+def canonical_url(text: str) -> Optional[str]:
+    """
+    `text` as a normalized URL, or None if it is not an http(s) URL
+    Scheme and host are lowercased; the query string, fragment, repeated and trailing
+    slashes are dropped. A scheme-less Ultimate Guitar URL gets https://.
+    """
+    text = text.strip()
+    if not _SCHEME.match(text):
+        host = re.split(r'[/?#:]', text.lower(), 1)[0]
+        if host != UG_DOMAIN and not host.endswith('.' + UG_DOMAIN):
+            return None
+        text = 'https://' + text
+    try:
+        parts = urlsplit(text)
+    except ValueError:
+        return None
+    if not parts.hostname:
+        return None
+    path = re.sub(r'/{2,}', '/', parts.path).rstrip('/')
+    return f'{parts.scheme.lower()}://{parts.netloc.lower()}{path}'
+
+
+def _is_tab_page(path: str) -> bool:
+    return path.startswith(TAB_PATH) and path != DOWNLOAD_PATH and not path.startswith(DOWNLOAD_PATH + '/')
+
+
+def canonical_tab(text: str, tabs_base_url: str = TABS_BASE_URL) -> Optional[Tuple[str, str]]:
+    """
+    (dedupe key, canonical URL) of a tab URL or bare tab ID, or None if it is neither
+    URLs are normalized by canonical_url(); Ultimate Guitar tab pages (/tab/...) move to
+    tabs_base_url, other pages keep their host. The key is '<host>/<tab ID>' when a tab
+    page path ends in an ID (".../song-guitar-pro-123456"), otherwise the canonical URL.
+    """
+    tabs_base_url = tabs_base_url.rstrip('/')
+    text = text.strip()
+    if text.isdigit():
+        url = f'{tabs_base_url}{TAB_PATH}{text}'
+    else:
+        url = canonical_url(text)
+        if url is None:
+            return None
+        parts = urlsplit(url)
+        if (parts.hostname == UG_DOMAIN or parts.hostname.endswith('.' + UG_DOMAIN)) and _is_tab_page(parts.path):
+            url = tabs_base_url + parts.path
+    parts = urlsplit(url)
+    tab_id = _TAB_ID.search(parts.path) if _is_tab_page(parts.path) else None
+    return (f'{parts.netloc}/{tab_id.group(1)}' if tab_id else url), url
+
+
+def tab_key(url: str) -> str:
+    """
+    Dedupe key of `url` as canonical_tab() gives it, or `url` itself if it is not a tab URL
+    The journal and output stores index it, so a tab saved under one of its URLs (say its
+    bare-ID form) is found under the others too.
+    """
+    tab = canonical_tab(url)
+    return tab[0] if tab else url
+
+
+class SeenSet:
+    def __init__(self, max_memory_keys: int = DEFAULT_MEMORY_KEYS):
+        """Set of strings that moves to a temporary SQLite file once it outgrows max_memory_keys"""
+        self.max_memory_keys = max_memory_keys
+        self._keys = set()
+        self._db: Optional[sqlite3.Connection] = None
+        self.spilled = False
+
+    def add(self, key: str) -> bool:
+        """Add `key`; returns whether it was new"""
+        if self._db is None:
+            if key in self._keys:
+                return False
+            self._keys.add(key)
+            if len(self._keys) > self.max_memory_keys:
+                self._spill()
+            return True
+        return self._db.execute('INSERT OR IGNORE INTO seen VALUES (?)', (key,)).rowcount == 1
+
+    def _spill(self) -> None:
+        # '' opens a private temporary database on disk, deleted when closed
+        self.spilled = True
+        self._db = sqlite3.connect('')
+        self._db.execute('PRAGMA journal_mode=OFF')
+        self._db.execute('PRAGMA synchronous=OFF')
+        self._db.execute('CREATE TABLE seen (key TEXT PRIMARY KEY) WITHOUT ROWID')
+        keys = iter(self._keys)
+        while True:
+            batch = [(key,) for _, key in zip(range(_SPILL_BATCH), keys)]
+            if not batch:
+                break
+            self._db.executemany('INSERT INTO seen VALUES (?)', batch)
+        self._keys = set()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        self._keys = set()
+
+
+def open_input(source: str) -> TextIO:
+    """
+    Text stream of `source`: a path, or '-' for stdin; gzip input is detected by its magic bytes
+    Close the stream when done, except for stdin: detach() it, which leaves stdin open.
+    """
+    if source != STDIN:
+        with open(source, 'rb') as f:
+            compressed = f.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+        if compressed:
+            return gzip.open(source, 'rt', encoding='utf-8', errors='replace')
+        return open(source, 'r', encoding='utf-8', errors='replace')
+    raw = sys.stdin.buffer
+    if not isinstance(raw, io.BufferedReader):
+        raw = io.BufferedReader(raw)
+    if raw.peek(len(GZIP_MAGIC))[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+        raw = gzip.GzipFile(fileobj=raw, mode='rb')
+    return io.TextIOWrapper(raw, encoding='utf-8', errors='replace')
+
+
+class TabInput:
+    def __init__(self, source: str, tabs_base_url: str = TABS_BASE_URL,
+                 max_memory_keys: int = DEFAULT_MEMORY_KEYS):
+        """
+        Iterate over the unique tabs of a URL list, as canonical URLs, while it is being read
+        source: file with one tab URL or ID per line (gzip is fine), or '-' for stdin;
+            blank lines and # comments are skipped
+        tabs_base_url: where bare tab IDs are requested (/tab/<id>, redirected to the tab page)
+        """
+        self.source = source
+        self.tabs_base_url = tabs_base_url
+        self.seen = SeenSet(max_memory_keys)
+        self.lines = 0
+        self.unique = 0
+        self.duplicates = 0
+        self.invalid = 0
+
+    @property
+    def name(self) -> str:
+        return 'stdin' if self.source == STDIN else self.source
+
+    def __iter__(self) -> Iterator[str]:
+        stream = open_input(self.source)
+        try:
+            for line in stream:
+                self.lines += 1
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                tab = canonical_tab(line, self.tabs_base_url)
+                if tab is None:
+                    self.invalid += 1
+                    continue
+                key, url = tab
+                if not self.seen.add(key):
+                    self.duplicates += 1
+                    continue
+                self.unique += 1
+                yield url
+        finally:
+            if self.source == STDIN:
+                stream.detach()
+            else:
+                stream.close()
+            self.seen.close()
+
+    def print_stats(self) -> None:
+        spilled = ", dedupe set moved to disk" if self.seen.spilled else ""
+        print(f"📥 Input ({self.name}): {self.lines} lines, {self.unique} unique tabs, "
+              f"{self.duplicates} duplicates skipped, {self.invalid} not a tab URL or ID{spilled}")